@@ -0,0 +1,210 @@
+# encoding: utf-8
+"""
+End-to-end benchmarks for Migrator operations against a fake cluster
+
+Synthetic migration histories are generated in a temporary directory, and
+each operation runs against an in-memory stand-in for the driver (see
+`fake_cluster`), so results are reproducible offline. Network costs are
+simulated with a fixed per-request latency, plus an extra cost for LWTs.
+
+For every history size and operation, reports wall time, client CPU time
+and the number of round trips, in total and per migration. A change adding
+queries per migration shows up directly in the last columns.
+
+Usage:
+
+    python benchmarks/bench_migrator.py --sizes 10,1000 --latency 0.001
+"""
+
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+
+import io
+import os
+import sys
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+import contextlib
+from functools import partial
+
+import cassandra.cluster
+from tabulate import tabulate
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from cassandra_migrate import Migrator, MigrationConfig  # noqa: E402
+from fake_cluster import FakeCluster, FakeMetadata, FakeStats  # noqa: E402
+
+
+# `noop` is a migrate run against an already up-to-date database
+OPERATIONS = ('migrate', 'noop', 'baseline', 'status', 'reset')
+
+CONFIG_TEXT = """
+keyspace: bench
+migrations_path: ./migrations
+"""
+
+FIRST_MIGRATION_TEXT = """
+CREATE TABLE bench_data (id int PRIMARY KEY, value text);
+"""
+
+MIGRATION_TEXT = """
+/* Synthetic migration {version} */
+INSERT INTO bench_data (id, value) VALUES ({version}, 'value {version}');
+"""
+
+
+def write_history(base_path, size, statements):
+    """Write a config file and `size` synthetic CQL migrations"""
+    migrations_path = os.path.join(base_path, 'migrations')
+    os.makedirs(migrations_path)
+
+    for version in range(1, size + 1):
+        if version == 1:
+            content = FIRST_MIGRATION_TEXT
+        else:
+            content = MIGRATION_TEXT.format(version=version) * statements
+
+        path = os.path.join(migrations_path,
+                            'v{:05d}_synthetic.cql'.format(version))
+        with io.open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+
+    config_path = os.path.join(base_path, 'cassandra-migrate.yml')
+    with io.open(config_path, 'w', encoding='utf-8') as f:
+        f.write(CONFIG_TEXT)
+
+    return config_path
+
+
+class Opts(object):
+    """Minimal stand-in for the parsed CLI options"""
+
+    def __init__(self, **kwargs):
+        self.db_version = None
+        self.force = False
+        self.assume_yes = True
+        self.cli_mode = False
+        self.__dict__.update(kwargs)
+
+
+@contextlib.contextmanager
+def fake_cluster(**kwargs):
+    """Make driver backends connect to a FakeCluster"""
+    original = cassandra.cluster.Cluster
+    cassandra.cluster.Cluster = partial(FakeCluster, **kwargs)
+    try:
+        yield
+    finally:
+        cassandra.cluster.Cluster = original
+
+
+@contextlib.contextmanager
+def silenced():
+    """Discard stdout, which `status` writes its tables to"""
+    stdout = sys.stdout
+    with open(os.devnull, 'w') as devnull:
+        sys.stdout = devnull
+        try:
+            yield
+        finally:
+            sys.stdout = stdout
+
+
+def run_operation(config, operation, latency, lwt_latency, lock_mode,
+                  bulk=False, preflight=False):
+    """
+    Prepare the fake cluster state needed by an operation, then run it
+
+    Returns a tuple of (wall time, CPU time, stats), measuring the operation
+    only, not its setup.
+    """
+
+    metadata = FakeMetadata()
+    stats = FakeStats()
+
+    # Setup runs without latency, so it does not dominate the benchmark
+    with fake_cluster(metadata=metadata, stats=stats):
+        with Migrator(config=config) as migrator:
+            if operation in ('noop', 'status', 'reset'):
+                migrator.migrate(Opts())
+            elif operation == 'baseline':
+                migrator._ensure_keyspace()
+
+    stats.reset()
+    with fake_cluster(metadata=metadata, stats=stats, latency=latency,
+                      lwt_latency=lwt_latency):
+        with Migrator(config=config, lock_mode=lock_mode) as migrator, \
+                silenced():
+            cpu_start = sum(os.times()[:2])
+            wall_start = time.time()
+
+            method = 'migrate' if operation == 'noop' else operation
+            getattr(migrator, method)(Opts(bulk=bulk, preflight=preflight))
+
+            wall = time.time() - wall_start
+            cpu = sum(os.times()[:2]) - cpu_start
+
+    return wall, cpu, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark Migrator operations against a fake cluster')
+    parser.add_argument('--sizes', default='10,1000,10000',
+                        help='Comma-separated numbers of migrations')
+    parser.add_argument('--operations', default=','.join(OPERATIONS),
+                        help='Comma-separated operations to run')
+    parser.add_argument('--statements', type=int, default=1,
+                        help='Number of statements per synthetic migration')
+    parser.add_argument('--bulk', action='store_true',
+                        help='Use bulk baselining')
+    parser.add_argument('--preflight', action='store_true',
+                        help='Run pre-flight checks before migrating')
+    parser.add_argument('--lock-mode', choices=Migrator.LOCK_MODES,
+                        default='lwt',
+                        help='Locking mode used by the benchmarked runs')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='Simulated latency of every request, in seconds')
+    parser.add_argument('--lwt-latency', type=float, default=0.0,
+                        help='Extra simulated latency of LWTs, in seconds')
+    opts = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+
+    sizes = [int(s) for s in opts.sizes.split(',')]
+    operations = opts.operations.split(',')
+    for operation in operations:
+        if operation not in OPERATIONS:
+            parser.error('Unknown operation: {}'.format(operation))
+
+    results = []
+    for size in sizes:
+        base_path = tempfile.mkdtemp(prefix='cassandra-migrate-bench-')
+        try:
+            config_path = write_history(base_path, size, opts.statements)
+            config = MigrationConfig.load(config_path)
+
+            for operation in operations:
+                wall, cpu, stats = run_operation(
+                    config, operation, opts.latency, opts.lwt_latency,
+                    opts.lock_mode, opts.bulk, opts.preflight)
+                results.append((
+                    size, operation, wall, cpu, stats.round_trips, stats.lwt,
+                    stats.round_trips / size, stats.lwt / size))
+        finally:
+            shutil.rmtree(base_path)
+
+    print(tabulate(
+        results,
+        headers=['Migrations', 'Operation', 'Wall (s)', 'CPU (s)',
+                 'Round trips', 'LWTs', 'Trips/migration', 'LWTs/migration'],
+        floatfmt='.3f'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,431 @@
+# encoding: utf-8
+
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+
+import re
+import time
+import uuid
+import datetime
+from collections import Counter, OrderedDict
+
+
+class FakeRow(object):
+    """Result row exposing columns as attributes, like the driver's rows"""
+
+    def __init__(self, **columns):
+        self.__dict__.update(columns)
+
+    def __repr__(self):
+        return 'FakeRow({!r})'.format(self.__dict__)
+
+
+class FakeTableMetadata(object):
+    def __init__(self, name, columns, primary_key):
+        self.name = name
+        self.columns = columns
+        self.primary_key = primary_key
+        self.rows = OrderedDict()
+
+
+class FakeKeyspaceMetadata(object):
+    def __init__(self, name):
+        self.name = name
+        self.tables = OrderedDict()
+
+
+class FakeHost(object):
+    def __init__(self, address, datacenter):
+        self.address = address
+        self.datacenter = datacenter
+        self.is_up = True
+
+
+class FakeMetadata(object):
+    """Schema metadata of a single node cluster"""
+
+    def __init__(self):
+        self.keyspaces = OrderedDict()
+        self.hosts = [FakeHost('127.0.0.1', 'datacenter1')]
+        self.schema_version = uuid.uuid4()
+
+    def all_hosts(self):
+        return list(self.hosts)
+
+
+class FakeStats(object):
+    """Round trip counters, broken down by kind of request"""
+
+    def __init__(self):
+        self.kinds = Counter()
+
+    @property
+    def round_trips(self):
+        return sum(self.kinds.values())
+
+    @property
+    def lwt(self):
+        return self.kinds['lwt']
+
+    def reset(self):
+        self.kinds.clear()
+
+
+def _unquote(name):
+    return name.strip().strip('"')
+
+
+def _split_top_level(text, sep=','):
+    """
+    Split text by a separator, ignoring separators inside brackets or string
+    literals
+    """
+    parts, depth, quoted, cur = [], 0, False, ''
+    for c in text:
+        if c == "'":
+            quoted = not quoted
+        elif quoted:
+            pass
+        elif c in '(<{[':
+            depth += 1
+        elif c in ')>}]':
+            depth -= 1
+        if c == sep and depth == 0 and not quoted:
+            parts.append(cur.strip())
+            cur = ''
+        else:
+            cur += c
+    if cur.strip():
+        parts.append(cur.strip())
+    return parts
+
+
+class FakeSession(object):
+    """
+    Stand-in for a driver session, interpreting just enough CQL to run the
+    migrator's bookkeeping
+
+    Every call to `execute` counts as one round trip, and sleeps for the
+    configured latency to simulate the network. Conditional statements (LWTs)
+    additionally sleep for `lwt_latency`, simulating the Paxos rounds.
+    Statements that are not understood are accepted and ignored, as is the
+    case for the contents of synthetic migrations.
+    """
+
+    INSERT_RE = re.compile(
+        r'^INSERT INTO (?P<table>[\w."]+)\s*\((?P<cols>[^)]*)\)\s*'
+        r'VALUES\s*\((?P<vals>.*)\)(?P<rest>[^)]*)$', re.I | re.S)
+    UPDATE_RE = re.compile(
+        r'^UPDATE (?P<table>[\w."]+)\s+(?:USING TTL (?P<ttl>\S+)\s+)?'
+        r'SET (?P<sets>.*?) WHERE (?P<where>.*?)(?:\s+IF (?P<cond>.*))?$',
+        re.I | re.S)
+    DELETE_RE = re.compile(
+        r'^DELETE FROM (?P<table>[\w."]+) WHERE (?P<where>.*?)'
+        r'(?:\s+IF (?P<cond>.*))?$', re.I | re.S)
+    SELECT_RE = re.compile(
+        r'^SELECT (?P<cols>.*?) FROM (?P<table>[\w."]+)'
+        r'(?: WHERE (?P<where>.*))?$', re.I | re.S)
+    CREATE_TABLE_RE = re.compile(
+        r'^CREATE TABLE (?:IF NOT EXISTS )?(?P<table>[\w."]+)\s*'
+        r'\((?P<body>.*)\)[^)]*$', re.I | re.S)
+    ALTER_ADD_RE = re.compile(
+        r'^ALTER TABLE (?P<table>[\w."]+) ADD (?P<col>\w+) ', re.I | re.S)
+    CREATE_KEYSPACE_RE = re.compile(
+        r'^CREATE KEYSPACE (?:IF NOT EXISTS )?(?P<ks>[\w"]+)', re.I)
+    DROP_KEYSPACE_RE = re.compile(
+        r'^DROP KEYSPACE (?:IF EXISTS )?(?P<ks>[\w"]+)', re.I)
+    TRUNCATE_RE = re.compile(r'^TRUNCATE (?:TABLE )?(?P<table>[\w."]+)',
+                             re.I)
+    USE_RE = re.compile(r'^USE (?P<ks>[\w"]+)', re.I)
+
+    def __init__(self, cluster):
+        self.cluster = cluster
+        self.keyspace = None
+        self.default_consistency_level = None
+        self.default_serial_consistency_level = None
+        self.default_timeout = None
+
+    @property
+    def _keyspaces(self):
+        return self.cluster.metadata.keyspaces
+
+    def _round_trip(self, kind):
+        self.cluster.stats.kinds[kind] += 1
+        delay = self.cluster.latency
+        if kind == 'lwt':
+            delay += self.cluster.lwt_latency
+        if delay:
+            time.sleep(delay)
+
+    def _table(self, name):
+        parts = [_unquote(p) for p in name.split('.')]
+        ks, table = parts if len(parts) == 2 else (self.keyspace, parts[0])
+        return self._keyspaces[ks].tables[table]
+
+    @staticmethod
+    def _eq_pairs(text, params):
+        """Parse `a = %s AND b = %s` clauses, consuming params in order"""
+        pairs = []
+        for clause in re.split(r'\s+AND\s+|,', text, flags=re.I):
+            col, val = [p.strip() for p in clause.split('=', 1)]
+            if val == '%s':
+                val = next(params)
+            else:
+                val = val.strip("'")
+            pairs.append((col, val))
+        return pairs
+
+    def _literal(self, value, params):
+        if value == '%s':
+            return next(params)
+        if value.startswith("'"):
+            return value[1:-1].replace("''", "'")
+        if re.match(r'^-?\d+$', value):
+            return int(value)
+        if value.startswith('0x'):
+            return bytearray.fromhex(value[2:])
+        if re.match(r'^[0-9a-f]{8}-[0-9a-f-]{27}$', value):
+            return uuid.UUID(value)
+        if value.endswith(')'):
+            # Treat function calls such as toTimestamp(now()) as the current
+            # time, which is all the migrator needs.
+            return datetime.datetime.utcnow()
+        return value
+
+    def _conditions_hold(self, row, cond, params):
+        if cond is None:
+            return True
+        if cond.strip().upper() == 'EXISTS':
+            return row is not None
+        if row is None:
+            return False
+        return all(row.get(col) == val
+                   for col, val in self._eq_pairs(cond, params))
+
+    def _lwt_result(self, applied, row):
+        columns = dict(row or {})
+        columns['applied'] = applied
+        return [FakeRow(**columns)]
+
+    def execute(self, query, parameters=None, *args, **kwargs):
+        batch = getattr(query, '_statements_and_parameters', None)
+        if batch is not None:
+            # Batches of simple statements carry their parameters already
+            # bound into the query strings
+            self._round_trip('batch')
+            for _, statement, statement_params in batch:
+                self._dispatch(statement.strip().rstrip(';'),
+                               iter(statement_params or ()))
+            return []
+
+        query = getattr(query, 'query_string', query).strip().rstrip(';')
+        lwt = query.upper().startswith(('INSERT', 'UPDATE', 'DELETE')) and \
+            bool(re.search(r'\sIF\s', query, re.I))
+        self._round_trip('lwt' if lwt else 'query')
+
+        return self._dispatch(query, iter(parameters or ()))
+
+    def _dispatch(self, query, params):
+        m = self.USE_RE.match(query)
+        if m:
+            self.keyspace = _unquote(m.group('ks'))
+            return []
+
+        m = self.CREATE_KEYSPACE_RE.match(query)
+        if m:
+            name = _unquote(m.group('ks'))
+            self._keyspaces.setdefault(name, FakeKeyspaceMetadata(name))
+            return []
+
+        m = self.DROP_KEYSPACE_RE.match(query)
+        if m:
+            self._keyspaces.pop(_unquote(m.group('ks')), None)
+            return []
+
+        m = self.CREATE_TABLE_RE.match(query)
+        if m:
+            return self._create_table(m)
+
+        m = self.ALTER_ADD_RE.match(query)
+        if m:
+            self._table(m.group('table')).columns[m.group('col')] = True
+            return []
+
+        m = self.TRUNCATE_RE.match(query)
+        if m:
+            self._table(m.group('table')).rows.clear()
+            return []
+
+        m = self.INSERT_RE.match(query)
+        if m:
+            return self._insert(m, params)
+
+        m = self.UPDATE_RE.match(query)
+        if m:
+            return self._update(m, params)
+
+        m = self.DELETE_RE.match(query)
+        if m:
+            return self._delete(m, params)
+
+        m = self.SELECT_RE.match(query)
+        if m:
+            return self._select(m, params)
+
+        return []
+
+    def _create_table(self, m):
+        parts = [_unquote(p) for p in m.group('table').split('.')]
+        ks, name = parts if len(parts) == 2 else (self.keyspace, parts[0])
+        keyspace = self._keyspaces[ks]
+        if name in keyspace.tables:
+            return []
+
+        columns, primary_key = OrderedDict(), None
+        for item in _split_top_level(m.group('body')):
+            words = item.split()
+            if item.upper().startswith('PRIMARY KEY'):
+                primary_key = re.findall(r'\w+', item[len('PRIMARY KEY'):])[0]
+            else:
+                columns[words[0]] = True
+                if 'PRIMARY KEY' in item.upper():
+                    primary_key = words[0]
+
+        keyspace.tables[name] = FakeTableMetadata(name, columns, primary_key)
+        return []
+
+    def _insert(self, m, params):
+        try:
+            table = self._table(m.group('table'))
+        except KeyError:
+            return []
+
+        cols = [c.strip() for c in m.group('cols').split(',')]
+        vals = [self._literal(v, params)
+                for v in _split_top_level(m.group('vals'))]
+        row = OrderedDict((c, None) for c in table.columns)
+        row.update(zip(cols, vals))
+        key = row[table.primary_key]
+
+        if 'IF NOT EXISTS' in m.group('rest').upper():
+            existing = table.rows.get(key)
+            if existing is not None:
+                return self._lwt_result(False, existing)
+            table.rows[key] = row
+            return self._lwt_result(True, None)
+
+        table.rows.setdefault(key, OrderedDict()).update(row)
+        return []
+
+    def _update(self, m, params):
+        table = self._table(m.group('table'))
+        if m.group('ttl') == '%s':
+            next(params)
+        sets = self._eq_pairs(m.group('sets'), params)
+        (_, key), = self._eq_pairs(m.group('where'), params)
+        row = table.rows.get(key)
+
+        cond = m.group('cond')
+        if cond is not None:
+            if not self._conditions_hold(row, cond, params):
+                return self._lwt_result(False, row)
+        if row is None:
+            row = table.rows[key] = OrderedDict(
+                (c, None) for c in table.columns)
+            row[table.primary_key] = key
+        row.update(sets)
+        return self._lwt_result(True, None) if cond is not None else []
+
+    def _delete(self, m, params):
+        table = self._table(m.group('table'))
+        (_, key), = self._eq_pairs(m.group('where'), params)
+        row = table.rows.get(key)
+
+        cond = m.group('cond')
+        if cond is not None:
+            if not self._conditions_hold(row, cond, params):
+                return self._lwt_result(False, row)
+        table.rows.pop(key, None)
+        return self._lwt_result(True, None) if cond is not None else []
+
+    def _select(self, m, params):
+        if m.group('table') == 'system.local':
+            return [FakeRow(
+                schema_version=self.cluster.metadata.schema_version)]
+
+        try:
+            table = self._table(m.group('table'))
+        except KeyError:
+            return []
+
+        if m.group('where'):
+            (_, key), = self._eq_pairs(m.group('where'), params)
+            rows = [table.rows[key]] if key in table.rows else []
+        else:
+            rows = list(table.rows.values())
+
+        return [FakeRow(**row) for row in rows]
+
+    def prepare(self, query):
+        self._round_trip('prepare')
+        return FakePreparedStatement(query)
+
+    def execute_async(self, query, parameters=None, *args, **kwargs):
+        return FakeFuture(self.execute(query, parameters, *args, **kwargs))
+
+    def shutdown(self):
+        pass
+
+
+class FakePreparedStatement(object):
+    """Stand-in for a driver PreparedStatement, executed as its query"""
+
+    def __init__(self, query_string):
+        self.query_string = query_string
+
+
+class FakeFuture(object):
+    """Already completed stand-in for a driver ResponseFuture"""
+
+    has_more_pages = False
+
+    def __init__(self, result):
+        self._result = result
+
+    def result(self):
+        return self._result
+
+    def add_callbacks(self, callback, errback):
+        callback(self._result)
+
+
+class FakeCluster(object):
+    """
+    Stand-in for `cassandra.cluster.Cluster`, holding schema and data in
+    memory
+
+    Accepts (and ignores) the same keyword arguments as the real cluster.
+    Metadata refreshes count as round trips, but are otherwise no-ops, as the
+    metadata is always kept up to date.
+    """
+
+    def __init__(self, latency=0.0, lwt_latency=0.0, stats=None,
+                 metadata=None, **kwargs):
+        self.latency = latency
+        self.lwt_latency = lwt_latency
+        self.stats = stats if stats is not None else FakeStats()
+        self.metadata = metadata if metadata is not None else FakeMetadata()
+
+    def connect(self, keyspace=None):
+        self.stats.kinds['connect'] += 1
+        return FakeSession(self)
+
+    def _refresh(self, *args, **kwargs):
+        self.stats.kinds['metadata'] += 1
+
+    refresh_keyspace_metadata = _refresh
+    refresh_table_metadata = _refresh
+    refresh_schema_metadata = _refresh
+
+    def shutdown(self):
+        pass
@@ -10,11 +10,15 @@ class MigrationError(RuntimeError):
 
 
 class FailedMigration(MigrationError):
-    """Database state contains failed migrations"""
+    """Database state contains failed migrations
 
-    def __init__(self, version, name):
+    For CQL migrations, `statement_index` is the number of statements that
+    were applied before the failure, if known."""
+
+    def __init__(self, version, name, statement_index=None):
         self.version = version
         self.migration_name = name
+        self.statement_index = statement_index
 
         super(FailedMigration, self).__init__(
             'Migration failed, cannot continue '
@@ -33,6 +37,31 @@ class ConcurrentMigration(MigrationError):
             '(version {}): {}'.format(version, name))
 
 
+class LeaseUnavailable(ConcurrentMigration):
+    """Migration lease is held by another runner"""
+
+    def __init__(self, keyspace):
+        self.version = None
+        self.migration_name = None
+        self.keyspace = keyspace
+
+        MigrationError.__init__(
+            self,
+            'Migration lease for keyspace {} is held by another '
+            'runner'.format(keyspace))
+
+
+class LeaseExpired(MigrationError):
+    """Migration lease was lost before finishing the run"""
+
+    def __init__(self, keyspace):
+        self.keyspace = keyspace
+
+        super(LeaseExpired, self).__init__(
+            'Migration lease for keyspace {} expired or was taken by another '
+            'runner, stopping'.format(keyspace))
+
+
 class InconsistentState(MigrationError):
     """Database state differs from specified migrations"""
 
@@ -56,7 +85,61 @@ class UnknownMigration(MigrationError):
             'migration (version {}): {} '.format(version, name))
 
 
+class PreflightFailed(MigrationError):
+    """Pending migrations contain statements that would fail"""
+    def __init__(self, problems):
+        self.problems = problems
+
+        super(PreflightFailed, self).__init__(
+            'Pre-flight check failed, no migrations were applied:\n' +
+            '\n'.join('  (version {}) {}: {}\n    {}'.format(
+                version, name, problem, statement)
+                for version, name, statement, problem in problems))
+
+
+class WaitTimeout(MigrationError):
+    """Another runner did not finish migrating in time"""
+
+    def __init__(self, keyspace, timeout):
+        self.keyspace = keyspace
+        self.timeout = timeout
+
+        super(WaitTimeout, self).__init__(
+            'Timed out after {}s waiting for another runner to migrate '
+            'keyspace {}'.format(timeout, keyspace))
+
+
+class SchemaDisagreement(MigrationError):
+    """Cluster nodes report different schema versions"""
+    def __init__(self, nodes):
+        self.nodes = nodes
+
+        by_version = {}
+        for node in nodes:
+            by_version.setdefault(node.schema_version, []).append(
+                node.address)
+
+        super(SchemaDisagreement, self).__init__(
+            'Cluster nodes disagree on the schema version: ' +
+            '; '.join('{} on {}'.format(version, ', '.join(addresses))
+                      for version, addresses in sorted(
+                          by_version.items(), key=lambda i: str(i[0]))))
+
+
+class MissingDownMigration(MigrationError):
+    """A migration to roll back has no down script"""
+    def __init__(self, version, name):
+        self.version = version
+        self.migration_name = name
+
+        super(MissingDownMigration, self).__init__(
+            'Cannot roll back migration without a down script '
+            '(version {}): {}'.format(version, name))
+
 
 from .migration import Migration
 from .config import MigrationConfig
+from .lease import Lease
+from .throttle import Throttle
+from .backend import Backend, DriverBackend, MemoryBackend
 from .migrator import Migrator
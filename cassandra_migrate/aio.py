@@ -0,0 +1,149 @@
+# encoding: utf-8
+"""
+Migrations for asyncio applications (Python 3.7+ only)
+"""
+
+import asyncio
+import functools
+from argparse import Namespace
+
+from cassandra_migrate.migrator import Migrator
+from cassandra_migrate.steps import (Call, Blocking, Sleep, Return,
+                                     flatten)
+
+
+def wrap_future(future):
+    """
+    Adapt a driver ResponseFuture, or a backend future, to an asyncio future
+    of the running loop
+
+    The driver completes its futures from its own event loop thread, so
+    results are handed over to the asyncio loop thread-safely.
+    """
+    loop = asyncio.get_running_loop()
+    aio_future = loop.create_future()
+
+    def set_result(result):
+        if not aio_future.done():
+            aio_future.set_result(result)
+
+    def set_exception(exc):
+        if not aio_future.done():
+            aio_future.set_exception(exc)
+
+    future.add_callbacks(
+        lambda result: loop.call_soon_threadsafe(set_result, result),
+        lambda exc: loop.call_soon_threadsafe(set_exception, exc))
+    return aio_future
+
+
+class AsyncMigrator(object):
+    """
+    Migrator for asyncio applications, so migrating can overlap with other
+    initialization
+
+    Takes the same arguments as `Migrator`, and wraps one as `migrator`,
+    running its migration steps (see `cassandra_migrate.steps`). Version
+    rows and CQL migration statements are sent with the driver's
+    `execute_async`, without blocking the event loop. Operations the driver
+    has no asynchronous API for (connecting, metadata and schema checks,
+    the lease, Python and data file migrations) run in the loop's default
+    executor.
+    """
+
+    def __init__(self, config, **kwargs):
+        self.migrator = Migrator(config, **kwargs)
+
+    @property
+    def backend(self):
+        return self.migrator.backend
+
+    @property
+    def logger(self):
+        return self.migrator.logger
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def close(self):
+        """Shut down the backend"""
+        await self._blocking(self.backend.shutdown)
+
+    async def _blocking(self, func, *args, **kwargs):
+        """Run a blocking call in the default executor"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, functools.partial(func, *args, **kwargs))
+
+    async def _submit(self, operation, *args, **kwargs):
+        """Run a backend operation asynchronously"""
+        return await wrap_future(self.backend.submit(operation, *args,
+                                                     **kwargs))
+
+    async def _perform(self, operation):
+        """Perform an operation of a migration step without blocking"""
+        if isinstance(operation, Call):
+            return await self._submit(operation.operation, *operation.args,
+                                      **operation.kwargs)
+        elif isinstance(operation, Blocking):
+            return await self._blocking(operation.func, *operation.args,
+                                        **operation.kwargs)
+        elif isinstance(operation, Sleep):
+            await asyncio.sleep(operation.seconds)
+        else:
+            raise TypeError('Invalid migration step operation: {!r}'.format(
+                operation))
+
+    async def _run(self, step):
+        """
+        Run one of the migrator's steps, awaiting its operations, so the
+        logic is exactly that of `Migrator`
+        """
+        operations = flatten(step)
+        operation = next(operations)
+        while not isinstance(operation, Return):
+            try:
+                result = await self._perform(operation)
+            except BaseException as e:
+                operation = operations.throw(e)
+            else:
+                operation = operations.send(result)
+
+        return operation.value
+
+    async def migrate(self, db_version=None, force=False, preflight=False,
+                      wait=False, wait_timeout=None):
+        """
+        Migrate the database to a given version (the latest by default),
+        like the `migrate` command
+
+        With `wait`, a migration by another runner is waited on, for up to
+        `wait_timeout` seconds, instead of failing.
+        """
+        await self._run(self.migrator._migrate(
+            db_version, force=force, preflight=preflight, wait=wait,
+            wait_timeout=wait_timeout))
+
+    async def baseline(self, db_version=None, bulk=False, batch_size=None):
+        """
+        Advance the migration state without running any migration, like the
+        `baseline` command
+        """
+        migrator = self.migrator
+        await self._blocking(migrator._check_cluster)
+        await self._blocking(migrator._ensure_table)
+
+        if bulk:
+            await self._blocking(migrator._ensure_lease_table)
+            await self._blocking(migrator._bulk_baseline, db_version,
+                                 batch_size or migrator.BULK_BATCH_SIZE)
+            return
+
+        await self._run(migrator._locked_step(migrator._baseline(db_version)))
+
+    async def status(self):
+        """Print the migration status, like the `status` command"""
+        await self._blocking(self.migrator.status, Namespace())
@@ -0,0 +1,1440 @@
+# encoding: utf-8
+
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+from builtins import str
+
+import re
+import copy
+import math
+import uuid
+import zlib
+import logging
+import time
+import datetime
+import threading
+from timeit import default_timer
+from collections import OrderedDict, namedtuple
+
+from cassandra_migrate import trace
+from cassandra_migrate.throttle import ThrottledSession
+
+
+CREATE_MIGRATIONS_TABLE = """
+CREATE TABLE {keyspace}.{table} (
+    id uuid,
+    version int,
+    name text,
+    content text,
+    content_blob blob,
+    content_encoding text,
+    checksum blob,
+    state text,
+    applied_at timestamp,
+    started_at timestamp,
+    finished_at timestamp,
+    statement_count int,
+    byte_count bigint,
+    statement_index int,
+    PRIMARY KEY (id)
+) WITH caching = {{'keys': 'NONE', 'rows_per_partition': 'NONE'}};
+"""
+
+# Columns added to the migrations table after its initial version, which are
+# created in existing tables when needed
+MIGRATIONS_TABLE_UPGRADES = [
+    ('content_blob', 'blob'),
+    ('content_encoding', 'text'),
+    ('started_at', 'timestamp'),
+    ('finished_at', 'timestamp'),
+    ('statement_count', 'int'),
+    ('byte_count', 'bigint'),
+    ('statement_index', 'int')
+]
+
+ADD_MIGRATIONS_TABLE_COLUMN = """
+ALTER TABLE "{keyspace}"."{table}" ADD {column} {type}
+"""
+
+CREATE_LEASE_TABLE = """
+CREATE TABLE IF NOT EXISTS {keyspace}.{table}_lease (
+    name text,
+    owner uuid,
+    renewed_at timestamp,
+    PRIMARY KEY (name)
+);
+"""
+
+CREATE_SUMMARY_TABLE = """
+CREATE TABLE IF NOT EXISTS {keyspace}.{table}_summary (
+    name text,
+    version int,
+    history_hash blob,
+    updated_at timestamp,
+    PRIMARY KEY (name)
+);
+"""
+
+CREATE_KEYSPACE = """
+CREATE KEYSPACE {keyspace}
+WITH REPLICATION = {replication}
+AND DURABLE_WRITES = {durable_writes};
+"""
+
+DROP_KEYSPACE = """
+DROP KEYSPACE IF EXISTS "{keyspace}";
+"""
+
+SELECT_DB_VERSIONS = """
+SELECT * FROM "{keyspace}"."{table}"
+"""
+
+CREATE_DB_VERSION = """
+INSERT INTO "{keyspace}"."{table}"
+({columns}, applied_at)
+VALUES ({placeholders}, toTimestamp(now())) {condition}
+"""
+
+FINALIZE_DB_VERSION = """
+UPDATE "{keyspace}"."{table}" SET state = %s{assignments} WHERE id = %s
+{condition}
+"""
+
+DELETE_DB_VERSION = """
+DELETE FROM "{keyspace}"."{table}" WHERE id = %s IF state = %s
+"""
+
+INSERT_JSON = """
+INSERT INTO "{keyspace}"."{name}" JSON ? DEFAULT UNSET
+"""
+
+TRUNCATE_TABLE = """
+TRUNCATE "{keyspace}"."{name}"
+"""
+
+ACQUIRE_LEASE = """
+INSERT INTO "{keyspace}"."{table}_lease" (name, owner, renewed_at)
+VALUES (%s, %s, toTimestamp(now())) IF NOT EXISTS USING TTL %s
+"""
+
+RENEW_LEASE = """
+UPDATE "{keyspace}"."{table}_lease" USING TTL %s
+SET owner = %s, renewed_at = toTimestamp(now()) WHERE name = %s IF owner = %s
+"""
+
+RELEASE_LEASE = """
+DELETE FROM "{keyspace}"."{table}_lease" WHERE name = %s IF owner = %s
+"""
+
+SELECT_SUMMARY = """
+SELECT version, history_hash FROM "{keyspace}"."{table}_summary" WHERE name = %s
+"""
+
+WRITE_SUMMARY = """
+INSERT INTO "{keyspace}"."{table}_summary" (name, version, history_hash,
+updated_at) VALUES (%s, %s, %s, toTimestamp(now()))
+"""
+
+CLEAR_SUMMARY = """
+DELETE FROM "{keyspace}"."{table}_summary" WHERE name = %s
+"""
+
+
+SELECT_LOCAL_SCHEMA_VERSION = """
+SELECT schema_version FROM system.local WHERE key = 'local'
+"""
+
+SELECT_PEERS_SCHEMA_VERSIONS = """
+SELECT peer, data_center, schema_version FROM system.peers
+"""
+
+# Schema version of a node, as reported by itself, or by gossip if it could
+# not be queried directly
+NodeSchema = namedtuple('NodeSchema', 'address datacenter schema_version')
+
+# Trace of a statement, as recorded by Cassandra in `system_traces`, with
+# durations in seconds. Events are reported by the coordinator and replicas,
+# each with the time elapsed on its `source` node when it happened.
+StatementTrace = namedtuple('StatementTrace', 'coordinator duration events')
+TraceEvent = namedtuple('TraceEvent', 'source elapsed description')
+
+
+def _seconds(delta):
+    return delta.total_seconds() if delta is not None else None
+
+
+def cassandra_ddl_repr(data):
+    """Generate a string representation of a map suitable for use in C* DDL"""
+    if isinstance(data, str):
+        return "'" + re.sub(r"(?<!\\)'", "\\'", data) + "'"
+    elif isinstance(data, dict):
+        pairs = []
+        for k, v in data.items():
+            if not isinstance(k, str):
+                raise ValueError('DDL map keys must be strings')
+
+            pairs.append(cassandra_ddl_repr(k) + ': ' + cassandra_ddl_repr(v))
+        return '{' + ', '.join(pairs) + '}'
+    elif isinstance(data, int):
+        return str(data)
+    elif isinstance(data, bool):
+        if data:
+            return 'true'
+        else:
+            return 'false'
+    else:
+        raise ValueError('Cannot convert data to a DDL representation')
+
+
+def encode_content(content, encoding=None):
+    """
+    Generate the columns storing a migration's content with an encoding
+
+    Without an encoding, content is stored as text in `content`. Otherwise,
+    it is stored encoded in `content_blob`, and the encoding is recorded in
+    `content_encoding`. Only 'zlib' is supported.
+    """
+    if encoding is None:
+        return OrderedDict([('content', content)])
+    elif encoding == 'zlib':
+        return OrderedDict([
+            ('content_blob', bytearray(zlib.compress(content.encode('utf-8')))),
+            ('content_encoding', encoding)])
+    else:
+        raise ValueError('Unknown content encoding: {}'.format(encoding))
+
+
+def decode_content(row):
+    """Extract the content of a stored version, whatever its encoding"""
+    encoding = getattr(row, 'content_encoding', None)
+    if encoding is None:
+        return row.content
+    elif encoding == 'zlib':
+        return zlib.decompress(bytes(row.content_blob)).decode('utf-8')
+    else:
+        raise ValueError('Unknown content encoding: {}'.format(encoding))
+
+
+def version_columns(version_id, version, migration, state,
+                    content_encoding=None):
+    """Generate the column values of a new version row"""
+    values = OrderedDict([
+        ('id', version_id),
+        ('version', version),
+        ('name', migration.name)])
+    values.update(encode_content(migration.content, content_encoding))
+    values['checksum'] = bytearray(migration.checksum)
+    values['state'] = state
+    return values
+
+
+class CompletedFuture(object):
+    """Already completed operation, behaving like a driver ResponseFuture"""
+
+    def __init__(self, result=None, exception=None):
+        self._result = result
+        self._exception = exception
+
+    def result(self):
+        if self._exception is not None:
+            raise self._exception
+        return self._result
+
+    def add_callbacks(self, callback, errback):
+        if self._exception is not None:
+            errback(self._exception)
+        else:
+            callback(self._result)
+
+
+class ResultFuture(object):
+    """
+    Wrapper of a driver ResponseFuture, turning its rows into the result of
+    a backend operation with `transform`
+
+    Callbacks are only called once every page of rows was fetched, from the
+    driver's event loop thread.
+    """
+
+    def __init__(self, response_future, transform=list):
+        self._future = response_future
+        self._transform = transform
+
+    def result(self):
+        return self._transform(list(self._future.result() or []))
+
+    def add_callbacks(self, callback, errback):
+        rows = []
+        future = self._future
+
+        def on_page(page):
+            rows.extend(page or [])
+            if future.has_more_pages:
+                future.start_fetching_next_page()
+                return
+
+            try:
+                result = self._transform(rows)
+            except Exception as e:
+                errback(e)
+            else:
+                callback(result)
+
+        future.add_callbacks(on_page, errback)
+
+
+class Backend(object):
+    """
+    Storage operations needed by Migrator to manage a keyspace
+
+    A backend is bound to a single keyspace and migrations table. Version
+    rows returned by `list_versions` must expose the columns of the
+    migrations table as attributes. Operations on versions are conditional
+    (compare-and-set), and return whether they were applied. Creating and
+    finalizing versions can be made unconditional, for callers already
+    holding the migration lease.
+
+    The lease is a single row, expiring after a TTL unless renewed, that
+    only one owner can hold at a time.
+
+    The summary is a single row caching the latest version and the running
+    hash of the history up to it, so an up-to-date database can be
+    recognized with one read. It is only a hint: it may be missing or stale,
+    but must never claim a version whose history was not fully applied.
+    """
+
+    LEASE_NAME = 'migrate'
+    SUMMARY_NAME = 'migrations'
+
+    def __init__(self, keyspace, table):
+        self.keyspace = keyspace
+        self.table = table
+
+    def check(self):
+        """Check if the backend is still usable, raise otherwise"""
+        pass
+
+    def shutdown(self):
+        """Release any resources held by the backend"""
+        pass
+
+    def for_keyspace(self, keyspace):
+        """
+        Return a backend managing another keyspace, with the same migrations
+        table, sharing this backend's connection
+        """
+        raise NotImplementedError
+
+    @property
+    def session(self):
+        """Session-like object handed to Python migrations"""
+        raise NotImplementedError
+
+    def keyspace_exists(self):
+        raise NotImplementedError
+
+    def create_keyspace(self, replication, durable_writes):
+        raise NotImplementedError
+
+    def drop_keyspace(self):
+        raise NotImplementedError
+
+    def table_exists(self):
+        raise NotImplementedError
+
+    def create_table(self):
+        raise NotImplementedError
+
+    def upgrade_table(self):
+        """Add any columns missing from an older migrations table"""
+        pass
+
+    def list_versions(self):
+        """Return all stored versions, in no particular order"""
+        raise NotImplementedError
+
+    def create_version(self, version_id, version, migration, state,
+                       conditional=True, content_encoding=None):
+        """Insert a version row if it does not exist yet"""
+        raise NotImplementedError
+
+    def create_versions(self, versions, content_encoding=None):
+        """
+        Insert many version rows unconditionally, with as few round trips
+        as possible
+
+        `versions` is a list of (version_id, version, migration, state).
+        """
+        raise NotImplementedError
+
+    def finalize_version(self, version_id, state, expected_state,
+                         conditional=True, columns=None):
+        """
+        Change the state of a version if it is in `expected_state`
+
+        Other columns of the version can be set at the same time, from the
+        `columns` dict.
+        """
+        raise NotImplementedError
+
+    def delete_version(self, version_id, expected_state):
+        """Delete a version if it is in `expected_state`"""
+        raise NotImplementedError
+
+    def lease_table_exists(self):
+        raise NotImplementedError
+
+    def create_lease_table(self):
+        raise NotImplementedError
+
+    def acquire_lease(self, owner, ttl):
+        """Take the lease for `ttl` seconds if it is not held by anyone"""
+        raise NotImplementedError
+
+    def renew_lease(self, owner, ttl):
+        """Extend the lease for `ttl` seconds if it is held by `owner`"""
+        raise NotImplementedError
+
+    def release_lease(self, owner):
+        """Give up the lease if it is held by `owner`"""
+        raise NotImplementedError
+
+    def summary_table_exists(self):
+        raise NotImplementedError
+
+    def create_summary_table(self):
+        raise NotImplementedError
+
+    def read_summary(self):
+        """Return the summary row, with `version` and `history_hash`, or None"""
+        raise NotImplementedError
+
+    def write_summary(self, version, history_hash):
+        raise NotImplementedError
+
+    def clear_summary(self):
+        raise NotImplementedError
+
+    def list_tables(self):
+        """Return the names of all tables in the keyspace"""
+        raise NotImplementedError
+
+    def schema_statements(self, keyspace, exclude=()):
+        """
+        Return the CQL statements recreating the schema of the keyspace
+        (types, functions, aggregates, tables, indexes and views) in another
+        `keyspace`, in an order they can be executed in
+
+        Tables named in `exclude` are left out, along with their indexes.
+        """
+        raise NotImplementedError
+
+    def schema_versions(self):
+        """Return the schema version of every reachable node, as NodeSchema"""
+        raise NotImplementedError
+
+    def truncate_tables(self, tables):
+        """Remove all data from the given tables, concurrently if possible"""
+        raise NotImplementedError
+
+    def use_keyspace(self):
+        """Make the managed keyspace the default for executed statements"""
+        raise NotImplementedError
+
+    def insert_rows(self, table, rows, keyspace=None, concurrency=32,
+                    throttle=None):
+        """
+        Insert rows, given as JSON objects, into a table
+
+        `rows` can be any iterable, which is consumed lazily, with up to
+        `concurrency` inserts in flight. Returns the number of rows inserted.
+        With a `throttle`, every insert waits for it, and its latency is
+        recorded in it.
+        """
+        raise NotImplementedError
+
+    def prepare(self, statements):
+        """
+        Prepare statements from migrations, concurrently if possible
+
+        Returns a dict of the prepared statements, which can be passed to
+        `execute` in place of the original ones, and a list of
+        (statement, error) for those that failed.
+        """
+        raise NotImplementedError
+
+    def execute(self, statement):
+        """Execute a single statement from a migration"""
+        raise NotImplementedError
+
+    def execute_traced(self, statement):
+        """
+        Execute a single statement from a migration with query tracing
+
+        Returns the time the execution took as seen by the client, in
+        seconds, not counting the retrieval of the trace, and the
+        StatementTrace, or None if it could not be retrieved.
+        """
+        raise NotImplementedError
+
+    def refresh_schema(self):
+        """Make any schema changes visible to subsequent operations"""
+        pass
+
+    def submit(self, operation, *args, **kwargs):
+        """
+        Start one of the `list_versions`, `create_version`,
+        `finalize_version`, `execute` or summary operations without waiting
+        for it
+
+        Returns a future with the interface of the driver's ResponseFuture
+        (`result()` and `add_callbacks(callback, errback)`), holding what the
+        operation would have returned. By default, the operation runs right
+        away, and a completed future is returned.
+        """
+        try:
+            return CompletedFuture(getattr(self, operation)(*args, **kwargs))
+        except Exception as e:
+            return CompletedFuture(exception=e)
+
+
+class DriverBackend(Backend):
+    """
+    Backend running against a real cluster with the DataStax driver
+
+    The driver is only imported when a DriverBackend is created, as importing
+    it is slow, and most CLI commands never need it.
+
+    Applications can share their own driver objects: with an existing
+    `cluster`, its control connection and metadata are reused, and a
+    separate session is opened. With an existing `session`, no connection
+    is opened until migrations are applied: they need the managed keyspace
+    as default, which is never switched on a borrowed session, as the
+    application keeps using it, so a session of the backend's own is opened
+    on its cluster then. Borrowed objects are not shut down with the
+    backend, and their defaults are left alone: consistency levels and
+    timeouts are set on each statement instead.
+
+    Otherwise, a cluster is built from the connection arguments, and the
+    driver settings in `connection` (see `CONNECTION_OPTIONS`), with
+    consistency levels and timeouts in its default execution profile.
+    """
+
+    logger = logging.getLogger("Migrator")
+
+    # Stay well below the default `batch_size_fail_threshold_in_kb` (50KB)
+    MAX_BATCH_BYTES = 32 * 1024
+
+    # Statements prepared at the same time by `prepare`
+    PREPARE_CONCURRENCY = 16
+
+    # Driver settings that can be given in `connection`. Those naming
+    # `Cluster` arguments are passed as is, and override the defaults below.
+    CLUSTER_OPTIONS = ('protocol_version', 'compression', 'connect_timeout',
+                       'control_connection_timeout',
+                       'max_schema_agreement_wait', 'executor_threads',
+                       'idle_heartbeat_interval', 'connect_to_remote_hosts')
+    CONNECTION_OPTIONS = CLUSTER_OPTIONS + (
+        # Timeout of every request, in seconds
+        'request_timeout',
+        # Token-aware (by default) DC-aware round robin load balancing
+        'local_dc', 'used_hosts_per_remote_dc', 'token_aware',
+        # Any driver LoadBalancingPolicy, overriding the options above
+        'load_balancing_policy',
+        # Connection pool sizes for local hosts (protocol v1 and v2 only)
+        'core_connections_per_host', 'max_connections_per_host')
+
+    CLUSTER_DEFAULTS = {
+        'max_schema_agreement_wait': 300,
+        'control_connection_timeout': 10,
+        'connect_timeout': 30
+    }
+    REQUEST_TIMEOUT = 120
+
+    # How long to wait for statement traces to be written to system_traces
+    TRACE_WAIT = 10
+
+    def __init__(self, keyspace, table, hosts=['127.0.0.1'], port=9042,
+                 user=None, password=None, host_cert_path=None,
+                 client_key_path=None, client_cert_path=None, cluster=None,
+                 session=None, connection=None):
+        super(DriverBackend, self).__init__(keyspace, table)
+
+        connection = dict(connection or {})
+        unknown = set(connection) - set(self.CONNECTION_OPTIONS)
+        if unknown:
+            raise ValueError('Unknown connection options: {}'.format(
+                ', '.join(sorted(unknown))))
+        self.request_timeout = connection.get('request_timeout',
+                                              self.REQUEST_TIMEOUT)
+
+        if session is not None:
+            cluster = session.cluster
+        self._owns_session = session is None
+        self._owns_cluster = cluster is None
+        self._session = session
+
+        if cluster is None:
+            cluster = self._build_cluster(
+                hosts, port, user, password, host_cert_path, client_key_path,
+                client_cert_path, connection)
+        self.cluster = cluster
+
+    def _build_cluster(self, hosts, port, user, password, host_cert_path,
+                       client_key_path, client_cert_path, connection):
+        from cassandra import policies, ConsistencyLevel
+        from cassandra.cluster import (Cluster, ExecutionProfile,
+                                       EXEC_PROFILE_DEFAULT)
+        from cassandra.auth import PlainTextAuthProvider
+
+        if user:
+            auth_provider = PlainTextAuthProvider(user, password)
+        else:
+            auth_provider = None
+
+        if host_cert_path:
+            ssl_options = self._build_ssl_options(
+                host_cert_path,
+                client_key_path,
+                client_cert_path)
+        else:
+            ssl_options = None
+
+        options = dict(self.CLUSTER_DEFAULTS)
+        options.update((name, value) for name, value in connection.items()
+                       if name in self.CLUSTER_OPTIONS)
+
+        policy = connection.get('load_balancing_policy')
+        if policy is None and connection.get('local_dc'):
+            policy = policies.DCAwareRoundRobinPolicy(
+                connection['local_dc'],
+                used_hosts_per_remote_dc=connection.get(
+                    'used_hosts_per_remote_dc', 0))
+            if connection.get('token_aware', True):
+                policy = policies.TokenAwarePolicy(policy)
+
+        profile = ExecutionProfile(
+            load_balancing_policy=policy,
+            consistency_level=ConsistencyLevel.ALL,
+            serial_consistency_level=ConsistencyLevel.SERIAL,
+            request_timeout=self.request_timeout)
+
+        cluster = Cluster(
+            contact_points=hosts,
+            port=port,
+            auth_provider=auth_provider,
+            ssl_options=ssl_options,
+            execution_profiles={EXEC_PROFILE_DEFAULT: profile},
+            **options)
+
+        # The driver rejects these with protocol v3 and later, which always
+        # use a single connection per host
+        if 'core_connections_per_host' in connection:
+            cluster.set_core_connections_per_host(
+                policies.HostDistance.LOCAL,
+                connection['core_connections_per_host'])
+        if 'max_connections_per_host' in connection:
+            cluster.set_max_connections_per_host(
+                policies.HostDistance.LOCAL,
+                connection['max_connections_per_host'])
+
+        return cluster
+
+    def _build_ssl_options(self, host_cert_path, client_key_path,
+                           client_cert_path):
+        return {
+            'ca_certs': host_cert_path,
+            'certfile': client_cert_path,
+            'keyfile': client_key_path
+        }
+
+    def check(self):
+        """Check if the cluster is still alive, raise otherwise"""
+        if not self.cluster:
+            raise RuntimeError("Cluster has shut down")
+
+    def shutdown(self):
+        if self._session is not None:
+            if self._owns_session:
+                self._session.shutdown()
+            self._session = None
+
+        if self.cluster is not None:
+            if self._owns_cluster:
+                self.cluster.shutdown()
+            self.cluster = None
+
+    def for_keyspace(self, keyspace):
+        return DriverBackend(keyspace, self.table, session=self.session,
+                             connection={'request_timeout':
+                                         self.request_timeout})
+
+    def _init_session(self):
+        if not self._session:
+            with trace.span('Cluster.connect', 'cluster'):
+                self._session = self.cluster.connect()
+            if self._owns_cluster:
+                trace.instrument_schema_agreement(self.cluster)
+
+    def _statement(self, query):
+        """
+        Set the consistency levels of a statement when the cluster is
+        borrowed, as its defaults are left alone
+        """
+        if self._owns_cluster:
+            return query
+
+        from cassandra import ConsistencyLevel
+        from cassandra.query import SimpleStatement
+
+        if isinstance(query, str):
+            query = SimpleStatement(query)
+        query.consistency_level = ConsistencyLevel.ALL
+        query.serial_consistency_level = ConsistencyLevel.SERIAL
+        return query
+
+    @property
+    def session(self):
+        """Initialize and configure a  C* driver session if needed"""
+
+        self.check()
+        self._init_session()
+
+        return self._session
+
+    def _q(self, query, **kwargs):
+        """
+        Format a query with the configured keyspace and migration table
+
+        `keyspace` and `table` are interpolated as named arguments
+        """
+        return query.format(keyspace=self.keyspace, table=self.table,
+                            **kwargs)
+
+    def _execute(self, query, *args, **kwargs):
+        """Execute a query with the current session"""
+
+        self.logger.debug('Executing query: {}'.format(query))
+        kwargs.setdefault('timeout', self.request_timeout)
+        return self.session.execute(self._statement(query), *args, **kwargs)
+
+    def _request(self, query, params, transform):
+        """Execute a query, and turn its rows into a result with `transform`"""
+        return transform(list(self._execute(query, params)))
+
+    @staticmethod
+    def _applied(result):
+        return bool(result) and result[0].applied
+
+    @staticmethod
+    def _always_applied(result):
+        return True
+
+    def keyspace_exists(self):
+        self._init_session()
+
+        return self.keyspace in self.cluster.metadata.keyspaces
+
+    def create_keyspace(self, replication, durable_writes):
+        self._execute(self._q(
+            CREATE_KEYSPACE,
+            replication=cassandra_ddl_repr(replication),
+            durable_writes=cassandra_ddl_repr(durable_writes)))
+
+        with trace.span('refresh_keyspace_metadata', 'cluster'):
+            self.cluster.refresh_keyspace_metadata(self.keyspace)
+
+    def drop_keyspace(self):
+        self._execute(self._q(DROP_KEYSPACE))
+        self.refresh_schema()
+
+    def table_exists(self):
+        self._init_session()
+
+        ks_metadata = self.cluster.metadata.keyspaces.get(self.keyspace, None)
+        return bool(ks_metadata) and self.table in ks_metadata.tables
+
+    def create_table(self):
+        self._execute(self._q(CREATE_MIGRATIONS_TABLE))
+        with trace.span('refresh_table_metadata', 'cluster'):
+            self.cluster.refresh_table_metadata(self.keyspace, self.table)
+
+    def upgrade_table(self):
+        from cassandra import InvalidRequest
+
+        columns = self.cluster.metadata.keyspaces[self.keyspace] \
+            .tables[self.table].columns
+        missing = [(name, tpe) for name, tpe in MIGRATIONS_TABLE_UPGRADES
+                   if name not in columns]
+        if not missing:
+            return
+
+        for name, tpe in missing:
+            self.logger.info('Adding column {} to table {}'.format(
+                name, self.table))
+            try:
+                self._execute(self._q(ADD_MIGRATIONS_TABLE_COLUMN,
+                                      column=name, type=tpe))
+            except InvalidRequest:
+                # Another runner might have added the column concurrently
+                self.cluster.refresh_table_metadata(self.keyspace, self.table)
+                if name not in self.cluster.metadata.keyspaces[
+                        self.keyspace].tables[self.table].columns:
+                    raise
+
+        with trace.span('refresh_table_metadata', 'cluster'):
+            self.cluster.refresh_table_metadata(self.keyspace, self.table)
+
+    def _list_versions_request(self):
+        return self._q(SELECT_DB_VERSIONS), None, list
+
+    def list_versions(self):
+        return self._request(*self._list_versions_request())
+
+    def _version_insert(self, version_id, version, migration, state,
+                        conditional, content_encoding):
+        """Generate the query and parameters inserting a version row"""
+        values = version_columns(version_id, version, migration, state,
+                                 content_encoding)
+        query = self._q(CREATE_DB_VERSION,
+                        columns=', '.join(values),
+                        placeholders=', '.join(['%s'] * len(values)),
+                        condition='IF NOT EXISTS' if conditional else '')
+        return query, tuple(values.values())
+
+    def _create_version_request(self, version_id, version, migration, state,
+                                conditional=True, content_encoding=None):
+        query, params = self._version_insert(
+            version_id, version, migration, state, conditional,
+            content_encoding)
+        return query, params, \
+            self._applied if conditional else self._always_applied
+
+    def create_version(self, *args, **kwargs):
+        return self._request(*self._create_version_request(*args, **kwargs))
+
+    def _version_batches(self, versions):
+        """Split versions into groups small enough to be sent as a batch"""
+        batch, batch_bytes = [], 0
+        for v in versions:
+            size = len(v[2].content.encode('utf-8'))
+            if batch and batch_bytes + size > self.MAX_BATCH_BYTES:
+                yield batch
+                batch, batch_bytes = [], 0
+
+            batch.append(v)
+            batch_bytes += size
+
+        if batch:
+            yield batch
+
+    def create_versions(self, versions, content_encoding=None):
+        from cassandra.query import BatchStatement
+
+        for group in self._version_batches(versions):
+            inserts = [self._version_insert(version_id, version, migration,
+                                            state, False, content_encoding)
+                       for version_id, version, migration, state in group]
+
+            if len(inserts) == 1:
+                self._execute(*inserts[0])
+                continue
+
+            # Logged batches are atomic, so an interrupted run never leaves
+            # gaps in the version history
+            batch = self._statement(BatchStatement())
+            for query, params in inserts:
+                batch.add(query, params)
+            self._execute(batch)
+
+    def _finalize_version_request(self, version_id, state, expected_state,
+                                  conditional=True, columns=None):
+        columns = OrderedDict(sorted((columns or {}).items()))
+        assignments = ''.join(', {} = %s'.format(name) for name in columns)
+        params = (state,) + tuple(columns.values()) + (version_id,)
+
+        if not conditional:
+            return (self._q(FINALIZE_DB_VERSION, condition='',
+                            assignments=assignments),
+                    params, self._always_applied)
+
+        return (self._q(FINALIZE_DB_VERSION, condition='IF state = %s',
+                        assignments=assignments),
+                params + (expected_state,), self._applied)
+
+    def finalize_version(self, *args, **kwargs):
+        return self._request(*self._finalize_version_request(*args, **kwargs))
+
+    def delete_version(self, version_id, expected_state):
+        return self._applied(self._execute(
+            self._q(DELETE_DB_VERSION),
+            (version_id, expected_state)))
+
+    def lease_table_exists(self):
+        self._init_session()
+
+        ks_metadata = self.cluster.metadata.keyspaces.get(self.keyspace, None)
+        return bool(ks_metadata) and \
+            self.table + '_lease' in ks_metadata.tables
+
+    def create_lease_table(self):
+        self._execute(self._q(CREATE_LEASE_TABLE))
+        with trace.span('refresh_table_metadata', 'cluster'):
+            self.cluster.refresh_table_metadata(self.keyspace,
+                                                self.table + '_lease')
+
+    @staticmethod
+    def _lease_ttl(ttl):
+        """TTL of the lease row, rounded up, as a TTL of 0 never expires"""
+        return int(math.ceil(ttl))
+
+    def acquire_lease(self, owner, ttl):
+        return self._applied(self._execute(
+            self._q(ACQUIRE_LEASE),
+            (self.LEASE_NAME, owner, self._lease_ttl(ttl))))
+
+    def renew_lease(self, owner, ttl):
+        return self._applied(self._execute(
+            self._q(RENEW_LEASE),
+            (self._lease_ttl(ttl), owner, self.LEASE_NAME, owner)))
+
+    def release_lease(self, owner):
+        return self._applied(self._execute(
+            self._q(RELEASE_LEASE), (self.LEASE_NAME, owner)))
+
+    def summary_table_exists(self):
+        self._init_session()
+
+        ks_metadata = self.cluster.metadata.keyspaces.get(self.keyspace, None)
+        return bool(ks_metadata) and \
+            self.table + '_summary' in ks_metadata.tables
+
+    def create_summary_table(self):
+        self._execute(self._q(CREATE_SUMMARY_TABLE))
+        with trace.span('refresh_table_metadata', 'cluster'):
+            self.cluster.refresh_table_metadata(self.keyspace,
+                                                self.table + '_summary')
+
+    def _read_summary_request(self):
+        return (self._q(SELECT_SUMMARY), (self.SUMMARY_NAME,),
+                lambda rows: rows[0] if rows else None)
+
+    def read_summary(self):
+        return self._request(*self._read_summary_request())
+
+    def _write_summary_request(self, version, history_hash):
+        return (self._q(WRITE_SUMMARY),
+                (self.SUMMARY_NAME, version, bytearray(history_hash)),
+                self._always_applied)
+
+    def write_summary(self, version, history_hash):
+        self._request(*self._write_summary_request(version, history_hash))
+
+    def _clear_summary_request(self):
+        return (self._q(CLEAR_SUMMARY), (self.SUMMARY_NAME,),
+                self._always_applied)
+
+    def clear_summary(self):
+        self._request(*self._clear_summary_request())
+
+    def list_tables(self):
+        self._init_session()
+
+        ks_metadata = self.cluster.metadata.keyspaces.get(self.keyspace, None)
+        return list(ks_metadata.tables) if ks_metadata else []
+
+    @staticmethod
+    def _moved(metadata, keyspace, attribute='keyspace_name'):
+        """
+        Shallow copy of a driver schema metadata object, placed in another
+        keyspace, so the CQL it generates is qualified with it
+        """
+        metadata = copy.copy(metadata)
+        setattr(metadata, attribute, keyspace)
+        return metadata
+
+    def schema_statements(self, keyspace, exclude=()):
+        self._init_session()
+
+        # Only the names of the copies are changed, never the rest of the
+        # generated CQL, like comments, literals or function bodies
+        ks_metadata = copy.copy(self.cluster.metadata.keyspaces[self.keyspace])
+        ks_metadata.name = keyspace
+        ks_metadata.user_types = dict(
+            (name, self._moved(user_type, keyspace, 'keyspace'))
+            for name, user_type in ks_metadata.user_types.items())
+        tables = [self._moved(table, keyspace)
+                  for name, table in ks_metadata.tables.items()
+                  if name not in exclude]
+
+        # Types are ordered by the driver so that they follow the types they
+        # use. Views depend on tables, aggregates on functions.
+        statements = [cql.rstrip().rstrip(';')
+                      for cql in ks_metadata.user_type_strings()]
+        statements += [self._moved(f, keyspace, 'keyspace').as_cql_query()
+                       for f in ks_metadata.functions.values()]
+        statements += [self._moved(a, keyspace, 'keyspace').as_cql_query()
+                       for a in ks_metadata.aggregates.values()]
+        for table in tables:
+            statements.append(table.as_cql_query())
+            statements.extend(self._moved(index, keyspace).as_cql_query()
+                              for index in table.indexes.values())
+        statements += [self._moved(view, keyspace).as_cql_query()
+                       for table in tables for view in table.views.values()]
+        return statements
+
+    def schema_versions(self):
+        self._init_session()
+
+        hosts = [host for host in self.cluster.metadata.all_hosts()
+                 if host.is_up]
+        with trace.span('schema_versions', 'cluster',
+                        args={'hosts': len(hosts)}):
+            peers_future = self.session.execute_async(
+                SELECT_PEERS_SCHEMA_VERSIONS)
+            local_futures = [
+                (host, self.session.execute_async(SELECT_LOCAL_SCHEMA_VERSION,
+                                                  host=host))
+                for host in hosts]
+
+            nodes = OrderedDict()
+            for host, future in local_futures:
+                try:
+                    rows = list(future.result())
+                except Exception as e:
+                    self.logger.warning(
+                        'Failed to query schema version of {}: {}'.format(
+                            host.address, e))
+                    continue
+
+                if rows:
+                    nodes[host.address] = NodeSchema(
+                        host.address, host.datacenter, rows[0].schema_version)
+
+            # Fall back to the gossip view of the nodes that could not be
+            # queried directly
+            up = set(host.address for host in hosts)
+            try:
+                peers = list(peers_future.result())
+            except Exception:
+                peers = []
+            for row in peers:
+                address = str(row.peer)
+                if address in up and address not in nodes:
+                    nodes[address] = NodeSchema(address, row.data_center,
+                                                row.schema_version)
+
+        return list(nodes.values())
+
+    def truncate_tables(self, tables):
+        futures = []
+        for table in tables:
+            query = self._q(TRUNCATE_TABLE, name=table)
+            self.logger.debug('Executing query: {}'.format(query))
+            futures.append(self.session.execute_async(
+                self._statement(query), timeout=self.request_timeout))
+
+        for future in futures:
+            future.result()
+
+    def use_keyspace(self):
+        if not self._owns_session:
+            self.logger.info('Opening a session to apply migrations, leaving '
+                             'the keyspace of the borrowed one alone')
+            self._session = None
+            self._owns_session = True
+
+        self.session.execute('USE {};'.format(self.keyspace))
+
+    def prepare(self, statements):
+        prepared, errors = {}, []
+        remaining = iter(list(OrderedDict.fromkeys(statements)))
+        lock = threading.Lock()
+
+        def prepare_remaining():
+            while True:
+                with lock:
+                    statement = next(remaining, None)
+                if statement is None:
+                    return
+
+                self.logger.debug('Preparing query: {}'.format(statement))
+                try:
+                    result = self.session.prepare(statement)
+                except Exception as e:
+                    with lock:
+                        errors.append((statement, e))
+                else:
+                    with lock:
+                        prepared[statement] = result
+
+        workers = [threading.Thread(target=prepare_remaining)
+                   for _ in range(min(self.PREPARE_CONCURRENCY,
+                                      len(statements)))]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        return prepared, errors
+
+    def insert_rows(self, table, rows, keyspace=None, concurrency=32,
+                    throttle=None):
+        from cassandra.concurrent import execute_concurrent_with_args
+
+        statement = self._statement(self.session.prepare(INSERT_JSON.format(
+            keyspace=keyspace or self.keyspace, name=table)))
+
+        count = [0]
+
+        def parameters():
+            for row in rows:
+                count[0] += 1
+                yield (row,)
+
+        session = self.session
+        if throttle is not None:
+            session = ThrottledSession(session, throttle)
+
+        results = execute_concurrent_with_args(
+            session, statement, parameters(), concurrency=concurrency,
+            raise_on_first_error=True, results_generator=True)
+        for _ in results:
+            pass
+
+        return count[0]
+
+    def execute(self, statement):
+        return self.session.execute(self._statement(statement),
+                                    timeout=self.request_timeout)
+
+    def execute_traced(self, statement):
+        from cassandra.query import TraceUnavailable
+
+        statement = self._statement(statement)
+        start = default_timer()
+        result = self.session.execute(statement,
+                                      timeout=self.request_timeout,
+                                      trace=True)
+        elapsed = default_timer() - start
+
+        try:
+            query_trace = result.get_query_trace(
+                max_wait_sec=self.TRACE_WAIT)
+        except TraceUnavailable as e:
+            self.logger.warning('Statement trace unavailable: {}'.format(e))
+            return elapsed, None
+
+        return elapsed, StatementTrace(
+            str(query_trace.coordinator), _seconds(query_trace.duration),
+            [TraceEvent(str(event.source), _seconds(event.source_elapsed),
+                        event.description)
+             for event in query_trace.events or ()])
+
+    def _execute_request(self, statement):
+        return statement, None, list
+
+    def refresh_schema(self):
+        with trace.span('refresh_schema_metadata', 'cluster'):
+            self.cluster.refresh_schema_metadata()
+
+    def submit(self, operation, *args, **kwargs):
+        """Send an operation's query with the driver's `execute_async`"""
+        make_request = getattr(self, '_{}_request'.format(operation), None)
+        if make_request is None:
+            return super(DriverBackend, self).submit(operation, *args,
+                                                     **kwargs)
+
+        query, params, transform = make_request(*args, **kwargs)
+        self.logger.debug('Executing query: {}'.format(query))
+        return ResultFuture(
+            self.session.execute_async(self._statement(query), params,
+                                       timeout=self.request_timeout),
+            transform)
+
+
+class Row(object):
+    """Version row exposing columns as attributes, like the driver's rows"""
+
+    def __init__(self, **columns):
+        self.__dict__.update(columns)
+
+    def __repr__(self):
+        return 'Row({!r})'.format(self.__dict__)
+
+
+class MemoryKeyspace(object):
+    """Keyspace held by a MemoryBackend, with tables mapping keys to rows"""
+
+    def __init__(self, name, replication, durable_writes):
+        self.name = name
+        self.replication = replication
+        self.durable_writes = durable_writes
+        self.tables = OrderedDict()
+
+
+class MemorySession(object):
+    """Session-like object recording statements executed by migrations"""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def execute(self, query, parameters=None, *args, **kwargs):
+        return self.backend.execute(query, parameters)
+
+
+class MemoryBackend(Backend):
+    """
+    Backend keeping all state in memory, for tests
+
+    Statements from migrations are not interpreted, only recorded in
+    `statements`, except for creating and dropping tables, which is tracked
+    to model the keyspace's contents, and the schema of a keyspace can only
+    be copied as empty tables. Preparing always succeeds, and is
+    recorded in `prepared`. The schema versions of the (fake) cluster's
+    nodes are kept in `nodes`. Version operations follow the same
+    compare-and-set semantics as the LWTs used by DriverBackend.
+
+    Several backends can share state through the `keyspaces` dict, like
+    separate clients connected to a single cluster.
+    """
+
+    CREATE_TABLE_RE = re.compile(
+        r'^\s*CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?'
+        r'(?:"?(\w+)"?\.)?"?(\w+)"?', re.I)
+    DROP_TABLE_RE = re.compile(
+        r'^\s*DROP\s+TABLE\s+(?:IF\s+EXISTS\s+)?'
+        r'(?:"?(\w+)"?\.)?"?(\w+)"?', re.I)
+
+    def __init__(self, keyspace, table, keyspaces=None):
+        super(MemoryBackend, self).__init__(keyspace, table)
+
+        self.keyspaces = keyspaces if keyspaces is not None else {}
+        self.statements = []
+        self.prepared = []
+        self.nodes = [NodeSchema('127.0.0.1', 'datacenter1', uuid.uuid4())]
+        self.current_keyspace = None
+        self._lock = threading.RLock()
+
+    def for_keyspace(self, keyspace):
+        return MemoryBackend(keyspace, self.table, keyspaces=self.keyspaces)
+
+    @property
+    def session(self):
+        return MemorySession(self)
+
+    @property
+    def _versions(self):
+        return self.keyspaces[self.keyspace].tables[self.table]
+
+    def keyspace_exists(self):
+        return self.keyspace in self.keyspaces
+
+    def create_keyspace(self, replication, durable_writes):
+        with self._lock:
+            self.keyspaces.setdefault(
+                self.keyspace,
+                MemoryKeyspace(self.keyspace, replication, durable_writes))
+
+    def drop_keyspace(self):
+        with self._lock:
+            self.keyspaces.pop(self.keyspace, None)
+
+    def table_exists(self):
+        return self.keyspace_exists() and \
+            self.table in self.keyspaces[self.keyspace].tables
+
+    def create_table(self):
+        with self._lock:
+            self.keyspaces[self.keyspace].tables.setdefault(
+                self.table, OrderedDict())
+
+    def list_versions(self):
+        with self._lock:
+            return [Row(**copy.copy(row)) for row in self._versions.values()]
+
+    def create_version(self, version_id, version, migration, state,
+                       conditional=True, content_encoding=None):
+        with self._lock:
+            if conditional and version_id in self._versions:
+                return False
+
+            # Unset columns read as null, as they would from Cassandra
+            row = dict.fromkeys(
+                ['content'] + [name for name, _ in MIGRATIONS_TABLE_UPGRADES])
+            row.update(version_columns(version_id, version, migration, state,
+                                       content_encoding))
+            row['applied_at'] = datetime.datetime.utcnow()
+            self._versions[version_id] = row
+            return True
+
+    def create_versions(self, versions, content_encoding=None):
+        with self._lock:
+            for version_id, version, migration, state in versions:
+                self.create_version(version_id, version, migration, state,
+                                    conditional=False,
+                                    content_encoding=content_encoding)
+
+    def finalize_version(self, version_id, state, expected_state,
+                         conditional=True, columns=None):
+        with self._lock:
+            row = self._versions.get(version_id)
+            if conditional and (row is None or row['state'] != expected_state):
+                return False
+
+            if row is None:
+                row = self._versions[version_id] = {'id': version_id}
+            row['state'] = state
+            row.update(columns or {})
+            return True
+
+    def delete_version(self, version_id, expected_state):
+        with self._lock:
+            row = self._versions.get(version_id)
+            if row is None or row['state'] != expected_state:
+                return False
+
+            del self._versions[version_id]
+            return True
+
+    @property
+    def _leases(self):
+        return self.keyspaces[self.keyspace].tables[self.table + '_lease']
+
+    def _live_lease(self):
+        lease = self._leases.get(self.LEASE_NAME)
+        if lease is not None and lease['expires_at'] <= time.time():
+            del self._leases[self.LEASE_NAME]
+            lease = None
+        return lease
+
+    def lease_table_exists(self):
+        return self.keyspace_exists() and \
+            self.table + '_lease' in self.keyspaces[self.keyspace].tables
+
+    def create_lease_table(self):
+        with self._lock:
+            self.keyspaces[self.keyspace].tables.setdefault(
+                self.table + '_lease', OrderedDict())
+
+    def acquire_lease(self, owner, ttl):
+        with self._lock:
+            if self._live_lease() is not None:
+                return False
+
+            self._leases[self.LEASE_NAME] = {
+                'owner': owner, 'expires_at': time.time() + ttl}
+            return True
+
+    def renew_lease(self, owner, ttl):
+        with self._lock:
+            lease = self._live_lease()
+            if lease is None or lease['owner'] != owner:
+                return False
+
+            lease['expires_at'] = time.time() + ttl
+            return True
+
+    def release_lease(self, owner):
+        with self._lock:
+            lease = self._live_lease()
+            if lease is None or lease['owner'] != owner:
+                return False
+
+            del self._leases[self.LEASE_NAME]
+            return True
+
+    @property
+    def _summaries(self):
+        return self.keyspaces[self.keyspace].tables[self.table + '_summary']
+
+    def summary_table_exists(self):
+        return self.keyspace_exists() and \
+            self.table + '_summary' in self.keyspaces[self.keyspace].tables
+
+    def create_summary_table(self):
+        with self._lock:
+            self.keyspaces[self.keyspace].tables.setdefault(
+                self.table + '_summary', OrderedDict())
+
+    def read_summary(self):
+        with self._lock:
+            summary = self._summaries.get(self.SUMMARY_NAME)
+            return Row(**summary) if summary is not None else None
+
+    def write_summary(self, version, history_hash):
+        with self._lock:
+            self._summaries[self.SUMMARY_NAME] = {
+                'version': version, 'history_hash': bytearray(history_hash)}
+
+    def clear_summary(self):
+        with self._lock:
+            self._summaries.pop(self.SUMMARY_NAME, None)
+
+    def list_tables(self):
+        return list(self.keyspaces[self.keyspace].tables)
+
+    def schema_statements(self, keyspace, exclude=()):
+        return ['CREATE TABLE "{}"."{}" ()'.format(keyspace, name)
+                for name in self.list_tables() if name not in exclude]
+
+    def schema_versions(self):
+        return list(self.nodes)
+
+    def truncate_tables(self, tables):
+        with self._lock:
+            for table in tables:
+                self.statements.append(
+                    ('TRUNCATE "{}"."{}"'.format(self.keyspace, table), None))
+                self.keyspaces[self.keyspace].tables[table].clear()
+
+    def use_keyspace(self):
+        self.current_keyspace = self.keyspace
+
+    def prepare(self, statements):
+        with self._lock:
+            self.prepared.extend(statements)
+        return dict((statement, statement) for statement in statements), []
+
+    def insert_rows(self, table, rows, keyspace=None, concurrency=32,
+                    throttle=None):
+        query = INSERT_JSON.format(keyspace=keyspace or self.keyspace,
+                                   name=table).strip()
+        execute = self.execute
+        if throttle is not None:
+            execute = ThrottledSession(self, throttle).execute
+
+        count = 0
+        for row in rows:
+            execute(query, (row,))
+            count += 1
+        return count
+
+    def execute(self, statement, parameters=None):
+        with self._lock:
+            self.statements.append((statement, parameters))
+            self._track_tables(statement)
+        return []
+
+    def execute_traced(self, statement):
+        start = default_timer()
+        self.execute(statement)
+        return (default_timer() - start,
+                StatementTrace(self.nodes[0].address, 0.0, []))
+
+    def _track_tables(self, statement):
+        """Keep track of tables created or dropped by a statement"""
+        for regex, create in ((self.CREATE_TABLE_RE, True),
+                              (self.DROP_TABLE_RE, False)):
+            m = regex.match(statement)
+            if not m:
+                continue
+
+            keyspace = self.keyspaces.get(m.group(1) or self.current_keyspace)
+            if keyspace is None:
+                raise ValueError('Keyspace does not exist')
+
+            if create:
+                keyspace.tables.setdefault(m.group(2), OrderedDict())
+            else:
+                keyspace.tables.pop(m.group(2), None)
@@ -0,0 +1,207 @@
+# encoding: utf-8
+"""
+Precompiled migration bundles
+
+A bundle is a single SQLite file holding the migrations of a directory in
+order, with their checksums, and the statements of CQL migrations already
+split and classified. Loading one replaces scanning, sorting, hashing and
+parsing every migration file, which adds up when there are hundreds of them.
+
+CQL migrations are fully contained in a bundle. Python and data file
+migrations are only described by it: they are still run from their files in
+`migrations_path`, as are down scripts. The size and modification time of
+those files are bundled too, so a bundle that is out of date with them is
+rejected when loading it.
+"""
+
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+from builtins import bytes, str
+
+import os
+import sqlite3
+
+from . import trace
+from .migration import Migration
+
+
+FORMAT_VERSION = 2
+
+CREATE_BUNDLE_TABLES = [
+    """
+    CREATE TABLE meta (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE migrations (
+        version INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        is_python INTEGER NOT NULL,
+        content TEXT NOT NULL,
+        checksum BLOB NOT NULL,
+        size INTEGER,
+        mtime REAL
+    )
+    """,
+    """
+    CREATE TABLE statements (
+        version INTEGER NOT NULL,
+        position INTEGER NOT NULL,
+        statement TEXT NOT NULL,
+        kind TEXT,
+        PRIMARY KEY (version, position)
+    )
+    """
+]
+
+SELECT_MIGRATIONS = """
+SELECT version, name, is_python, content, checksum, size, mtime
+FROM migrations ORDER BY version
+"""
+
+SELECT_STATEMENTS = """
+SELECT version, statement, kind FROM statements ORDER BY version, position
+"""
+
+
+class BundledMigration(Migration):
+    """Migration loaded from a bundle, with its statements already split"""
+
+    def __new__(cls, path, name, is_python, content, checksum,
+                statements=(), statement_kinds=()):
+        self = super(BundledMigration, cls).__new__(
+            cls, path, name, is_python, content, checksum)
+        self._statements = list(statements)
+        self._statement_kinds = list(statement_kinds)
+        return self
+
+
+def _fingerprint(path):
+    """Size and modification time of a file, or Nones if it is missing"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None, None
+    return stat.st_size, stat.st_mtime
+
+
+def _check_file(bundle_path, migration, size, mtime):
+    """
+    Make sure the file a Python or data file migration is run from is the
+    one that was bundled
+
+    Copying files can change their modification time, so the file is only
+    hashed again if its fingerprint differs.
+    """
+    if not os.path.isfile(migration.path):
+        raise ValueError('File of migration {} in bundle {} is missing: '
+                         '{}'.format(migration.name, bundle_path,
+                                     migration.path))
+
+    if _fingerprint(migration.path) == (size, mtime):
+        return
+
+    if bytearray(Migration.load(migration.path).checksum) != \
+            bytearray(migration.checksum):
+        raise ValueError('Migration {} changed since bundle {} was written, '
+                         'rebuild it'.format(migration.name, bundle_path))
+
+
+def write_bundle(path, migrations):
+    """
+    Write migrations to a bundle, replacing any existing file at `path`
+    atomically
+    """
+    tmp_path = path + '.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    connection = sqlite3.connect(tmp_path)
+    try:
+        with connection:
+            for ddl in CREATE_BUNDLE_TABLES:
+                connection.execute(ddl)
+
+            connection.execute('INSERT INTO meta VALUES (?, ?)',
+                               ('format_version', str(FORMAT_VERSION)))
+
+            for version, migration in enumerate(migrations, 1):
+                connection.execute(
+                    'INSERT INTO migrations VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (version, migration.name, int(migration.is_python),
+                     migration.content,
+                     sqlite3.Binary(bytes(migration.checksum))) +
+                    _fingerprint(migration.path))
+
+                if migration.is_python or migration.is_data:
+                    continue
+
+                connection.executemany(
+                    'INSERT INTO statements VALUES (?, ?, ?, ?)',
+                    [(version, position, statement, kind)
+                     for position, (statement, kind) in enumerate(zip(
+                         migration.statements, migration.statement_kinds))])
+    finally:
+        connection.close()
+
+    os.rename(tmp_path, path)
+
+
+def load_bundle(path, migrations_path, patterns=()):
+    """
+    Load the migrations of a bundle, in order, as BundledMigrations
+
+    Their paths point into `migrations_path`, where the files of Python and
+    data file migrations must be found to run them, unchanged. Any file
+    matching one of the glob `patterns` there must be bundled too.
+    `ValueError` is raised if the bundle is out of date.
+    """
+    if not os.path.isfile(path):
+        raise ValueError('Migration bundle {} does not exist'.format(path))
+
+    with trace.span('load_bundle', args={'path': path}):
+        connection = sqlite3.connect(path)
+        try:
+            try:
+                meta = dict(connection.execute('SELECT key, value FROM meta'))
+            except sqlite3.DatabaseError:
+                raise ValueError('{} is not a migration bundle'.format(path))
+
+            if meta.get('format_version') != str(FORMAT_VERSION):
+                raise ValueError(
+                    'Unsupported format of migration bundle {}: {}'.format(
+                        path, meta.get('format_version')))
+
+            statements = {}
+            for version, statement, kind in \
+                    connection.execute(SELECT_STATEMENTS):
+                statements.setdefault(version, []).append((statement, kind))
+
+            migrations, fingerprints = [], []
+            for version, name, is_python, content, checksum, size, mtime in \
+                    connection.execute(SELECT_MIGRATIONS):
+                split = statements.get(version, [])
+                migrations.append(BundledMigration(
+                    os.path.abspath(os.path.join(migrations_path, name)),
+                    name, bool(is_python), content, bytes(checksum),
+                    [statement for statement, _ in split],
+                    [kind for _, kind in split]))
+                fingerprints.append((size, mtime))
+        finally:
+            connection.close()
+
+        for migration, (size, mtime) in zip(migrations, fingerprints):
+            if migration.is_python or migration.is_data:
+                _check_file(path, migration, size, mtime)
+
+        bundled = set(migration.name for migration in migrations)
+        unbundled = [os.path.basename(p)
+                     for p in Migration.glob_paths(migrations_path, *patterns)
+                     if os.path.basename(p) not in bundled]
+        if unbundled:
+            raise ValueError('Migrations missing from bundle {}, rebuild '
+                             'it: {}'.format(path, ', '.join(unbundled)))
+
+    return migrations
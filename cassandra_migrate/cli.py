@@ -2,21 +2,36 @@
 
 from __future__ import (absolute_import, division,
                         print_function, unicode_literals)
+from builtins import input
 
 import sys
 import os
 import logging
 import argparse
-import subprocess
+import socket
 
 from cassandra_migrate import (Migrator, Migration, MigrationConfig,
-                               MigrationError)
+                               MigrationError, Throttle, trace)
+from cassandra_migrate.query_trace import TraceReport
+from cassandra_migrate.bundle import write_bundle
+
+
+# Options the daemon takes when started with `serve`, which a command
+# forwarded to it cannot change
+DAEMON_OPTIONS = ('--hosts', '--port', '--user', '--password', '--config-file',
+                  '--profile', '--ssl-cert', '--ssl-client-private-key',
+                  '--ssl-client-cert', '--lock-mode', '--lease-ttl',
+                  '--trace-out', '--max-ops', '--max-bytes',
+                  '--adaptive-throttle', '--latency-threshold',
+                  '--timeout-threshold', '--schema-check', '--schema-wait')
 
 
 def open_file(filename):
     if sys.platform == 'win32':
         os.startfile(filename)
     else:
+        import subprocess
+
         if 'XDG_CURRENT_DESKTOP' in os.environ:
             opener = ['xdg-open']
         elif 'EDITOR' in os.environ:
@@ -72,6 +87,57 @@ def main():
                         unless the -s option is provided.""")
     parser.add_argument('-y', '--assume-yes', action='store_true',
                         help='Automatically answer "yes" for all questions')
+    parser.add_argument('--lock-mode', choices=Migrator.LOCK_MODES,
+                        default='lwt',
+                        help='How to lock against concurrent runs: an LWT '
+                             'per migration version, or a single lease per '
+                             'run (default: %(default)s)')
+    parser.add_argument('--lease-ttl', type=int, default=60,
+                        help='Lease expiration in seconds, renewed while '
+                             'the run is going (default: %(default)s)')
+    parser.add_argument('--trace-out', default=None, metavar='PATH',
+                        help='Write a Chrome/Perfetto trace-event file with '
+                             'the timings of the run')
+    parser.add_argument('--trace-statements', default=None, metavar='PATH',
+                        help='Trace the statements of CQL migrations in '
+                             'Cassandra, and write a report of the slowest '
+                             'ones, with per-node timings, to PATH')
+    parser.add_argument('--cprofile', default=None, metavar='PATH',
+                        help='Profile the run with cProfile and dump the '
+                             'pstats to a file')
+    parser.add_argument('--max-ops', type=float, default=None,
+                        metavar='OPS',
+                        help='Limit migration statements to OPS per second')
+    parser.add_argument('--max-bytes', type=float, default=None,
+                        metavar='BYTES',
+                        help='Limit migration statements to BYTES per second')
+    parser.add_argument('--adaptive-throttle', action='store_true',
+                        help='Slow down below the limits while requests are '
+                             'slow or timing out, and speed up again once '
+                             'they recover')
+    parser.add_argument('--latency-threshold', type=float, default=0.1,
+                        metavar='SECONDS',
+                        help='Mean request latency above which adaptive '
+                             'throttling backs off (default: %(default)s)')
+    parser.add_argument('--timeout-threshold', type=float, default=0.01,
+                        metavar='RATE',
+                        help='Ratio of timed out requests above which '
+                             'adaptive throttling backs off '
+                             '(default: %(default)s)')
+    parser.add_argument('--schema-check', choices=Migrator.SCHEMA_CHECKS,
+                        default='off',
+                        help='Check that all reachable nodes agree on the '
+                             'schema version before migrating and after '
+                             'each migration, failing or waiting if they '
+                             'do not (default: %(default)s)')
+    parser.add_argument('--schema-wait', type=float, default=60,
+                        metavar='SECONDS',
+                        help='How long to wait for schema agreement with '
+                             '--schema-check wait (default: %(default)s)')
+    parser.add_argument('--daemon', default=None, metavar='SOCKET',
+                        help='Forward the migrate, status or reset command '
+                             'to a daemon started with `serve`, listening '
+                             'on SOCKET')
 
     cmds = parser.add_subparsers(help='sub-command help')
 
@@ -79,12 +145,23 @@ def main():
         'baseline',
         help='Baseline database state, advancing migration information without '
              'making changes')
+    bline.add_argument('--bulk', action='store_true',
+                       help='Write all versions in batches, guarded by a '
+                            'single lease, instead of two LWTs per version')
+    bline.add_argument('--batch-size', type=int, default=None,
+                       help='Number of versions written per batch with '
+                            '--bulk (default: {})'.format(
+                                Migrator.BULK_BATCH_SIZE))
     bline.set_defaults(action='baseline')
 
     reset = cmds.add_parser(
         'reset',
         help='Reset database state, by dropping the keyspace (if it exists) '
              'and recreating it from scratch')
+    reset.add_argument('--data-only', action='store_true',
+                       help='If the keyspace is up-to-date, keep its schema, '
+                            'truncate all tables and re-run seed migrations '
+                            'instead')
     reset.set_defaults(action='reset')
 
     mgrat = cmds.add_parser(
@@ -93,13 +170,54 @@ def main():
              'by applying any new migration scripts in sequence')
     mgrat.add_argument('-f', '--force', action='store_true',
                        help='Force migration even if last attempt failed')
+    mgrat.add_argument('--preflight', action='store_true',
+                       help='Check and prepare the statements of all pending '
+                            'migrations before applying any of them')
+    mgrat.add_argument('--wait', action='store_true',
+                       help='If another runner is migrating, wait for it to '
+                            'finish instead of failing, then check the '
+                            'migrations again')
+    mgrat.add_argument('--wait-timeout', type=float, metavar='SECONDS',
+                       help='How long to wait for another runner with '
+                            '--wait (default: {})'.format(
+                                Migrator.WAIT_TIMEOUT))
     mgrat.set_defaults(action='migrate')
 
+    rolbk = cmds.add_parser(
+        'rollback',
+        help='Roll back the database to the previous (or specified) version '
+             'by running the down scripts of later migrations in reverse '
+             'order')
+    rolbk.set_defaults(action='rollback')
+
+    clone = cmds.add_parser(
+        'clone',
+        help='Migrate the database to the latest version, then copy its '
+             'schema and migration history into new keyspaces, for example '
+             'one per parallel test worker')
+    clone.add_argument('count', metavar='COUNT', type=int,
+                       help='Number of copies to create')
+    clone.add_argument('--prefix',
+                       help='Name prefix of the copies, which are suffixed '
+                            'by their index from 0 (default: the keyspace '
+                            'name followed by an underscore). Existing '
+                            'keyspaces are replaced')
+    clone.set_defaults(action='clone')
+
     stats = cmds.add_parser(
         'status',
         help='Print current state of keyspace')
     stats.set_defaults(action='status')
 
+    serve = cmds.add_parser(
+        'serve',
+        help='Serve migrate, status and reset commands over a Unix socket, '
+             'keeping the cluster connection open between them')
+    serve.add_argument('--socket', default='cassandra-migrate.sock',
+                       help='Path of the socket to listen on '
+                            '(default: %(default)s)')
+    serve.set_defaults(action='serve')
+
     genrt = cmds.add_parser(
         'generate',
         help='Generate a new migration file')
@@ -116,14 +234,146 @@ def main():
 
     genrt.set_defaults(action='generate')
 
-    for sub in (bline, reset, mgrat):
+    bndle = cmds.add_parser(
+        'bundle',
+        help='Write all migrations, with their checksums and split '
+             'statements, to a single file that can be loaded instead of '
+             'the migration files')
+    bndle.add_argument('-o', '--output',
+                       help='Path of the bundle to write (default: the '
+                            'migrations_bundle setting of the config)')
+    bndle.set_defaults(action='bundle')
+
+    for sub in (bline, reset, mgrat, rolbk):
         sub.add_argument('db_version', metavar='VERSION', nargs='?',
-                         help='Database version to baseline/reset/migrate to')
+                         help='Database version to baseline/reset/migrate/'
+                              'roll back to')
 
     opts = parser.parse_args()
+    if opts.lease_ttl < 1:
+        parser.error('--lease-ttl must be at least 1 second')
+    if opts.adaptive_throttle and not (opts.max_ops or opts.max_bytes):
+        parser.error('--adaptive-throttle requires --max-ops or --max-bytes')
+    if opts.daemon and opts.action not in ('migrate', 'status', 'reset'):
+        parser.error('--daemon only supports migrate, status and reset')
+    if opts.daemon:
+        # Parse again without defaults, to find the options actually given
+        unset = object()
+        given = parser.parse_args(namespace=argparse.Namespace(**{
+            option[2:].replace('-', '_'): unset
+            for option in DAEMON_OPTIONS}))
+        ignored = [option for option in DAEMON_OPTIONS
+                   if getattr(given, option[2:].replace('-', '_')) is not unset]
+        if ignored:
+            parser.error('{} cannot be used with --daemon, the daemon uses '
+                         'the options it was started with'.format(
+                             ', '.join(ignored)))
+    if opts.trace_statements and (opts.daemon or opts.action == 'serve'):
+        parser.error('--trace-statements is not supported with the daemon')
+
     # enable user confirmation if we're running the script from a TTY
     opts.cli_mode = sys.stdin.isatty()
-    config = MigrationConfig.load(opts.config_file)
+
+    if opts.trace_out:
+        trace.set_tracer(trace.Tracer())
+
+    opts.trace_report = TraceReport() if opts.trace_statements else None
+
+    profiler = None
+    if opts.cprofile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    try:
+        if opts.daemon:
+            run_remote(opts)
+        else:
+            run(opts)
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(opts.cprofile)
+
+        if opts.trace_out:
+            trace.get_tracer().write(opts.trace_out)
+
+        if opts.trace_report is not None:
+            opts.trace_report.write(opts.trace_statements)
+
+
+def migrator_args(opts):
+    """Migrator arguments set by the command line, besides the config"""
+    throttle = None
+    if opts.max_ops or opts.max_bytes:
+        throttle = Throttle(ops_per_second=opts.max_ops,
+                            bytes_per_second=opts.max_bytes,
+                            adaptive=opts.adaptive_throttle,
+                            latency_threshold=opts.latency_threshold,
+                            timeout_threshold=opts.timeout_threshold)
+
+    return dict(profile=opts.profile,
+                hosts=opts.hosts.split(','), port=opts.port,
+                user=opts.user, password=opts.password,
+                host_cert_path=opts.ssl_cert,
+                client_key_path=opts.ssl_client_private_key,
+                client_cert_path=opts.ssl_client_cert,
+                lock_mode=opts.lock_mode,
+                lease_ttl=opts.lease_ttl,
+                throttle=throttle,
+                schema_check=opts.schema_check,
+                schema_wait=opts.schema_wait,
+                trace_report=getattr(opts, 'trace_report', None))
+
+
+def serve(opts):
+    from cassandra_migrate.server import MigrationServer
+
+    server = MigrationServer(opts.socket, opts.config_file,
+                             **migrator_args(opts))
+    logging.getLogger("Migrator").info(
+        'Serving migration commands on {}'.format(opts.socket))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def run_remote(opts):
+    """Forward a command to a migration daemon"""
+    from cassandra_migrate.server import MigrationServer, forward
+
+    if opts.action == 'reset' and opts.cli_mode and not opts.assume_yes:
+        confirmation = input("The reset operation cannot be undone. "
+                             "Are you sure? [y/N] ")
+        if not confirmation.lower().startswith("y"):
+            return
+
+    request = {'action': opts.action}
+    for option in MigrationServer.OPTIONS:
+        if hasattr(opts, option):
+            request[option] = getattr(opts, option)
+
+    try:
+        response = forward(opts.daemon, request)
+    except (socket.error, IOError) as e:
+        print('Error: cannot reach the migration daemon on {}: {}'.format(
+            opts.daemon, e), file=sys.stderr)
+        sys.exit(1)
+
+    if response.get('output'):
+        print(response['output'], end='')
+    if not response['ok']:
+        print('Error: {}'.format(response['error']), file=sys.stderr)
+        sys.exit(1)
+
+
+def run(opts):
+    with trace.span('MigrationConfig.load',
+                    args={'path': opts.config_file}):
+        config = MigrationConfig.load(opts.config_file)
 
     if opts.action == 'generate':
         new_path = Migration.generate(config=config,
@@ -133,13 +383,20 @@ def main():
             open_file(new_path)
 
         print(os.path.basename(new_path))
+    elif opts.action == 'bundle':
+        output = opts.output or config.migrations_bundle
+        if not output:
+            print('Error: no bundle path given with --output or '
+                  'migrations_bundle', file=sys.stderr)
+            sys.exit(1)
+
+        migrations = config.load_migration_files()
+        write_bundle(output, migrations)
+        print('Bundled {} migrations into {}'.format(len(migrations), output))
+    elif opts.action == 'serve':
+        serve(opts)
     else:
-        with Migrator(config=config, profile=opts.profile,
-                      hosts=opts.hosts.split(','), port=opts.port,
-                      user=opts.user, password=opts.password,
-                      host_cert_path=opts.ssl_cert,
-                      client_key_path=opts.ssl_client_private_key,
-                      client_cert_path=opts.ssl_client_cert) as migrator:
+        with Migrator(config=config, **migrator_args(opts)) as migrator:
             cmd_method = getattr(migrator, opts.action)
             if not callable(cmd_method):
                 print('Error: invalid command', file=sys.stderr)
@@ -5,9 +5,9 @@ from __future__ import (absolute_import, division,
 from builtins import str, open
 
 import os
-import yaml
 
 from .migration import Migration
+from .bundle import load_bundle
 
 
 DEFAULT_NEW_MIGRATION_TEXT = """
@@ -46,16 +46,49 @@ def _assert_type(data, key, tpe, default=None):
     return value
 
 
+# Driver settings accepted in `connection` blocks, with their types. See
+# `DriverBackend.CONNECTION_OPTIONS`.
+CONNECTION_OPTIONS = {
+    'protocol_version': int,
+    'compression': (bool, str),
+    'connect_timeout': (int, float),
+    'control_connection_timeout': (int, float),
+    'max_schema_agreement_wait': (int, float),
+    'executor_threads': int,
+    'idle_heartbeat_interval': (int, float),
+    'connect_to_remote_hosts': bool,
+    'request_timeout': (int, float),
+    'local_dc': str,
+    'used_hosts_per_remote_dc': int,
+    'token_aware': bool,
+    'core_connections_per_host': int,
+    'max_connections_per_host': int
+}
+
+
+def _connection_options(data, base=None):
+    """Verify the driver settings of a `connection` block, over `base`"""
+    connection = dict(base or {})
+    for key in data:
+        if key not in CONNECTION_OPTIONS:
+            raise ValueError("Config error: connection: unknown option "
+                             "{}".format(key))
+        connection[key] = _assert_type(data, key, CONNECTION_OPTIONS[key])
+    return connection
+
+
 class MigrationConfig(object):
     """
     Data class containing all configuration for migration operations
 
     Configuration includes:
     - Keyspace to be managed
-    - Possible keyspace profiles, to configure replication in different
-      environments
-    - Path to load migration files from
+    - Possible keyspace profiles, to configure replication and driver
+      connection settings in different environments
+    - Path to load migration files from, and optionally a bundle of them to
+      load instead (see `bundle`)
     - Table to store migrations state in
+    - Whether to store migration contents compressed
     - The loaded migrations themselves (instances of Migration)
     """
 
@@ -76,24 +109,41 @@ class MigrationConfig(object):
 
         self.keyspace = _assert_type(data, 'keyspace', str)
 
-        self.profiles = self.DEFAULT_PROFILES.copy()
+        # Connection settings of profiles extend the top-level ones
+        connection = _connection_options(
+            _assert_type(data, 'connection', dict, default={}))
+
+        self.profiles = dict(
+            (name, dict(profile, connection=connection))
+            for name, profile in self.DEFAULT_PROFILES.items())
         profiles = _assert_type(data, 'profiles', dict, default={})
         for name, profile in profiles.items():
             self.profiles[name] = {
                 'replication': _assert_type(profile, 'replication', dict),
                 'durable_writes': _assert_type(profile, 'durable_writes',
-                                               bool, default=True)
+                                               bool, default=True),
+                'connection': _connection_options(
+                    _assert_type(profile, 'connection', dict, default={}),
+                    connection)
             }
 
         migrations_path = _assert_type(data, 'migrations_path', str)
         self.migrations_path = os.path.join(base_path, migrations_path)
 
-        self.migrations = Migration.glob_all(
-            self.migrations_path, '*.cql', '*.py')
+        migrations_bundle = data.get('migrations_bundle')
+        if migrations_bundle is not None:
+            migrations_bundle = os.path.join(
+                base_path, _assert_type(data, 'migrations_bundle', str))
+        self.migrations_bundle = migrations_bundle
+
+        self._migrations = None
 
         self.migrations_table = _assert_type(data, 'migrations_table', str,
                                              default='database_migrations')
 
+        self.compress_content = _assert_type(data, 'compress_content', bool,
+                                             default=False)
+
         self.new_migration_name = _assert_type(
             data, 'new_migration_name', str,
             default='v{next_version}_{desc}')
@@ -110,9 +160,39 @@ class MigrationConfig(object):
             data, 'new_python_migration_text', str,
             default=DEFAULT_NEW_PYTHON_MIGRATION_TEXT)
 
+    MIGRATION_PATTERNS = ('*.cql', '*.py', '*.csv', '*.jsonl')
+
+    @property
+    def migration_paths(self):
+        """Paths of all migration files, in order, without loading them"""
+        return Migration.glob_paths(self.migrations_path,
+                                    *self.MIGRATION_PATTERNS)
+
+    @property
+    def migrations(self):
+        """
+        All migrations, loaded on first use from `migrations_bundle` if set,
+        or else from the files in `migrations_path`
+        """
+        if self._migrations is None:
+            if self.migrations_bundle is not None:
+                self._migrations = load_bundle(self.migrations_bundle,
+                                               self.migrations_path,
+                                               self.MIGRATION_PATTERNS)
+            else:
+                self._migrations = self.load_migration_files()
+        return self._migrations
+
+    def load_migration_files(self):
+        """Load all migrations from `migrations_path`, ignoring any bundle"""
+        return Migration.glob_all(self.migrations_path,
+                                  *self.MIGRATION_PATTERNS)
+
     @classmethod
     def load(cls, path):
         """Load a migration config from a file, using it's dir. as base path"""
+        import yaml
+
         with open(path, 'r', encoding='utf-8') as f:
             config = yaml.load(f, Loader=yaml.SafeLoader)
 
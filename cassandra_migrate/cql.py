@@ -69,3 +69,108 @@ class CqlSplitter(object):
             statements.append(stm)
 
         return statements
+
+
+class CqlInspector(object):
+    """
+    Shallow lexical checks and classification of single CQL statements
+
+    This is no substitute for the server's parser, but catches the mistakes
+    that can be recognized without a grammar, such as unterminated strings or
+    unbalanced brackets, and finds out which table a statement acts on.
+    """
+
+    DML_KEYWORDS = ('SELECT', 'INSERT', 'UPDATE', 'DELETE')
+    DDL_KEYWORDS = ('CREATE', 'ALTER', 'DROP', 'TRUNCATE', 'GRANT', 'REVOKE',
+                    'LIST', 'USE')
+    SCHEMA_OBJECTS = ('KEYSPACE', 'SCHEMA', 'TABLE', 'COLUMNFAMILY', 'INDEX',
+                      'CUSTOM', 'TYPE', 'FUNCTION', 'AGGREGATE',
+                      'MATERIALIZED', 'TRIGGER', 'ROLE', 'USER', 'OR')
+    BRACKETS = {'(': ')', '[': ']', '{': '}'}
+
+    NAME = r'(?:("?\w+"?)\s*\.\s*)?("?\w+"?)'
+    DML_TABLE_RE = re.compile(
+        r'^(?:INSERT\s+INTO|UPDATE|(?:DELETE|SELECT)\b.*?\bFROM)\s+' + NAME,
+        re.I | re.S)
+    DDL_TABLE_RE = re.compile(
+        r'^(?:CREATE|ALTER|DROP)\s+(?:TABLE|COLUMNFAMILY)\s+'
+        r'(?:IF\s+(?:NOT\s+)?EXISTS\s+)?' + NAME,
+        re.I | re.S)
+
+    @classmethod
+    def _words(cls, statement):
+        return statement.upper().split()
+
+    @classmethod
+    def kind(cls, statement):
+        """Classify a statement as 'dml', 'batch', 'ddl', or None"""
+        words = cls._words(statement)
+        if not words:
+            return None
+        elif words[0] in cls.DML_KEYWORDS:
+            return 'dml'
+        elif words[0] == 'BEGIN':
+            return 'batch'
+        elif words[0] in cls.DDL_KEYWORDS:
+            return 'ddl'
+        return None
+
+    @staticmethod
+    def _identifier(name):
+        if name is None:
+            return None
+        elif name.startswith('"'):
+            return name.strip('"')
+        return name.lower()
+
+    @classmethod
+    def _table(cls, regex, statement):
+        m = regex.match(statement)
+        if not m:
+            return None
+        return cls._identifier(m.group(1)), cls._identifier(m.group(2))
+
+    @classmethod
+    def dml_table(cls, statement):
+        """Return the (keyspace, table) a DML statement acts on, if known"""
+        return cls._table(cls.DML_TABLE_RE, statement)
+
+    @classmethod
+    def ddl_table(cls, statement):
+        """Return the (keyspace, table) whose schema a DDL statement changes"""
+        return cls._table(cls.DDL_TABLE_RE, statement)
+
+    @classmethod
+    def problems(cls, statement):
+        """Return descriptions of any lexical problems found in a statement"""
+        problems = []
+
+        words = cls._words(statement)
+        kind = cls.kind(statement)
+        if kind is None:
+            problems.append('unknown statement {!r}'.format(
+                words[0] if words else ''))
+        elif words[0] in ('CREATE', 'ALTER', 'DROP') and \
+                (len(words) < 2 or words[1] not in cls.SCHEMA_OBJECTS):
+            problems.append('unknown object type {!r} for {}'.format(
+                words[1] if len(words) > 1 else '', words[0]))
+
+        tokens, _ = CqlSplitter.scanner().scan(statement)
+        stack = []
+        for tk in tokens:
+            if tk.tpe != CqlSplitter.OTHER:
+                continue
+            elif tk.token in ('"', "'", '$'):
+                problems.append('unterminated string')
+                break
+            elif tk.token in cls.BRACKETS:
+                stack.append(cls.BRACKETS[tk.token])
+            elif tk.token in cls.BRACKETS.values():
+                if not stack or stack.pop() != tk.token:
+                    problems.append('unbalanced {!r}'.format(tk.token))
+                    break
+        else:
+            if stack:
+                problems.append('unclosed {!r}'.format(stack[-1]))
+
+        return problems
@@ -0,0 +1,113 @@
+# encoding: utf-8
+
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+
+import io
+import csv
+import json
+import itertools
+from collections import OrderedDict
+
+
+class DataFile(object):
+    """
+    Reader of data file migrations, streaming their rows as JSON objects
+
+    Data files start with a header of `# key: value` comment lines:
+
+    - `table` (required): table to insert rows into, optionally qualified
+      with a keyspace
+    - `columns`: comma-separated column names. CSV files without it must
+      start with a row of column names. For JSON lines files, it selects
+      which keys of each object are inserted.
+
+    Each following line is a row: CSV values, or a JSON object. Rows are
+    produced as JSON objects, to be inserted with `INSERT ... JSON`, which
+    leaves converting values to the columns' types to Cassandra. Empty CSV
+    values are left unset.
+    """
+
+    def __init__(self, migration):
+        self.migration = migration
+        self.options = self.parse_header(migration.content)
+
+        if not self.options.get('table'):
+            raise ValueError('Data file {} has no `table` in its '
+                             'header'.format(migration.name))
+
+        columns = self.options.get('columns')
+        self.columns = [c.strip() for c in columns.split(',')] \
+            if columns else None
+        self.header_size = len(migration.content.splitlines())
+
+    @staticmethod
+    def parse_header(content):
+        """Parse `# key: value` header lines into a dict"""
+        options = OrderedDict()
+        for line in content.splitlines():
+            key, sep, value = line.lstrip('#').partition(':')
+            if sep:
+                options[key.strip().lower()] = value.strip()
+        return options
+
+    @staticmethod
+    def _identifier(name):
+        if name.startswith('"'):
+            return name.strip('"')
+        return name.lower()
+
+    @property
+    def table(self):
+        """Target table, as (keyspace, table), the keyspace possibly None"""
+        keyspace, _, table = self.options['table'].rpartition('.')
+        return (self._identifier(keyspace) if keyspace else None,
+                self._identifier(table))
+
+    def _csv_rows(self, fp):
+        reader = csv.reader(itertools.islice(fp, self.header_size, None))
+        columns = self.columns or next(reader, None)
+        for values in reader:
+            if not values:
+                continue
+            if len(values) != len(columns):
+                raise ValueError('{}, line {}: expected {} values, found '
+                                 '{}'.format(self.migration.name,
+                                             self.header_size +
+                                             reader.line_num,
+                                             len(columns), len(values)))
+
+            yield json.dumps(OrderedDict(
+                (column, value) for column, value in zip(columns, values)
+                if value != ''))
+
+    def _jsonl_rows(self, fp):
+        for number, line in enumerate(fp, 1):
+            if number <= self.header_size or not line.strip():
+                continue
+
+            try:
+                row = json.loads(line, object_pairs_hook=OrderedDict)
+            except ValueError as e:
+                raise ValueError('{}, line {}: {}'.format(
+                    self.migration.name, number, e))
+            if not isinstance(row, dict):
+                raise ValueError('{}, line {}: expected a JSON object'.format(
+                    self.migration.name, number))
+
+            if self.columns:
+                row = OrderedDict((column, row[column])
+                                  for column in self.columns if column in row)
+            yield json.dumps(row)
+
+    def rows(self):
+        """Generate the rows of the file as JSON objects, reading lazily"""
+        with io.open(self.migration.path, 'r', encoding='utf-8',
+                     newline='') as fp:
+            if self.migration.name.endswith('.csv'):
+                rows = self._csv_rows(fp)
+            else:
+                rows = self._jsonl_rows(fp)
+
+            for row in rows:
+                yield row
@@ -0,0 +1,113 @@
+# encoding: utf-8
+
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+
+import uuid
+import logging
+import threading
+from timeit import default_timer
+
+from cassandra_migrate import LeaseUnavailable, LeaseExpired
+
+
+class Lease(object):
+    """
+    Run-level migration lock, held as a TTL'd row in the backend
+
+    Taking the lease costs a single LWT. While it is held, a heartbeat thread
+    renews it every third of the TTL, so version rows can be written with
+    plain writes instead of one Paxos round each.
+
+    The lease is only trusted while it can be proven to be live: `check`
+    fails if a renewal was rejected, or if the last successful renewal was
+    sent more than `ttl` seconds ago (minus a safety margin), as another
+    runner might have taken the lease since.
+    """
+
+    logger = logging.getLogger("Migrator")
+
+    SAFETY_MARGIN = 0.2
+
+    def __init__(self, backend, ttl=60):
+        if not ttl > 0:
+            raise ValueError('Invalid lease TTL {}, must be > 0'.format(ttl))
+
+        self.backend = backend
+        self.ttl = ttl
+        self.owner = uuid.uuid4()
+
+        self._valid_until = None
+        self._lost = False
+        self._stopped = threading.Event()
+        self._heartbeat = None
+
+    def _deadline(self, sent_at):
+        return sent_at + self.ttl * (1 - self.SAFETY_MARGIN)
+
+    def acquire(self):
+        sent_at = default_timer()
+        if not self.backend.acquire_lease(self.owner, self.ttl):
+            raise LeaseUnavailable(self.backend.keyspace)
+
+        self.logger.info('Acquired migration lease {} (TTL {}s)'.format(
+            self.owner, self.ttl))
+
+        self._valid_until = self._deadline(sent_at)
+        self._lost = False
+        self._stopped.clear()
+        self._heartbeat = threading.Thread(target=self._renew_periodically,
+                                           name='migration-lease')
+        self._heartbeat.daemon = True
+        self._heartbeat.start()
+
+    def _renew_periodically(self):
+        while not self._stopped.wait(self.ttl / 3.0):
+            sent_at = default_timer()
+            try:
+                renewed = self.backend.renew_lease(self.owner, self.ttl)
+            except Exception:
+                self.logger.exception('Failed to renew migration lease, '
+                                      'retrying')
+                continue
+
+            if not renewed:
+                self.logger.error('Migration lease was taken by another '
+                                  'runner')
+                self._lost = True
+                return
+
+            self._valid_until = self._deadline(sent_at)
+
+    @property
+    def valid(self):
+        return self._valid_until is not None and not self._lost and \
+            default_timer() < self._valid_until
+
+    def check(self):
+        """Raise `LeaseExpired` if the lease might not be held anymore"""
+        if not self.valid:
+            raise LeaseExpired(self.backend.keyspace)
+
+    def release(self):
+        if self._heartbeat is None:
+            return
+
+        self._stopped.set()
+        self._heartbeat.join()
+        self._heartbeat = None
+
+        # Releasing is conditional on the owner, so it is harmless even if
+        # the lease expired in the meantime
+        if not self._lost:
+            self.backend.release_lease(self.owner)
+            self.logger.info('Released migration lease {}'.format(self.owner))
+
+        self._valid_until = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
@@ -11,7 +11,8 @@ import hashlib
 import io
 from collections import namedtuple
 
-import arrow
+from . import trace
+from .cql import CqlSplitter, CqlInspector
 
 
 class Migration(namedtuple('Migration',
@@ -19,12 +20,27 @@ class Migration(namedtuple('Migration',
     """
     Data class representing the specification of a migration
 
-    Migrations can take the form of CQL files or Python scripts, and usually
-    have names starting with a version string that can be ordered.
+    Migrations can take the form of CQL files, Python scripts or data files
+    (CSV or JSON lines), and usually have names starting with a version
+    string that can be ordered.
     A checksum is kept to allow detecting changes to previously applied
-    migrations"""
+    migrations
 
-    __slots__ = ()
+    Data files are not loaded into memory: their content is only the header
+    of `# key: value` comment lines at their start, and their checksum is
+    computed by streaming the whole file.
+
+    A migration can be paired with a down script reverting it, named after
+    it with a `.down.cql` or `.down.py` extension (e.g. `v003_users.cql` and
+    `v003_users.down.cql`). Down scripts are not migrations themselves.
+
+    The statements of CQL migrations are split on first use, and kept."""
+
+    DATA_EXTENSIONS = ('.csv', '.jsonl')
+    DOWN_EXTENSIONS = ('.down.cql', '.down.py')
+
+    # Size of the chunks data files are read in to compute their checksum
+    CHUNK_SIZE = 1024 * 1024
 
     class State(object):
         """Possible states of a migration, as saved in C*"""
@@ -41,13 +57,33 @@ class Migration(namedtuple('Migration',
                   for text in re.split(r'([0-9]+)', s))
         return k
 
+    @classmethod
+    def _load_data(cls, path):
+        """Read the header of a data file, and checksum it fully"""
+        header = []
+        with open(path, 'r', encoding='utf-8') as fp:
+            for line in fp:
+                if not line.startswith('#'):
+                    break
+                header.append(line)
+
+        digest = hashlib.sha256()
+        with io.open(path, 'rb') as fp:
+            for chunk in iter(lambda: fp.read(cls.CHUNK_SIZE), b''):
+                digest.update(chunk)
+
+        return ''.join(header), bytes(digest.digest())
+
     @classmethod
     def load(cls, path):
         """Load a migration from a given file"""
-        with open(path, 'r', encoding='utf-8') as fp:
-            content = fp.read()
+        if path.endswith(cls.DATA_EXTENSIONS):
+            content, checksum = cls._load_data(path)
+        else:
+            with open(path, 'r', encoding='utf-8') as fp:
+                content = fp.read()
 
-        checksum = bytes(hashlib.sha256(content.encode('utf-8')).digest())
+            checksum = bytes(hashlib.sha256(content.encode('utf-8')).digest())
         # Should use enum but python3 requires importing an extra library
         # Reconsidering the use of enums. This is a binary decision.
         # Boolean will work just fine.
@@ -63,23 +99,42 @@ class Migration(namedtuple('Migration',
                       key=lambda p: cls._natural_sort_key(os.path.basename(p)))
 
     @classmethod
-    def glob_all(cls, base_path, *patterns):
-        """Load all paths matching a glob as migrations in sorted order"""
+    def is_down_script(cls, path):
+        """Whether a path is the down script of another migration"""
+        return path.endswith(cls.DOWN_EXTENSIONS)
+
+    @classmethod
+    def glob_paths(cls, base_path, *patterns):
+        """Find all paths matching a glob, in migration order, leaving out
+        down scripts"""
 
         paths = []
         for pattern in patterns:
-            paths.extend(glob.iglob(os.path.join(base_path, pattern)))
+            paths.extend(path
+                         for path in glob.iglob(os.path.join(base_path,
+                                                             pattern))
+                         if not cls.is_down_script(path))
 
-        return list(map(cls.load, cls.sort_paths(paths)))
+        return cls.sort_paths(paths)
+
+    @classmethod
+    def glob_all(cls, base_path, *patterns):
+        """Load all paths matching a glob as migrations in sorted order"""
+
+        with trace.span('Migration.glob_all', args={'path': base_path}):
+            return list(map(cls.load, cls.glob_paths(base_path, *patterns)))
 
     @classmethod
     def generate(cls, config, description, output):
+        import arrow
+
         fname_fmt = config.new_migration_name
         text_cql_fmt = config.new_cql_migration_text
         text_py_fmt = config.new_python_migration_text
 
         clean_desc = re.sub(r'[\W\s]+', '_', description)
-        next_version = len(config.migrations) + 1
+        # Only count the files, loading them is not needed
+        next_version = len(config.migration_paths) + 1
         date = arrow.utcnow()
 
         format_args = {
@@ -110,5 +165,63 @@ class Migration(namedtuple('Migration',
         with io.open(path, 'w', encoding='utf-8') as f:
             f.write(content + '\n')
 
+    @staticmethod
+    def history_hashes(migrations):
+        """
+        Running hashes of a migration history
+
+        The Nth hash chains the (N-1)th with the name and checksum of the Nth
+        migration, so it identifies the first N migrations as a whole.
+        """
+        hashes, previous = [], b''
+        for migration in migrations:
+            digest = hashlib.sha256(previous)
+            digest.update(migration.name.encode('utf-8') + b'\0')
+            digest.update(bytes(migration.checksum))
+            previous = digest.digest()
+            hashes.append(bytes(previous))
+        return hashes
+
+    @property
+    def is_seed(self):
+        """
+        Whether the migration only seeds data, as marked by a `.seed`
+        suffix before the extension (e.g. `v003_users.seed.cql`)
+
+        Seeds are re-run after data-only resets truncate the keyspace.
+        """
+        return bool(re.search(r"\.seed\.(cql|py|csv|jsonl)$", self.name))
+
+    def load_down(self):
+        """Load the down script of the migration, or None if it has none"""
+        stem, _ = os.path.splitext(self.path)
+        for extension in self.DOWN_EXTENSIONS:
+            if os.path.exists(stem + extension):
+                return self.load(stem + extension)
+        return None
+
+    @property
+    def is_data(self):
+        """Whether the migration is a CSV or JSON lines data file"""
+        return self.name.endswith(self.DATA_EXTENSIONS)
+
+    _statements = None
+    _statement_kinds = None
+
+    @property
+    def statements(self):
+        """Statements of a CQL migration, split from its content"""
+        if self._statements is None:
+            self._statements = CqlSplitter.split(self.content)
+        return list(self._statements)
+
+    @property
+    def statement_kinds(self):
+        """Kind of every statement of a CQL migration, see CqlInspector"""
+        if self._statement_kinds is None:
+            self._statement_kinds = [CqlInspector.kind(statement)
+                                     for statement in self.statements]
+        return list(self._statement_kinds)
+
     def __str__(self):
         return 'Migration("{}")'.format(self.name)
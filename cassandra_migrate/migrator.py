@@ -4,85 +4,58 @@ from __future__ import (absolute_import, division,
                         print_function, unicode_literals)
 from builtins import input, str
 
-import re
 import logging
 import uuid
 import codecs
+import datetime
 import sys
 import os
+import time
+import random
 import importlib
+import threading
 from functools import wraps
-from future.moves.itertools import zip_longest
+from contextlib import contextmanager
+from collections import Counter, OrderedDict
+from timeit import default_timer
+
+try:
+    from itertools import zip_longest
+except ImportError:  # Python 2
+    from itertools import izip_longest as zip_longest
 
-import arrow
-from tabulate import tabulate
-from cassandra import ConsistencyLevel
-from cassandra.cluster import Cluster
-from cassandra.auth import PlainTextAuthProvider
 from cassandra_migrate import (Migration, FailedMigration, InconsistentState,
-                               UnknownMigration, ConcurrentMigration)
-from cassandra_migrate.cql import CqlSplitter
-
-
-CREATE_MIGRATIONS_TABLE = """
-CREATE TABLE {keyspace}.{table} (
-    id uuid,
-    version int,
-    name text,
-    content text,
-    checksum blob,
-    state text,
-    applied_at timestamp,
-    PRIMARY KEY (id)
-) WITH caching = {{'keys': 'NONE', 'rows_per_partition': 'NONE'}};
-"""
-
-CREATE_KEYSPACE = """
-CREATE KEYSPACE {keyspace}
-WITH REPLICATION = {replication}
-AND DURABLE_WRITES = {durable_writes};
-"""
-
-DROP_KEYSPACE = """
-DROP KEYSPACE IF EXISTS "{keyspace}";
-"""
-
-CREATE_DB_VERSION = """
-INSERT INTO "{keyspace}"."{table}"
-(id, version, name, content, checksum, state, applied_at)
-VALUES (%s, %s, %s, %s, %s, %s, toTimestamp(now())) IF NOT EXISTS
-"""
-
-FINALIZE_DB_VERSION = """
-UPDATE "{keyspace}"."{table}" SET state = %s WHERE id = %s IF state = %s
-"""
-
-DELETE_DB_VERSION = """
-DELETE FROM "{keyspace}"."{table}" WHERE id = %s IF state = %s
-"""
-
-
-def cassandra_ddl_repr(data):
-    """Generate a string representation of a map suitable for use in C* DDL"""
-    if isinstance(data, str):
-        return "'" + re.sub(r"(?<!\\)'", "\\'", data) + "'"
-    elif isinstance(data, dict):
-        pairs = []
-        for k, v in data.items():
-            if not isinstance(k, str):
-                raise ValueError('DDL map keys must be strings')
-
-            pairs.append(cassandra_ddl_repr(k) + ': ' + cassandra_ddl_repr(v))
-        return '{' + ', '.join(pairs) + '}'
-    elif isinstance(data, int):
-        return str(data)
-    elif isinstance(data, bool):
-        if data:
-            return 'true'
-        else:
-            return 'false'
-    else:
-        raise ValueError('Cannot convert data to a DDL representation')
+                               UnknownMigration, ConcurrentMigration,
+                               MigrationError, PreflightFailed,
+                               SchemaDisagreement, MissingDownMigration,
+                               WaitTimeout, Lease)
+from cassandra_migrate.cql import CqlSplitter, CqlInspector
+from cassandra_migrate.data import DataFile
+from cassandra_migrate import trace
+from cassandra_migrate.steps import Return, Sleep, call, blocking, run
+from cassandra_migrate.throttle import ThrottledSession, is_timeout
+from cassandra_migrate.timing import (Timing, version_timing,
+                                      estimate_durations, total_duration,
+                                      format_duration)
+from cassandra_migrate.backend import DriverBackend, decode_content
+
+
+def import_migration_module(path):
+    """Import a Python migration by path, even if its name contains dots"""
+    name, _ = os.path.splitext(os.path.basename(path))
+    if '.' not in name:
+        return importlib.import_module(name)
+
+    try:
+        from importlib.util import spec_from_file_location, module_from_spec
+    except ImportError:  # Python 2
+        import imp
+        return imp.load_source(name, path)
+
+    spec = spec_from_file_location(name, path)
+    module = module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
 
 
 def confirmation_required(func):
@@ -110,84 +83,108 @@ class Migrator(object):
     - user, password: authentication options. May be None to not use it.
     - hosts: comma-separated list of contact points
     - port: connection port
+
+    Storage operations go through a `Backend`. Unless one is given
+    explicitly, a `DriverBackend` is built from the connection options. It
+    can share an application's existing driver `cluster` or `session`, and
+    takes driver settings from the profile's `connection` block, overridden
+    by those in `connection`.
+
+    `lock_mode` chooses how concurrent runs are excluded:
+    - 'lwt': every version is created and finalized with an LWT
+    - 'lease': a single lease is taken per run with an LWT, and version
+      rows are written with plain writes while it is held. All runners
+      against a keyspace must use the same mode.
+
+    If a `TraceReport` is given as `trace_report`, statements of CQL
+    migrations are executed with query tracing, and their traces recorded
+    in it.
     """
 
     logger = logging.getLogger("Migrator")
 
+    LOCK_MODES = ('lwt', 'lease')
+
+    BULK_BATCH_SIZE = 50
+
+    # Rows of data file migrations inserted at the same time
+    DATA_CONCURRENCY = 32
+
+    # Keyspaces created at the same time by `clone`
+    CLONE_CONCURRENCY = 8
+
+    # Schema versions can be ignored, required to agree, or waited on until
+    # they agree, backing off from the initial to the maximum delay
+    SCHEMA_CHECKS = ('off', 'fail', 'wait')
+    SCHEMA_INITIAL_DELAY = 0.5
+    SCHEMA_MAX_DELAY = 8
+
+    # Runners waiting for a concurrent migration poll the version history
+    # with jittered exponential backoff, for up to the timeout by default
+    WAIT_INITIAL_DELAY = 0.5
+    WAIT_MAX_DELAY = 8
+    WAIT_TIMEOUT = 600
+
     def __init__(self, config, profile='dev', hosts=['127.0.0.1'], port=9042,
                  user=None, password=None, host_cert_path=None,
-                 client_key_path=None, client_cert_path=None):
+                 client_key_path=None, client_cert_path=None, backend=None,
+                 lock_mode='lwt', lease_ttl=60, throttle=None,
+                 schema_check='off', schema_wait=60, cluster=None,
+                 session=None, connection=None, trace_report=None):
         self.config = config
+        self.throttle = throttle
+        self.trace_report = trace_report
+        self._prepared = {}
+        self._history_hashes = None
+
+        if lock_mode not in self.LOCK_MODES:
+            raise ValueError("Invalid lock mode '{}'".format(lock_mode))
+        if schema_check not in self.SCHEMA_CHECKS:
+            raise ValueError("Invalid schema check '{}'".format(schema_check))
+        if not lease_ttl > 0:
+            raise ValueError("Invalid lease TTL {}, must be > 0".format(
+                lease_ttl))
+
+        self.schema_check = schema_check
+        self.schema_wait = schema_wait
+
+        self.lock_mode = lock_mode
+        self.lease_ttl = lease_ttl
+        self._lease = None
 
         try:
             self.current_profile = self.config.profiles[profile]
         except KeyError:
             raise ValueError("Invalid profile name '{}'".format(profile))
 
-        if user:
-            auth_provider = PlainTextAuthProvider(user, password)
-        else:
-            auth_provider = None
-
-        if host_cert_path:
-            ssl_options = self._build_ssl_options(
-                host_cert_path,
-                client_key_path,
-                client_cert_path)
-        else:
-            ssl_options = None
-
-        self.cluster = Cluster(
-            contact_points=hosts,
-            port=port,
-            auth_provider=auth_provider,
-            max_schema_agreement_wait=300,
-            control_connection_timeout=10,
-            connect_timeout=30,
-            ssl_options=ssl_options)
+        if backend is None:
+            settings = dict(self.current_profile.get('connection') or {})
+            settings.update(connection or {})
+            backend = DriverBackend(
+                self.config.keyspace, self.config.migrations_table,
+                hosts=hosts, port=port, user=user, password=password,
+                host_cert_path=host_cert_path,
+                client_key_path=client_key_path,
+                client_cert_path=client_cert_path,
+                cluster=cluster, session=session, connection=settings)
 
-        self._session = None
+        self.backend = backend
 
     def __enter__(self):
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        if self._session is not None:
-            self._session.shutdown()
-            self._session = None
-
-        if self.cluster is not None:
-            self.cluster.shutdown()
-            self.cluster = None
-
-    def _build_ssl_options(self, host_cert_path, client_key_path,
-                           client_cert_path):
-        return {
-            'ca_certs': host_cert_path,
-            'certfile': client_cert_path,
-            'keyfile': client_key_path
-        }
+        self.backend.shutdown()
 
-    def _check_cluster(self):
-        """Check if the cluster is still alive, raise otherwise"""
-        if not self.cluster:
-            raise RuntimeError("Cluster has shut down")
-
-    def _init_session(self):
-        if not self._session:
-            s = self._session = self.cluster.connect()
-            s.default_consistency_level = ConsistencyLevel.ALL
-            s.default_serial_consistency_level = ConsistencyLevel.SERIAL
-            s.default_timeout = 120
+    @property
+    def cluster(self):
+        """Driver cluster of the backend, None if it has none"""
+        return getattr(self.backend, 'cluster', None)
 
     @property
     def session(self):
-        """Initialize and configure a  C* driver session if needed"""
-
-        self._check_cluster()
-        self._init_session()
-
-        return self._session
+        """Session handed to Python migrations"""
+        return self.backend.session
 
     def _get_target_version(self, v):
         """
@@ -219,26 +216,42 @@ class Migrator(object):
                              'or the name of an existing migration')
         return num
 
-    def _q(self, query, **kwargs):
+    def _check_cluster(self):
+        """Check if the backend is still usable, raise otherwise"""
+        self.backend.check()
+
+    @trace.traced('check_schema_agreement')
+    def _check_schema_agreement(self):
         """
-        Format a query with the configured keyspace and migration table
+        Make sure all reachable nodes have the same schema version
 
-        `keyspace` and `table` are interpolated as named arguments
+        Depending on `schema_check`, raise `SchemaDisagreement` right away if
+        they do not, or wait for them to agree for up to `schema_wait`
+        seconds, polling with exponential backoff.
         """
-        return query.format(
-            keyspace=self.config.keyspace, table=self.config.migrations_table,
-            **kwargs)
 
-    def _execute(self, query, *args, **kwargs):
-        """Execute a query with the current session"""
+        if self.schema_check == 'off':
+            return
+
+        deadline = default_timer() + self.schema_wait
+        delay = self.SCHEMA_INITIAL_DELAY
+        while True:
+            nodes = self.backend.schema_versions()
+            if len(set(node.schema_version for node in nodes)) <= 1:
+                return
 
-        self.logger.debug('Executing query: {}'.format(query))
-        return self.session.execute(query, *args, **kwargs)
+            remaining = deadline - default_timer()
+            if self.schema_check == 'fail' or remaining <= 0:
+                raise SchemaDisagreement(nodes)
 
-    def _keyspace_exists(self):
-        self._init_session()
+            self.logger.warning(
+                'Schema versions disagree across {} nodes, waiting'.format(
+                    len(nodes)))
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, self.SCHEMA_MAX_DELAY)
 
-        return self.config.keyspace in self.cluster.metadata.keyspaces
+    def _keyspace_exists(self):
+        return self.backend.keyspace_exists()
 
     def _ensure_keyspace(self):
         """Create the keyspace if it does not exist"""
@@ -249,40 +262,153 @@ class Migrator(object):
         self.logger.info("Creating keyspace '{}'".format(self.config.keyspace))
 
         profile = self.current_profile
-        self._execute(self._q(
-            CREATE_KEYSPACE,
-            replication=cassandra_ddl_repr(profile['replication']),
-            durable_writes=cassandra_ddl_repr(profile['durable_writes'])))
-
-        self.cluster.refresh_keyspace_metadata(self.config.keyspace)
+        self.backend.create_keyspace(profile['replication'],
+                                     profile['durable_writes'])
 
     def _table_exists(self):
-        self._init_session()
-
-        ks_metadata = self.cluster.metadata.keyspaces.get(self.config.keyspace,
-                                                          None)
         # Fail if the keyspace is missing. If it should be created
         # automatically _ensure_keyspace() must be called first.
-        if not ks_metadata:
+        if not self._keyspace_exists():
             raise ValueError("Keyspace '{}' does not exist, "
                              "stopping".format(self.config.keyspace))
 
-        return self.config.migrations_table in ks_metadata.tables
+        return self.backend.table_exists()
 
     def _ensure_table(self):
-        """Create the migration table if it does not exist"""
+        """Create the migration and summary tables if they do not exist"""
 
         if self._table_exists():
+            self.backend.upgrade_table()
+        else:
+            self.logger.info(
+                "Creating table '{table}' in keyspace '{keyspace}'".format(
+                    keyspace=self.config.keyspace,
+                    table=self.config.migrations_table))
+
+            self.backend.create_table()
+
+        if not self.backend.summary_table_exists():
+            self.logger.info("Creating summary table for '{}'".format(
+                self.config.migrations_table))
+            self.backend.create_summary_table()
+
+    def _history_hash(self, version):
+        """Running hash of the first `version` migrations"""
+        if self._history_hashes is None:
+            self._history_hashes = Migration.history_hashes(
+                self.config.migrations)
+        return self._history_hashes[version - 1] if version else b''
+
+    def _summary_matches(self, summary, target):
+        """
+        Whether a summary row shows the database is at or past the `target`
+        version, with a history matching the migrations
+        """
+        if summary is None:
+            return False
+
+        target_version = self._get_target_version(target)
+        if not target_version <= summary.version <= \
+                len(self.config.migrations):
+            return False
+
+        return bytearray(summary.history_hash) == \
+            bytearray(self._history_hash(summary.version))
+
+    def _run(self, step):
+        """Run a migration step (see `steps`) with blocking calls"""
+        return run(step, self.backend)
+
+    def _up_to_date(self, target):
+        """
+        Step checking with a single read of the summary row if there is
+        nothing to migrate, to skip the full verification of the version
+        history
+        """
+        with trace.span('check_summary'):
+            summary = yield call('read_summary')
+
+        up_to_date = self._summary_matches(summary, target)
+        if up_to_date:
+            self.logger.info('Database is already up-to-date')
+        yield Return(up_to_date)
+
+    def _update_summary_step(self, version):
+        """Step recording that the history is fully applied to `version`"""
+        if version:
+            yield call('write_summary', version, self._history_hash(version))
+
+    def _update_summary(self, version):
+        """Record that the history is fully applied up to `version`"""
+        self._run(self._update_summary_step(version))
+
+    @property
+    def _content_encoding(self):
+        """Encoding to store new versions' content with"""
+        return 'zlib' if self.config.compress_content else None
+
+    def _ensure_lease_table(self):
+        """Create the lease table if it does not exist"""
+
+        if self.backend.lease_table_exists():
             return
 
-        self.logger.info(
-            "Creating table '{table}' in keyspace '{keyspace}'".format(
-                keyspace=self.config.keyspace,
-                table=self.config.migrations_table))
+        self.logger.info("Creating lease table for '{}'".format(
+            self.config.migrations_table))
+        self.backend.create_lease_table()
+
+    def _take_lease(self, always=False):
+        """
+        Acquire the migration lease, when in lease mode or if `always` is
+        set, and it is not held already
+
+        Returns the Lease to release, or None if none was taken.
+        """
+
+        if self._lease is not None or \
+           (self.lock_mode != 'lease' and not always):
+            return None
+
+        self._ensure_lease_table()
+        lease = Lease(self.backend, self.lease_ttl)
+        lease.acquire()
+        self._lease = lease
+        return lease
+
+    def _release_lease(self, lease):
+        self._lease = None
+        lease.release()
+
+    @contextmanager
+    def _locked(self, always=False):
+        """
+        Hold the migration lease during the block, when in lease mode or if
+        `always` is set
+        """
+
+        lease = self._take_lease(always)
+        try:
+            yield
+        finally:
+            if lease is not None:
+                self._release_lease(lease)
+
+    def _locked_step(self, step):
+        """Step running `step` while holding the lease, like `_locked`"""
 
-        self._execute(self._q(CREATE_MIGRATIONS_TABLE))
-        self.cluster.refresh_table_metadata(self.config.keyspace,
-                                            self.config.migrations_table)
+        lease = yield blocking(self._take_lease)
+        try:
+            result = yield step
+        finally:
+            if lease is not None:
+                yield blocking(self._release_lease, lease)
+
+        yield Return(result)
+
+    def _check_lease(self):
+        """Make sure the lease is still held before a plain write"""
+        if self._lease is not None:
+            self._lease.check()
 
     def _verify_migrations(self, migrations, ignore_failed=False,
                            ignore_concurrent=False):
@@ -298,10 +424,31 @@ class Migrator(object):
         from 1 and incrementing linearly.
         """
 
-        # Load all the currently existing versions and sort them by version
-        # number, as Cassandra can only sort it for us by partition.
-        cur_versions = self._execute(self._q(
-            'SELECT * FROM "{keyspace}"."{table}"'))
+        return self._run(self._verify_migrations_step(
+            migrations, ignore_failed=ignore_failed,
+            ignore_concurrent=ignore_concurrent))
+
+    def _verify_migrations_step(self, migrations, ignore_failed=False,
+                                ignore_concurrent=False):
+        """Step verifying the version history, like `_verify_migrations`"""
+
+        with trace.span('verify_migrations'):
+            cur_versions = yield call('list_versions')
+            result = self._verify_versions(
+                cur_versions, migrations, ignore_failed=ignore_failed,
+                ignore_concurrent=ignore_concurrent)
+
+        yield Return(result)
+
+    def _verify_versions(self, cur_versions, migrations, ignore_failed=False,
+                         ignore_concurrent=False):
+        """
+        Verify already loaded versions against the migrations, like
+        `_verify_migrations`, without accessing the database
+        """
+
+        # Sort the versions by version number, as Cassandra can only sort
+        # them for us by partition.
         cur_versions = sorted(cur_versions, key=lambda v: v.version)
 
         last_version = None
@@ -339,9 +486,9 @@ class Migrator(object):
                 raise ConcurrentMigration(version.version, version.name)
 
             # A stored version's migrations differs from the one in the FS.
-            if version.content != migration.content or \
-               version.name != migration.name or \
-               bytearray(version.checksum) != bytearray(migration.checksum):
+            if version.name != migration.name or \
+               bytearray(version.checksum) != bytearray(migration.checksum) or \
+               decode_content(version) != migration.content:
                 raise InconsistentState(migration, version)
 
         if not last_version:
@@ -362,7 +509,7 @@ class Migrator(object):
 
     def _create_version(self, version, migration):
         """
-        Write an in-progress version entry to C*
+        Step writing an in-progress version entry to C*
 
         The migration is inserted with the given `version` number if and only
         if it does not exist already (using a CompareAndSet operation).
@@ -371,44 +518,65 @@ class Migrator(object):
         can continue and actually execute it. Otherwise, there was a concurrent
         write and we must fail to allow the other write to continue.
 
+        When holding the lease, a plain write is used instead.
         """
 
         self.logger.info('Writing in-progress migration version {}: {}'.format(
             version, migration))
 
+        self._check_lease()
         version_id = uuid.uuid4()
-        result = self._execute(
-            self._q(CREATE_DB_VERSION),
-            (version_id, version, migration.name, migration.content,
-             bytearray(migration.checksum), Migration.State.IN_PROGRESS))
+        applied = yield call(
+            'create_version', version_id, version, migration,
+            Migration.State.IN_PROGRESS, conditional=self._lease is None,
+            content_encoding=self._content_encoding)
 
-        if not result or not result[0].applied:
+        if not applied:
             raise ConcurrentMigration(version, migration.name)
 
-        return version_id
+        yield Return(version_id)
 
-    def _apply_cql_migration(self, version, migration):
+    def _apply_cql_migration(self, version, migration, start=0):
         """
-        Persist and apply a cql migration
+        Step persisting and applying a cql migration
 
         First create an in-progress version entry, apply the script, then
         finalize the entry as succeeded, failed or skipped.
+
+        The first `start` statements are skipped, when resuming a failed
+        migration. On failure, the number of statements applied is recorded
+        in the raised `FailedMigration`. Returns the migration's statement
+        count, including any skipped statements.
         """
 
         self.logger.info('Applying cql migration')
 
-        statements = CqlSplitter.split(migration.content)
+        statements = migration.statements
+        applied = start
 
         try:
-            if statements:
+            if start:
+                self.logger.info('Resuming migration at statement '
+                                 '{}/{}'.format(start + 1, len(statements)))
+            elif statements:
                 self.logger.info('Executing migration with '
                                  '{} CQL statements'.format(len(statements)))
 
-            for statement in statements:
-                self.session.execute(statement)
+            for i, statement in enumerate(statements[start:], start + 1):
+                with trace.span('statement', args={'index': i,
+                                                   'cql': statement[:200]}):
+                    if self.trace_report is None:
+                        yield self._execute_statement(statement)
+                    else:
+                        yield self._execute_traced(version, migration,
+                                                   statement)
+                applied = i
         except Exception:
             self.logger.exception('Failed to execute migration')
-            raise FailedMigration(version, migration.name)
+            raise FailedMigration(version, migration.name,
+                                  statement_index=applied)
+
+        yield Return(len(statements))
 
     def _apply_python_migration(self, version, migration):
         """
@@ -420,79 +588,244 @@ class Migrator(object):
         self.logger.info('Applying python script')
 
         try:
-            mod, _ = os.path.splitext(os.path.basename(migration.path))
-            migration_script = importlib.import_module(mod)
-            migration_script.execute(self._session)
+            migration_script = import_migration_module(migration.path)
+            migration_script.execute(self._script_session())
         except Exception:
             self.logger.exception('Failed to execute script')
             raise FailedMigration(version, migration.name)
 
-    def _apply_migration(self, version, migration, skip=False):
+    def _apply_data_migration(self, version, migration):
+        """
+        Persist and apply a data file migration
+
+        Rows are streamed from the file, and inserted concurrently.
+        """
+        self.logger.info('Loading data file')
+
+        try:
+            data = DataFile(migration)
+            keyspace, table = data.table
+            count = self.backend.insert_rows(
+                table, data.rows(), keyspace=keyspace,
+                concurrency=self.DATA_CONCURRENCY, throttle=self.throttle)
+        except Exception:
+            self.logger.exception('Failed to load data file')
+            raise FailedMigration(version, migration.name)
+
+        self.logger.info('Inserted {} rows into {}'.format(count, table))
+        return count
+
+    def _execute_statement(self, statement, traced=False):
+        """
+        Step executing a statement of a CQL migration, throttled if enabled
+
+        With `traced`, the statement is traced, and its execution time and
+        trace are returned (see `Backend.execute_traced`). Retrieving traces
+        polls `system_traces`, which the driver only does synchronously.
+        """
+        query = self._statement_query(statement)
+        if traced:
+            operation = blocking(self.backend.execute_traced, query)
+        else:
+            operation = call('execute', query)
+
+        throttle = self.throttle
+        if throttle is None:
+            result = yield operation
+        else:
+            yield blocking(throttle.wait, len(statement.encode('utf-8')))
+            start = throttle.clock()
+            try:
+                result = yield operation
+            except Exception as e:
+                throttle.record(throttle.clock() - start, is_timeout(e))
+                raise
+
+            # Only the execution is measured, without retrieving the trace
+            throttle.record(result[0] if traced else throttle.clock() - start)
+
+        yield Return(result)
+
+    def _execute_traced(self, version, migration, statement):
+        """
+        Step executing a statement with tracing, recording it in the report
+
+        Its wall time only covers the execution, not waiting for the
+        throttle or retrieving the trace, so the time not accounted for by
+        the trace is spent on the network and in the driver.
         """
-        Persist and apply a migration
+        elapsed, statement_trace = yield self._execute_statement(statement,
+                                                                 traced=True)
+        self.trace_report.add(version, migration.name, statement, elapsed,
+                              statement_trace)
+
+    def _statement_query(self, statement):
+        """Query to send for a statement, prepared if the pre-flight did"""
+        return self._prepared.get(statement, statement)
+
+    def _script_session(self):
+        """Session handed to Python migrations, throttled if enabled"""
+        if self.throttle is None:
+            return self.session
+        return ThrottledSession(self.session, self.throttle)
+
+    def _run_migration(self, version, migration, start=0):
+        """
+        Run a migration's script, without recording its version
+
+        Returns the number of statements executed (rows inserted, for data
+        files), if known. CQL migrations can be started at statement `start`.
+        """
+        return self._run(self._run_migration_step(version, migration,
+                                                  start=start))
+
+    def _run_migration_step(self, version, migration, start=0):
+        """Step running a migration's script, like `_run_migration`"""
+        if migration.is_python:
+            yield blocking(self._apply_python_migration, version, migration)
+            count = None
+        elif migration.is_data:
+            count = yield blocking(self._apply_data_migration, version,
+                                   migration)
+        else:
+            count = yield self._apply_cql_migration(version, migration,
+                                                    start=start)
+
+        yield Return(count)
+
+    def _resume_index(self, failed, migration):
+        """
+        Number of statements of a failed CQL migration that can be skipped
+        when retrying it
+
+        The statements applied before the failure, as recorded with its
+        version, are only skipped if they are unchanged in the migration.
+        Fixing the failed statement, or any later one, keeps them valid.
+        """
+        index = getattr(failed, 'statement_index', None)
+        if not index or failed.name != migration.name or \
+                migration.is_python or migration.is_data:
+            return 0
+
+        applied = CqlSplitter.split(decode_content(failed))[:index]
+        if migration.statements[:index] != applied:
+            self.logger.warning(
+                'Statements applied by the failed migration changed, '
+                'running it from the start')
+            return 0
+
+        return index
+
+    @staticmethod
+    def _statement_count(migration):
+        """Number of statements of a migration, None if not known upfront"""
+        if migration.is_python or migration.is_data:
+            return None
+        return len(migration.statements)
+
+    def _apply_migration(self, version, migration, skip=False, start=0):
+        """
+        Step persisting and applying a migration
 
         When `skip` is True, do everything but actually run the script, for
-        example, when baselining instead of migrating.
+        example, when baselining instead of migrating. Otherwise, the start
+        and end times, statement count and size of the script are recorded
+        with the version, and its Timing is returned. If a CQL migration
+        fails, the number of its statements applied is recorded too, so a
+        retry can resume from `start`.
         """
 
-        self.logger.info('Advancing to version {}'.format(version))
+        with trace.span('migration', args={'version': version,
+                                           'migration': migration.name,
+                                           'skip': skip}):
+            self.logger.info('Advancing to version {}'.format(version))
 
-        version_uuid = self._create_version(version, migration)
-        new_state = Migration.State.FAILED
-        sys.path.append(self.config.migrations_path)
+            version_uuid = yield self._create_version(version, migration)
+            new_state = Migration.State.FAILED
+            sys.path.append(self.config.migrations_path)
 
-        result = None
+            applied = False
+            columns = {}
 
-        try:
-            if skip:
-                self.logger.info('Migration is marked for skipping, '
-                                 'not actually running script')
-            else:
-                if migration.is_python:
-                    self._apply_python_migration(version, migration)
+            try:
+                if skip:
+                    self.logger.info('Migration is marked for skipping, '
+                                     'not actually running script')
                 else:
-                    self._apply_cql_migration(version, migration)
-        except Exception:
-            self.logger.exception('Failed to execute migration')
-            raise FailedMigration(version, migration.name)
+                    columns['started_at'] = datetime.datetime.utcnow()
+                    columns['byte_count'] = \
+                        len(migration.content.encode('utf-8'))
+                    columns['statement_count'] = \
+                        yield self._run_migration_step(version, migration,
+                                                       start=start)
+            except Exception as e:
+                index = getattr(e, 'statement_index', None)
+                if index is not None:
+                    columns['statement_index'] = index
+
+                self.logger.exception('Failed to execute migration')
+                raise FailedMigration(version, migration.name,
+                                      statement_index=index)
+            else:
+                new_state = (Migration.State.SUCCEEDED if not skip
+                             else Migration.State.SKIPPED)
+            finally:
+                if 'started_at' in columns:
+                    columns['finished_at'] = datetime.datetime.utcnow()
+
+                self.logger.info('Finalizing migration version with '
+                                 'state {}'.format(new_state))
+                self._check_lease()
+                applied = yield call(
+                    'finalize_version', version_uuid, new_state,
+                    Migration.State.IN_PROGRESS,
+                    conditional=self._lease is None, columns=columns)
+
+            if not applied:
+                raise ConcurrentMigration(version, migration.name)
+
+        if skip:
+            yield Return(None)
         else:
-            new_state = (Migration.State.SUCCEEDED if not skip
-                         else Migration.State.SKIPPED)
-        finally:
-            self.logger.info('Finalizing migration version with '
-                             'state {}'.format(new_state))
-            result = self._execute(
-                self._q(FINALIZE_DB_VERSION),
-                (new_state, version_uuid, Migration.State.IN_PROGRESS))
-
-        if not result or not result[0].applied:
-            raise ConcurrentMigration(version, migration.name)
+            yield Return(Timing((columns['finished_at'] -
+                                 columns['started_at']).total_seconds(),
+                                columns['statement_count']))
 
     def _cleanup_previous_versions(self, cur_versions):
+        """Delete the last version if it failed, and return it"""
         if not cur_versions:
-            return
+            return None
 
         last_version = cur_versions[-1]
         if last_version.state != Migration.State.FAILED:
-            return
+            return None
 
         self.logger.warn(
             'Cleaning up previous failed migration '
             '(version {}): {}'.format(last_version.version, last_version.name))
 
-        result = self._execute(
-            self._q(DELETE_DB_VERSION),
-            (last_version.id, Migration.State.FAILED))
-
-        if not result[0].applied:
+        applied = self.backend.delete_version(last_version.id,
+                                              Migration.State.FAILED)
+        if not applied:
             raise ConcurrentMigration(last_version.version,
                                       last_version.name)
 
+        return last_version
+
     def _advance(self, migrations, target, cur_versions, skip=False,
                  force=False):
-        """Apply all necessary migrations to reach a target version"""
+        """
+        Step applying all necessary migrations to reach a target version
+
+        Returns the last version applied, if any. The summary row is cleared
+        if any migration fails, as the history is not clean anymore. With
+        `force`, a previously failed CQL migration is resumed from its failed
+        statement when possible.
+        """
+        failed = None
         if force:
-            self._cleanup_previous_versions(cur_versions)
+            failed = yield blocking(self._cleanup_previous_versions,
+                                    cur_versions)
 
         target_version = self._get_target_version(target)
 
@@ -500,15 +833,147 @@ class Migrator(object):
             # Set default keyspace so migrations don't need to refer to it
             # manually
             # Fixes https://github.com/Cobliteam/cassandra-migrate/issues/5
-            self.session.execute('USE {};'.format(self.config.keyspace))
+            yield blocking(self.backend.use_keyspace)
+
+        migrations = [(version, migration) for version, migration in migrations
+                      if version <= target_version]
+        if not skip:
+            timings = [version_timing(v) for v in cur_versions]
+            counts = [self._statement_count(migration)
+                      for _, migration in migrations]
+            start = default_timer()
+
+        try:
+            for i, (version, migration) in enumerate(migrations):
+                resume_at = 0
+                if failed is not None and failed.version == version:
+                    resume_at = self._resume_index(failed, migration)
+
+                timing = yield self._apply_migration(version, migration,
+                                                     skip=skip,
+                                                     start=resume_at)
+                if skip:
+                    continue
+
+                yield blocking(self._check_schema_agreement)
+
+                timings.append(timing)
+                self._log_progress(i + 1, counts, timings, start)
+        except Exception:
+            yield call('clear_summary')
+            raise
+
+        yield blocking(self.backend.refresh_schema)
+        yield Return(migrations[-1][0] if migrations else None)
+
+    def _log_progress(self, applied, counts, timings, start):
+        """
+        Log how many of the migrations with statement `counts` were applied
+        since `start`, and estimate the remaining time from the `timings`
+        history, including the migrations just applied
+        """
+        eta = total_duration(estimate_durations(timings, counts[applied:]))
+        self.logger.info(
+            'Applied {}/{} migrations in {}, ETA {}'.format(
+                applied, len(counts),
+                format_duration(default_timer() - start),
+                format_duration(eta) if applied < len(counts) else 'done'))
+
+    @trace.traced('preflight')
+    def _preflight(self, migrations):
+        """
+        Check pending CQL migrations before applying any of them
+
+        Every statement is checked lexically, and DML statements are prepared
+        concurrently against the cluster, except those acting on tables that
+        do not exist yet, or whose schema is changed by an earlier pending
+        statement, as they can only be checked once it is applied. Only the
+        prepared statements repeated in the migrations are worth reusing:
+        they are kept, and used when running the migrations, until the end of
+        the run. The others are left to expire from the server's cache.
+        """
+
+        problems = []
+        to_prepare = {}
+        repeats = Counter()
+        tables = set(self.backend.list_tables())
+        self.backend.use_keyspace()
+        changed = set()
+
+        def local_table(keyspace_table):
+            """Name of a table in the managed keyspace, if it is one"""
+            keyspace, table = keyspace_table or (None, None)
+            return table if keyspace in (None, self.config.keyspace) else None
 
         for version, migration in migrations:
-            if version > target_version:
-                break
+            if migration.is_python or migration.is_data:
+                continue
+
+            for statement, kind in zip(migration.statements,
+                                       migration.statement_kinds):
+                for problem in CqlInspector.problems(statement):
+                    problems.append((version, migration.name, statement,
+                                     problem))
+
+                if kind == 'ddl':
+                    changed.add(local_table(CqlInspector.ddl_table(statement)))
+                elif kind == 'dml':
+                    table = local_table(CqlInspector.dml_table(statement))
+                    if table in tables and table not in changed:
+                        to_prepare.setdefault(
+                            statement, (version, migration.name))
+                        repeats[statement] += 1
+
+        self.logger.info('Pre-flight: preparing {} statements'.format(
+            len(to_prepare)))
+        prepared, errors = self.backend.prepare(list(to_prepare))
+        for statement, error in errors:
+            version, name = to_prepare[statement]
+            problems.append((version, name, statement, str(error)))
+
+        if problems:
+            raise PreflightFailed(sorted(problems, key=lambda p: p[0]))
+
+        self._prepared = dict((statement, query)
+                              for statement, query in prepared.items()
+                              if repeats[statement] > 1)
+
+    def _bulk_baseline(self, target, batch_size):
+        """
+        Baseline a database by writing all skipped versions in batches
+
+        A single LWT is needed to take the lease, which excludes other bulk
+        baselines and runners in 'lease' lock mode while the version history
+        is verified (it must be empty or consistent) and the new versions are
+        written. Runners in 'lwt' lock mode never read the lease, and must
+        not run concurrently, as the batches are not conditional.
+        """
 
-            self._apply_migration(version, migration, skip=skip)
+        with self._locked(always=True):
+            last_version, cur_versions, pending_migrations = \
+                self._verify_migrations(self.config.migrations)
 
-        self.cluster.refresh_schema_metadata()
+            target_version = self._get_target_version(target)
+            pending_migrations = [(version, migration)
+                                  for version, migration in pending_migrations
+                                  if version <= target_version]
+
+            total = len(pending_migrations)
+            for start in range(0, total, batch_size):
+                chunk = pending_migrations[start:start + batch_size]
+
+                self._check_lease()
+                self.backend.create_versions([
+                    (uuid.uuid4(), version, migration,
+                     Migration.State.SKIPPED)
+                    for version, migration in chunk],
+                    content_encoding=self._content_encoding)
+
+                self.logger.info('Baselined {}/{} versions'.format(
+                    start + len(chunk), total))
+
+            if pending_migrations:
+                self._update_summary(pending_migrations[-1][0])
 
     def baseline(self, opts):
         """Baseline a database, by advancing migration state without changes"""
@@ -516,50 +981,425 @@ class Migrator(object):
         self._check_cluster()
         self._ensure_table()
 
+        if getattr(opts, 'bulk', False):
+            self._ensure_lease_table()
+            self._bulk_baseline(opts.db_version,
+                                getattr(opts, 'batch_size', None) or
+                                self.BULK_BATCH_SIZE)
+            return
+
+        self._run(self._locked_step(self._baseline(opts.db_version)))
+
+    def _baseline(self, target):
+        """Step advancing migration state to `target` without changes"""
         last_version, cur_versions, pending_migrations = \
-            self._verify_migrations(self.config.migrations,
-                                    ignore_failed=False)
+            yield self._verify_migrations_step(self.config.migrations)
 
-        self._advance(pending_migrations, opts.db_version, cur_versions,
-                      skip=True)
+        applied = yield self._advance(pending_migrations, target,
+                                      cur_versions, skip=True)
+        yield self._update_summary_step(applied or last_version)
+
+    def _prepare_keyspace(self):
+        """Check the cluster, then create the keyspace and table if needed"""
+        self._check_cluster()
+        self._check_schema_agreement()
+
+        self._ensure_keyspace()
+        self._ensure_table()
+
+    def _wait_delays(self, timeout):
+        """
+        Delays to wait between polls, growing exponentially with random
+        jitter, so waiting runners spread out, until `timeout` seconds passed
+        """
+        deadline = default_timer() + timeout
+        delay = self.WAIT_INITIAL_DELAY
+        while True:
+            remaining = deadline - default_timer()
+            if remaining <= 0:
+                return
+
+            yield min(delay * random.uniform(0.5, 1), remaining)
+            delay = min(delay * 2, self.WAIT_MAX_DELAY)
+
+    def _concurrent_finished(self, versions):
+        """
+        Whether no version is in progress anymore, raising FailedMigration
+        if the last one failed
+        """
+        versions = sorted(versions, key=lambda v: v.version)
+        if any(v.state == Migration.State.IN_PROGRESS for v in versions):
+            return False
+
+        if versions and versions[-1].state == Migration.State.FAILED:
+            failed = versions[-1]
+            self.logger.error('Migration by another runner failed '
+                              '(version {}): {}'.format(failed.version,
+                                                        failed.name))
+            raise FailedMigration(failed.version, failed.name)
+
+        return True
 
     @confirmation_required
     def migrate(self, opts):
         """
         Migrate a database to a given version, applying any needed migrations
+
+        With `opts.wait`, a migration by another runner is waited on, for up
+        to `opts.wait_timeout` seconds, instead of failing.
+        """
+        self._run(self._migrate(opts.db_version, force=opts.force,
+                                preflight=getattr(opts, 'preflight', False),
+                                wait=getattr(opts, 'wait', False),
+                                wait_timeout=getattr(opts, 'wait_timeout',
+                                                     None)))
+
+    def _migrate(self, target, force=False, preflight=False, wait=False,
+                 wait_timeout=None):
         """
+        Step migrating a database to `target`, like `migrate`
 
-        self._check_cluster()
+        With `wait`, any concurrent migration is waited on instead of
+        failing, then the version history is verified again.
+        """
+        if not wait:
+            yield self._migrate_once(target, force, preflight)
+            return
 
-        self._ensure_keyspace()
-        self._ensure_table()
+        timeout = wait_timeout or self.WAIT_TIMEOUT
+        delays = self._wait_delays(timeout)
+        while True:
+            try:
+                yield self._migrate_once(target, force, preflight)
+                return
+            except ConcurrentMigration as e:
+                self.logger.info('{}, waiting for it to finish'.format(e))
+
+            for delay in delays:
+                yield Sleep(delay)
+                versions = yield call('list_versions')
+                if self._concurrent_finished(versions):
+                    break
+            else:
+                raise WaitTimeout(self.config.keyspace, timeout)
+
+    def _migrate_once(self, target, force, preflight):
+        yield blocking(self._prepare_keyspace)
+        if not force and (yield self._up_to_date(target)):
+            return
 
+        yield self._locked_step(self._migrate_pending(target, force,
+                                                      preflight))
+
+    def _migrate_pending(self, target, force, preflight):
+        """Step applying the pending migrations, holding the lock"""
         last_version, cur_versions, pending_migrations = \
-            self._verify_migrations(self.config.migrations,
-                                    ignore_failed=opts.force)
+            yield self._verify_migrations_step(self.config.migrations,
+                                               ignore_failed=force)
 
-        self._advance(pending_migrations, opts.db_version, cur_versions,
-                      force=opts.force)
+        try:
+            if preflight and pending_migrations:
+                target_version = self._get_target_version(target)
+                yield blocking(self._preflight,
+                               [(version, migration)
+                                for version, migration in pending_migrations
+                                if version <= target_version])
+
+            applied = yield self._advance(pending_migrations, target,
+                                          cur_versions, force=force)
+        finally:
+            self._prepared = {}
+
+        yield self._update_summary_step(applied or last_version)
+
+    def _rollback_target(self, target, cur_versions):
+        """
+        Parse the version to roll back to: the one before the latest stored
+        version by default, and 0 to roll back everything
+        """
+        if target is None:
+            return cur_versions[-1].version - 1 if cur_versions else 0
+        if target in (0, '0'):
+            return 0
+        return self._get_target_version(target)
+
+    def _rollback_version(self, version, down):
+        """
+        Run the down script of a stored version, then delete the version
+
+        The version is deleted with an LWT, only if its state did not
+        change. If the down script fails, the version is marked as failed
+        instead, as its changes might be partially reverted. Either way, the
+        statements recorded as applied by a failed migration are forgotten
+        first, so a forced retry never skips any.
+        """
+
+        self.logger.info('Rolling back version {}: {}'.format(
+            version.version, version.name))
+
+        forget = {'statement_index': None}
+        with trace.span('rollback', args={'version': version.version,
+                                          'migration': version.name}):
+            if getattr(version, 'statement_index', None) is not None:
+                applied = self.backend.finalize_version(
+                    version.id, version.state, version.state, columns=forget)
+                if not applied:
+                    raise ConcurrentMigration(version.version, version.name)
+
+            try:
+                self._run_migration(version.version, down)
+            except FailedMigration:
+                self.backend.finalize_version(version.id,
+                                              Migration.State.FAILED,
+                                              version.state, columns=forget)
+                raise
+
+            applied = self.backend.delete_version(version.id, version.state)
+            if not applied:
+                raise ConcurrentMigration(version.version, version.name)
+
+    @confirmation_required
+    def rollback(self, opts):
+        """
+        Roll back a database to a given version, running the down scripts of
+        the later versions in reverse order
+
+        Failed versions are rolled back too, so their down scripts should
+        tolerate partially applied changes.
+        """
+
+        self._check_cluster()
+        if not self._table_exists():
+            self.logger.info('Nothing to roll back')
+            return
+
+        with self._locked():
+            last_version, cur_versions, pending_migrations = \
+                self._verify_migrations(self.config.migrations,
+                                        ignore_failed=True)
+
+            target_version = self._rollback_target(opts.db_version,
+                                                   cur_versions)
+            versions = [v for v in reversed(cur_versions)
+                        if v.version > target_version]
+            if not versions:
+                self.logger.info('Nothing to roll back')
+                return
+
+            # Find all down scripts before changing anything
+            downs = []
+            for version in versions:
+                migration = self.config.migrations[version.version - 1]
+                if migration.name != version.name:
+                    raise InconsistentState(migration, version)
+
+                down = migration.load_down()
+                if down is None:
+                    raise MissingDownMigration(version.version, version.name)
+                downs.append(down)
+
+            self.backend.clear_summary()
+            self.backend.use_keyspace()
+            sys.path.append(self.config.migrations_path)
+
+            for version, down in zip(versions, downs):
+                self._rollback_version(version, down)
+
+            self.backend.refresh_schema()
+            self._update_summary(target_version)
+
+    def _bookkeeping_tables(self):
+        """Tables holding the migrator's own state"""
+        table = self.config.migrations_table
+        return {table, table + '_lease', table + '_summary'}
+
+    def _reset_data(self, target):
+        """
+        Reset a database's data, keeping its schema, if it is up-to-date
+
+        All tables except the migrator's own are truncated, and migrations
+        marked as seeds are re-run. Returns False, without changing anything,
+        if the stored versions do not exactly match the migrations.
+        """
+
+        migrations = self.config.migrations
+        if not self._keyspace_exists() or not self._table_exists():
+            self.logger.info('Keyspace or migrations table missing')
+            return False
+
+        if self._get_target_version(target) != len(migrations):
+            self.logger.info('Target version is not the latest one')
+            return False
+
+        with self._locked():
+            try:
+                last_version, cur_versions, pending_migrations = \
+                    self._verify_migrations(migrations)
+            except MigrationError as e:
+                self.logger.info('Version history cannot be kept: '
+                                 '{}'.format(e))
+                return False
+
+            if pending_migrations:
+                self.logger.info('Pending migrations found')
+                return False
+
+            self._truncate_and_seed(migrations)
+
+        return True
+
+    def _truncate_and_seed(self, migrations):
+        """Truncate all tables but the migrator's, then re-run seeds"""
+        tables = [t for t in self.backend.list_tables()
+                  if t not in self._bookkeeping_tables()]
+        self.logger.info("Truncating {} tables in keyspace '{}'".format(
+            len(tables), self.config.keyspace))
+        with trace.span('truncate_tables', args={'tables': len(tables)}):
+            self.backend.truncate_tables(tables)
+
+        seeds = [(version, migration)
+                 for version, migration in enumerate(migrations, 1)
+                 if migration.is_seed]
+        if seeds:
+            self.backend.use_keyspace()
+            sys.path.append(self.config.migrations_path)
+
+        for version, migration in seeds:
+            self.logger.info('Re-running seed migration (version {}): '
+                             '{}'.format(version, migration.name))
+            with trace.span('migration', args={'version': version,
+                                               'migration': migration.name,
+                                               'seed': True}):
+                self._run_migration(version, migration)
 
     @confirmation_required
     def reset(self, opts):
         """Reset a database, by dropping the keyspace then migrating"""
         self._check_cluster()
 
+        if getattr(opts, 'data_only', False):
+            if self._reset_data(opts.db_version):
+                return
+
+            self.logger.info('Cannot reset data only, resetting fully')
+
         self.logger.info("Dropping existing keyspace '{}'".format(
             self.config.keyspace))
 
-        self._execute(self._q(DROP_KEYSPACE))
-        self.cluster.refresh_schema_metadata()
+        self.backend.drop_keyspace()
+
+        opts.force = False
+        self.migrate(opts)
+
+    def _clone_keyspace(self, keyspace, cur_versions, summary):
+        """
+        Recreate a keyspace as a copy of the managed one's schema, with the
+        same version history, replacing it if it exists
+        """
+
+        backend = self.backend.for_keyspace(keyspace)
+        try:
+            self.logger.info("Cloning keyspace '{}' as '{}'".format(
+                self.config.keyspace, keyspace))
+
+            profile = self.current_profile
+            backend.drop_keyspace()
+            backend.create_keyspace(profile['replication'],
+                                    profile['durable_writes'])
+
+            for statement in self.backend.schema_statements(
+                    keyspace, exclude=self._bookkeeping_tables()):
+                self.logger.debug('Executing query: {}'.format(statement))
+                backend.execute(statement)
+
+            backend.create_table()
+            backend.create_summary_table()
+            backend.create_versions(
+                [(uuid.uuid4(), version.version,
+                  self.config.migrations[version.version - 1], version.state)
+                 for version in cur_versions],
+                content_encoding=self._content_encoding)
+            if summary is not None:
+                backend.write_summary(*summary)
+        finally:
+            backend.shutdown()
+
+    @confirmation_required
+    def clone(self, opts):
+        """
+        Migrate the database to the latest version, then copy its schema and
+        version history into `opts.count` keyspaces, concurrently
+
+        Copies are named after the keyspace, suffixed by their index from 0
+        (or after `opts.prefix`), and replaced if they already exist. As
+        their version history matches the migrations, they are up-to-date
+        for any later `migrate`.
+        """
+
+        count = opts.count
+        if count < 1:
+            raise ValueError('Number of copies must be at least 1')
+
+        prefix = getattr(opts, 'prefix', None) or \
+            self.config.keyspace + '_'
+        keyspaces = ['{}{}'.format(prefix, i) for i in range(count)]
+        if self.config.keyspace in keyspaces:
+            raise ValueError('Copies cannot replace the keyspace itself')
 
+        opts.db_version = None
         opts.force = False
         self.migrate(opts)
 
+        with self._locked():
+            last_version, cur_versions, pending_migrations = \
+                self._verify_migrations(self.config.migrations)
+
+            # Read the schema, including the changes of the migrations
+            self.backend.refresh_schema()
+            summary = (last_version, self._history_hash(last_version)) \
+                if last_version else None
+
+            remaining = iter(keyspaces)
+            errors = []
+            lock = threading.Lock()
+
+            def clone_remaining():
+                while True:
+                    with lock:
+                        keyspace = None if errors else next(remaining, None)
+                    if keyspace is None:
+                        return
+
+                    try:
+                        self._clone_keyspace(keyspace, cur_versions, summary)
+                    except Exception as e:
+                        self.logger.exception(
+                            "Failed to clone keyspace '{}'".format(keyspace))
+                        with lock:
+                            errors.append(e)
+
+            with trace.span('clone', args={'keyspaces': count}):
+                workers = [threading.Thread(target=clone_remaining)
+                           for _ in range(min(self.CLONE_CONCURRENCY, count))]
+                for worker in workers:
+                    worker.start()
+                for worker in workers:
+                    worker.join()
+
+            if errors:
+                raise errors[0]
+
+        self.logger.info('Cloned {} keyspaces: {}'.format(
+            count, ', '.join(keyspaces)))
+
     @staticmethod
     def _bytes_to_hex(bs):
         return codecs.getencoder('hex')(bs)[0]
 
     def status(self, opts):
+        import arrow
+        from tabulate import tabulate
+
         self._check_cluster()
 
         if not self._keyspace_exists():
@@ -587,6 +1427,26 @@ class Migrator(object):
             ('Latest DB version:', latest_version)),
             tablefmt='plain'))
 
+        nodes = self.backend.schema_versions()
+        if nodes:
+            print('\n## Schema versions\n')
+
+            datacenters = OrderedDict()
+            nodes.sort(key=lambda n: (n.datacenter or '', n.address))
+            for node in nodes:
+                versions = datacenters.setdefault(node.datacenter, Counter())
+                versions[str(node.schema_version)] += 1
+
+            data = []
+            for datacenter, versions in datacenters.items():
+                data.append((
+                    datacenter,
+                    sum(versions.values()),
+                    ', '.join('{} ({})'.format(version, count)
+                              for version, count in versions.most_common())))
+            print(tabulate(data, headers=['Datacenter', 'Nodes',
+                                          'Schema versions']))
+
         if cur_versions:
             print('\n## Applied migrations\n')
 
@@ -594,23 +1454,37 @@ class Migrator(object):
             for version in cur_versions:
                 checksum = self._bytes_to_hex(version.checksum)
                 date = arrow.get(version.applied_at).format()
+                timing = version_timing(version)
                 data.append((
                     str(version.version),
                     version.name,
                     version.state,
                     date,
+                    format_duration(timing.duration) if timing else '',
                     checksum))
             print(tabulate(data, headers=['#', 'Name', 'State',
-                                          'Date applied', 'Checksum']))
+                                          'Date applied', 'Duration',
+                                          'Checksum']))
 
         if pending_migrations:
             print('\n## Pending migrations\n')
 
+            counts = [self._statement_count(migration)
+                      for _, migration in pending_migrations]
+            estimates = estimate_durations(
+                [version_timing(v) for v in cur_versions], counts)
+
             data = []
-            for version, migration in pending_migrations:
+            for (version, migration), count, estimate in \
+                    zip(pending_migrations, counts, estimates):
                 checksum = self._bytes_to_hex(migration.checksum)
                 data.append((
                     str(version),
                     migration.name,
+                    '' if count is None else count,
+                    format_duration(estimate),
                     checksum))
-            print(tabulate(data, headers=['#', 'Name', 'Checksum']))
+            print(tabulate(data, headers=['#', 'Name', 'Statements',
+                                          'Estimate', 'Checksum']))
+            print('\nEstimated time: {}'.format(
+                format_duration(total_duration(estimates))))
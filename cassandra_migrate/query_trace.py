@@ -0,0 +1,135 @@
+# encoding: utf-8
+
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+
+import io
+import re
+import threading
+from collections import namedtuple, OrderedDict
+
+from cassandra_migrate.timing import format_duration
+
+
+# A traced migration statement, with the wall time seen by the client
+TracedStatement = namedtuple('TracedStatement',
+                             'version name statement wall trace')
+
+# Timings of a node taking part in a statement: its number of trace events,
+# the time elapsed on it until its last event, and the step that took the
+# longest, with its duration
+ReplicaTiming = namedtuple('ReplicaTiming',
+                           'source events elapsed slowest_step step_time')
+
+
+def replica_timings(trace):
+    """Summarize the events of a StatementTrace per node, slowest first"""
+    events = OrderedDict()
+    for event in trace.events:
+        events.setdefault(event.source, []).append(event)
+
+    timings = []
+    for source, source_events in events.items():
+        source_events.sort(key=lambda e: e.elapsed or 0)
+
+        previous, slowest, step_time = 0, None, 0
+        for event in source_events:
+            elapsed = event.elapsed or 0
+            if slowest is None or elapsed - previous > step_time:
+                slowest, step_time = event.description, elapsed - previous
+            previous = elapsed
+
+        timings.append(ReplicaTiming(source, len(source_events), previous,
+                                     slowest, step_time))
+
+    timings.sort(key=lambda t: -t.elapsed)
+    return timings
+
+
+class TraceReport(object):
+    """
+    Collect traces of migration statements, and report the slowest ones
+
+    For each statement, the wall time seen by the client is split into the
+    time spent on the coordinator, as traced by Cassandra, and the rest,
+    spent on the network and in the driver. The latter includes waiting for
+    schema agreement after DDL statements, so a large share of it points to
+    slow schema propagation. The timings of every replica show whether a
+    single node held the statement back.
+    """
+
+    LIMIT = 10
+
+    def __init__(self):
+        self.statements = []
+        self._lock = threading.Lock()
+
+    def add(self, version, name, statement, wall, trace):
+        """Record a statement of the migration `name`, and its trace"""
+        with self._lock:
+            self.statements.append(
+                TracedStatement(version, name, statement, wall, trace))
+
+    def slowest(self, limit=None):
+        """Traced statements, slowest first"""
+        with self._lock:
+            statements = sorted(self.statements, key=lambda s: -s.wall)
+        return statements[:limit or self.LIMIT]
+
+    @staticmethod
+    def _excerpt(statement, length=200):
+        statement = re.sub(r'\s+', ' ', statement).strip()
+        if len(statement) > length:
+            statement = statement[:length - 3] + '...'
+        return statement
+
+    def format(self, limit=None):
+        from tabulate import tabulate
+
+        slowest = self.slowest(limit)
+        lines = ['# Statement traces', '',
+                 'Traced {} statements in {}'.format(
+                     len(self.statements),
+                     format_duration(sum(s.wall for s in self.statements)))]
+        if not slowest:
+            return '\n'.join(lines) + '\n'
+
+        rows = []
+        for i, traced in enumerate(slowest, 1):
+            trace = traced.trace
+            duration = trace.duration if trace else None
+            rows.append((
+                i, traced.version, traced.name,
+                format_duration(traced.wall),
+                trace.coordinator if trace else '',
+                format_duration(duration),
+                format_duration(traced.wall - duration
+                                if duration is not None else None)))
+
+        lines += ['', '## Slowest statements', '',
+                  tabulate(rows, headers=['#', 'Version', 'Migration', 'Wall',
+                                          'Coordinator', 'Traced',
+                                          'Client-side'])]
+
+        for i, traced in enumerate(slowest, 1):
+            lines += ['', '### {}. {} (version {})'.format(
+                i, traced.name, traced.version), '',
+                '    ' + self._excerpt(traced.statement), '']
+
+            if traced.trace is None:
+                lines.append('Trace unavailable')
+                continue
+
+            lines.append(tabulate(
+                [(t.source, t.events, format_duration(t.elapsed),
+                  '{} ({})'.format(t.slowest_step,
+                                   format_duration(t.step_time)))
+                 for t in replica_timings(traced.trace)],
+                headers=['Node', 'Events', 'Elapsed', 'Slowest step']))
+
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path, limit=None):
+        """Write the report of the slowest statements to a file"""
+        with io.open(path, 'w', encoding='utf-8') as f:
+            f.write(self.format(limit))
@@ -0,0 +1,194 @@
+# encoding: utf-8
+
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+
+import io
+import os
+import sys
+import json
+import socket
+import logging
+import argparse
+import socketserver
+from contextlib import contextmanager
+
+from cassandra_migrate import MigrationConfig, MigrationError
+from cassandra_migrate.migrator import Migrator
+
+
+def _send(wfile, message):
+    wfile.write((json.dumps(message) + '\n').encode('utf-8'))
+    wfile.flush()
+
+
+class _ForwardingHandler(logging.Handler):
+    """Forward log records of a request to its client"""
+
+    def __init__(self, wfile):
+        logging.Handler.__init__(self)
+        self.wfile = wfile
+
+    def emit(self, record):
+        try:
+            _send(self.wfile, {'log': self.format(record),
+                               'level': record.levelno})
+        except Exception:
+            self.handleError(record)
+
+
+@contextmanager
+def _captured_stdout():
+    stdout = sys.stdout
+    sys.stdout = captured = io.StringIO()
+    try:
+        yield captured
+    finally:
+        sys.stdout = stdout
+
+
+class MigrationServer(socketserver.UnixStreamServer):
+    """
+    Daemon serving migration commands over a Unix socket, keeping a cluster
+    connection warm between them
+
+    Requests and responses are JSON objects, one per line. A request names an
+    `action` (one of ACTIONS) and may set any of OPTIONS, as the CLI would.
+    While it runs, log messages are sent back as `{"log": ..., "level": ...}`
+    objects, followed by a final `{"ok": ..., "output": ..., "error": ...}`
+    object, where `output` is what the command printed.
+
+    The configuration is reloaded for every request, so new migrations are
+    always picked up, but the backend (and its session and metadata) is
+    reused as long as the keyspace and migrations table stay the same.
+    Requests are served one at a time.
+    """
+
+    logger = logging.getLogger("Migrator")
+
+    ACTIONS = ('migrate', 'status', 'reset')
+    OPTIONS = ('db_version', 'force', 'preflight', 'data_only', 'wait',
+               'wait_timeout')
+
+    def __init__(self, socket_path, config_path, **migrator_args):
+        self.socket_path = socket_path
+        self.config_path = config_path
+        self.backend = migrator_args.pop('backend', None)
+        self.migrator_args = migrator_args
+
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+        # Only the owner may connect, from the moment the socket is created
+        umask = os.umask(0o177)
+        try:
+            socketserver.UnixStreamServer.__init__(self, socket_path,
+                                                   _RequestHandler)
+        finally:
+            os.umask(umask)
+
+    def server_close(self):
+        socketserver.UnixStreamServer.server_close(self)
+        if self.backend is not None:
+            self.backend.shutdown()
+            self.backend = None
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    def _migrator(self):
+        config = MigrationConfig.load(self.config_path)
+
+        backend = self.backend
+        if backend is not None and \
+                (backend.keyspace, backend.table) != \
+                (config.keyspace, config.migrations_table):
+            backend.shutdown()
+            backend = None
+
+        migrator = Migrator(config=config, backend=backend,
+                            **self.migrator_args)
+        self.backend = migrator.backend
+        return migrator
+
+    def run_command(self, request):
+        """Run a command, returning the printed output"""
+        action = request.get('action')
+        if action not in self.ACTIONS:
+            raise ValueError('Unsupported action: {}'.format(action))
+
+        opts = argparse.Namespace(action=action, assume_yes=True,
+                                  cli_mode=False, db_version=None,
+                                  force=False, preflight=False,
+                                  data_only=False, wait=False,
+                                  wait_timeout=None)
+        for option in self.OPTIONS:
+            if option in request:
+                setattr(opts, option, request[option])
+
+        migrator = self._migrator()
+        with _captured_stdout() as output:
+            getattr(migrator, action)(opts)
+        return output.getvalue()
+
+    def handle_command(self, request, wfile):
+        handler = _ForwardingHandler(wfile)
+        self.logger.addHandler(handler)
+        try:
+            output = self.run_command(request)
+        except (MigrationError, ValueError) as e:
+            response = {'ok': False, 'error': str(e)}
+        except Exception as e:
+            self.logger.exception('Failed to run command')
+            response = {'ok': False, 'error': str(e)}
+
+            # Start from a fresh connection, in case this one is broken
+            if self.backend is not None:
+                self.backend.shutdown()
+                self.backend = None
+        else:
+            response = {'ok': True, 'output': output}
+        finally:
+            self.logger.removeHandler(handler)
+
+        _send(wfile, response)
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+
+            try:
+                request = json.loads(line.decode('utf-8'))
+            except ValueError:
+                _send(self.wfile, {'ok': False, 'error': 'Invalid request'})
+                continue
+
+            self.server.handle_command(request, self.wfile)
+
+
+def forward(socket_path, request, logger=None):
+    """
+    Send a command to a MigrationServer, and return its final response
+
+    Log messages sent while the command runs are logged with `logger`.
+    """
+    logger = logger or logging.getLogger("RemoteMigrator")
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+        stream = sock.makefile('rwb')
+        _send(stream, request)
+
+        for line in stream:
+            message = json.loads(line.decode('utf-8'))
+            if 'log' in message:
+                logger.log(message['level'], message['log'])
+            else:
+                return message
+    finally:
+        sock.close()
+
+    raise IOError('Connection to migration server closed unexpectedly')
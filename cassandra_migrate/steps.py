@@ -0,0 +1,114 @@
+# encoding: utf-8
+"""
+Migration steps, shared by the blocking and asyncio migrators
+
+A step is a generator yielding the operations it needs performed, and
+receiving their results (or having their exceptions raised at the `yield`):
+
+- `Call`: a backend operation, which can be sent asynchronously
+- `Blocking`: a function call that can only block
+- `Sleep`: a pause
+- another step, run to completion as a nested step
+
+A step ends by yielding `Return` with its result, which must be its last
+`yield`, as Python 2 generators cannot return values. A step ending without
+one returns None.
+
+`run` performs the operations of a step as plain calls, and `AsyncMigrator`
+awaits them, so both run the exact same logic.
+"""
+
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+
+import time
+import types
+from collections import namedtuple
+
+
+Call = namedtuple('Call', 'operation args kwargs')
+Blocking = namedtuple('Blocking', 'func args kwargs')
+Sleep = namedtuple('Sleep', 'seconds')
+Return = namedtuple('Return', 'value')
+
+
+def call(operation, *args, **kwargs):
+    """Operation running the backend method named `operation`"""
+    return Call(operation, args, kwargs)
+
+
+def blocking(func, *args, **kwargs):
+    """Operation calling `func`, which may block"""
+    return Blocking(func, args, kwargs)
+
+
+def flatten(step):
+    """
+    Run a step and its nested steps, yielding only the operations to
+    perform, and finally a `Return` with the step's result
+    """
+    stack = [step]
+    value, error = None, None
+    while True:
+        current = stack[-1]
+        try:
+            if error is None:
+                operation = current.send(value)
+            else:
+                pending, error = error, None
+                operation = current.throw(pending)
+        except StopIteration:
+            operation = Return(None)
+        except BaseException as e:
+            stack.pop()
+            if not stack:
+                raise
+            value, error = None, e
+            continue
+
+        if isinstance(operation, Return):
+            current.close()
+            stack.pop()
+            if not stack:
+                yield operation
+                return
+            value = operation.value
+        elif isinstance(operation, types.GeneratorType):
+            stack.append(operation)
+            value = None
+        else:
+            try:
+                value = yield operation
+            except GeneratorExit:
+                raise
+            except BaseException as e:
+                value, error = None, e
+
+
+def perform(operation, backend):
+    """Perform an operation by blocking until it is done"""
+    if isinstance(operation, Call):
+        return getattr(backend, operation.operation)(*operation.args,
+                                                     **operation.kwargs)
+    elif isinstance(operation, Blocking):
+        return operation.func(*operation.args, **operation.kwargs)
+    elif isinstance(operation, Sleep):
+        time.sleep(operation.seconds)
+    else:
+        raise TypeError('Invalid migration step operation: {!r}'.format(
+            operation))
+
+
+def run(step, backend):
+    """Run a step to completion with blocking calls, returning its result"""
+    operations = flatten(step)
+    operation = next(operations)
+    while not isinstance(operation, Return):
+        try:
+            result = perform(operation, backend)
+        except BaseException as e:
+            operation = operations.throw(e)
+        else:
+            operation = operations.send(result)
+
+    return operation.value
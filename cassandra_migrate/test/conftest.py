@@ -0,0 +1,7 @@
+import sys
+
+# asyncio support, and its tests, need Python 3.7+: older interpreters cannot
+# parse them
+collect_ignore = []
+if sys.version_info < (3, 7):
+    collect_ignore.append('test_aio.py')
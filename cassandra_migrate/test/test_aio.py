@@ -0,0 +1,156 @@
+from __future__ import unicode_literals
+
+import sys
+
+import pytest
+
+from cassandra_migrate import Migration, FailedMigration, trace
+from cassandra_migrate.backend import CompletedFuture, ResultFuture
+from cassandra_migrate.test.test_migrator import (
+    make_config, write_migration, states, start_concurrent_migration)
+
+if sys.version_info < (3, 7):
+    pytest.skip('asyncio support requires Python 3.7', allow_module_level=True)
+
+import asyncio  # noqa: E402
+
+from cassandra_migrate import MemoryBackend  # noqa: E402
+from cassandra_migrate.aio import AsyncMigrator, wrap_future  # noqa: E402
+
+
+@pytest.fixture
+def migrations_path(tmpdir):
+    path = tmpdir.mkdir('migrations')
+    write_migration(path, 'v001_create.cql',
+                    'CREATE TABLE users (id int PRIMARY KEY);')
+    write_migration(path, 'v002_insert.cql',
+                    'INSERT INTO users (id) VALUES (1);\n'
+                    'INSERT INTO users (id) VALUES (2);')
+    return path
+
+
+def make_async_migrator(migrations_path, keyspaces=None, **kwargs):
+    config = make_config(migrations_path)
+    backend = MemoryBackend(config.keyspace, config.migrations_table,
+                            keyspaces=keyspaces)
+    return AsyncMigrator(config, backend=backend, **kwargs)
+
+
+def test_wrap_future():
+    async def run():
+        assert await wrap_future(CompletedFuture(42)) == 42
+        with pytest.raises(ValueError):
+            await wrap_future(CompletedFuture(exception=ValueError()))
+
+    asyncio.run(run())
+
+
+class PagedResponseFuture(object):
+    """Stand-in for a driver ResponseFuture returning rows in pages"""
+
+    def __init__(self, pages):
+        self.pages = list(pages)
+        self.has_more_pages = True
+
+    def add_callbacks(self, callback, errback):
+        self.callback = callback
+        self.start_fetching_next_page()
+
+    def start_fetching_next_page(self):
+        page = self.pages.pop(0)
+        self.has_more_pages = bool(self.pages)
+        self.callback(page)
+
+
+def test_result_future_pages():
+    future = ResultFuture(PagedResponseFuture([[1, 2], [3], [4]]), sum)
+
+    async def run():
+        assert await wrap_future(future) == 10
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize('lock_mode', ['lwt', 'lease'])
+def test_async_migrate(migrations_path, lock_mode):
+    migrator = make_async_migrator(migrations_path, lock_mode=lock_mode)
+
+    async def run():
+        # Other initialization can run while migrating
+        await asyncio.gather(migrator.migrate(db_version='1'),
+                             asyncio.sleep(0))
+        await migrator.migrate()
+
+    asyncio.run(run())
+    assert states(migrator.migrator) == [
+        (1, 'v001_create.cql', Migration.State.SUCCEEDED),
+        (2, 'v002_insert.cql', Migration.State.SUCCEEDED)]
+    assert [s for s, _ in migrator.backend.statements] == [
+        'CREATE TABLE users (id int PRIMARY KEY)',
+        'INSERT INTO users (id) VALUES (1)',
+        'INSERT INTO users (id) VALUES (2)']
+
+    versions = migrator.backend.list_versions()
+    assert all(v.statement_count and v.finished_at for v in versions)
+
+
+def test_async_baseline_and_status(migrations_path, capsys):
+    migrator = make_async_migrator(migrations_path)
+    migrator.backend.create_keyspace({'class': 'SimpleStrategy'}, True)
+
+    async def run():
+        await migrator.baseline()
+        await migrator.status()
+
+    asyncio.run(run())
+    assert states(migrator.migrator) == [
+        (1, 'v001_create.cql', Migration.State.SKIPPED),
+        (2, 'v002_insert.cql', Migration.State.SKIPPED)]
+    assert migrator.backend.statements == []
+    assert 'Current DB version:  2' in capsys.readouterr().out
+
+
+def test_async_failed_migration(migrations_path):
+    write_migration(migrations_path, 'v003_fail.py',
+                    'def execute(session):\n    raise RuntimeError()\n')
+    migrator = make_async_migrator(migrations_path)
+
+    with pytest.raises(FailedMigration):
+        asyncio.run(migrator.migrate())
+
+    assert states(migrator.migrator)[-1] == \
+        (3, 'v003_fail.py', Migration.State.FAILED)
+
+
+def test_async_migrate_wait(migrations_path):
+    keyspaces = {}
+    leader, version_id = start_concurrent_migration(migrations_path,
+                                                    keyspaces)
+    migrator = make_async_migrator(migrations_path, keyspaces)
+    migrator.migrator.WAIT_INITIAL_DELAY = 0.01
+
+    async def run():
+        async def finish():
+            await asyncio.sleep(0.05)
+            leader.finalize_version(version_id, Migration.State.SUCCEEDED,
+                                    Migration.State.IN_PROGRESS)
+
+        await asyncio.gather(migrator.migrate(wait=True), finish())
+
+    asyncio.run(run())
+    assert [s for _, _, s in states(migrator.migrator)] == \
+        [Migration.State.SUCCEEDED] * 2
+
+
+def test_async_migrate_traced(migrations_path):
+    migrator = make_async_migrator(migrations_path)
+    tracer = trace.Tracer()
+    trace.set_tracer(tracer)
+    try:
+        asyncio.run(migrator.migrate())
+    finally:
+        trace.set_tracer(None)
+
+    names = [event['name'] for event in tracer.events]
+    assert names.count('migration') == 2
+    assert names.count('statement') == 3
@@ -0,0 +1,199 @@
+from __future__ import unicode_literals
+
+import pytest
+
+pytest.importorskip('cassandra')
+
+from cassandra import ConsistencyLevel  # noqa: E402
+from cassandra.metadata import (KeyspaceMetadata, TableMetadata,  # noqa
+                                ColumnMetadata, IndexMetadata, UserType)
+from cassandra.cluster import EXEC_PROFILE_DEFAULT  # noqa: E402
+from cassandra.policies import TokenAwarePolicy, HostDistance  # noqa: E402
+
+from cassandra_migrate import Migrator, MigrationConfig  # noqa: E402
+from cassandra_migrate.backend import DriverBackend  # noqa: E402
+
+
+class BorrowedCluster(object):
+    """Cluster of an application, opening recording sessions"""
+
+    def __init__(self):
+        self.sessions = []
+
+    def connect(self):
+        session = BorrowedSession(None, cluster=self)
+        self.sessions.append(session)
+        return session
+
+
+class BorrowedSession(object):
+    """Session of an application, recording what it is asked to do"""
+
+    def __init__(self, keyspace='app', cluster=None):
+        self.cluster = cluster if cluster is not None else BorrowedCluster()
+        self.keyspace = keyspace
+        self.queries = []
+        self.params = []
+        self.closed = False
+
+    def execute(self, query, parameters=None, timeout=None):
+        if query == 'USE test;':
+            self.keyspace = 'test'
+        self.queries.append((query, timeout))
+        self.params.append(parameters)
+        return []
+
+    def set_keyspace(self, keyspace):
+        self.keyspace = keyspace
+
+    def shutdown(self):
+        self.closed = True
+
+
+def test_connection_settings():
+    backend = DriverBackend('test', 'migrations', connection={
+        'protocol_version': 3, 'compression': False, 'local_dc': 'dc1',
+        'connect_timeout': 5, 'request_timeout': 30})
+    cluster = backend.cluster
+
+    assert cluster.protocol_version == 3
+    assert cluster.compression is False
+    assert cluster.connect_timeout == 5
+    assert cluster.max_schema_agreement_wait == 300
+    assert backend.request_timeout == 30
+
+    profile = cluster.profile_manager.profiles[EXEC_PROFILE_DEFAULT]
+    assert profile.consistency_level == ConsistencyLevel.ALL
+    assert profile.request_timeout == 30
+    policy = profile.load_balancing_policy
+    assert isinstance(policy, TokenAwarePolicy)
+    assert policy._child_policy.local_dc == 'dc1'
+    backend.shutdown()
+
+
+def test_pool_settings():
+    backend = DriverBackend('test', 'migrations', connection={
+        'protocol_version': 2, 'core_connections_per_host': 3,
+        'max_connections_per_host': 4})
+
+    assert backend.cluster.get_core_connections_per_host(
+        HostDistance.LOCAL) == 3
+    assert backend.cluster.get_max_connections_per_host(
+        HostDistance.LOCAL) == 4
+    backend.shutdown()
+
+
+def test_unknown_connection_settings():
+    with pytest.raises(ValueError):
+        DriverBackend('test', 'migrations', connection={'pool_size': 2})
+
+
+def test_borrowed_session():
+    session = BorrowedSession()
+    backend = DriverBackend('test', 'migrations', session=session)
+
+    assert backend.cluster is session.cluster
+    backend.execute('SELECT 1')
+
+    # The session's defaults are not changed, the statement carries its own
+    statement, timeout = session.queries[-1]
+    assert statement.query_string == 'SELECT 1'
+    assert statement.consistency_level == ConsistencyLevel.ALL
+    assert timeout == DriverBackend.REQUEST_TIMEOUT
+    assert session.cluster.sessions == []
+
+    # Its keyspace is left alone, migrations run in a session of their own
+    backend.use_keyspace()
+    backend.execute('SELECT 2')
+    own_session, = session.cluster.sessions
+    assert own_session.keyspace == 'test'
+    assert own_session.queries[-1][0].query_string == 'SELECT 2'
+    assert own_session.queries[-1][0].consistency_level == \
+        ConsistencyLevel.ALL
+    assert session.keyspace == 'app'
+    assert len(session.queries) == 1
+
+    backend.shutdown()
+    assert own_session.closed
+    assert not session.closed
+    assert session.keyspace == 'app'
+
+
+def test_lease_ttl_rounded_up():
+    session = BorrowedSession()
+    backend = DriverBackend('test', 'migrations', session=session)
+
+    # A TTL of 0 would never expire
+    backend.acquire_lease('owner', 0.5)
+    backend.renew_lease('owner', 1.2)
+    assert session.params == [('migrate', 'owner', 1),
+                              (2, 'owner', 'migrate', 'owner')]
+
+
+def test_create_lease_table_twice():
+    session = BorrowedSession()
+    session.cluster.refresh_table_metadata = lambda keyspace, table: None
+    backend = DriverBackend('test', 'migrations', session=session)
+
+    # Runners starting together may all find the table missing and create it
+    backend.create_lease_table()
+    backend.create_lease_table()
+    for statement, _ in session.queries:
+        assert statement.query_string.strip().startswith(
+            'CREATE TABLE IF NOT EXISTS test.migrations_lease (')
+
+
+def table_metadata(keyspace, name, columns):
+    table = TableMetadata(keyspace, name)
+    for column_name, column_type in columns:
+        table.columns[column_name] = ColumnMetadata(table, column_name,
+                                                    column_type)
+    table.partition_key.append(table.columns[columns[0][0]])
+    return table
+
+
+def test_schema_statements():
+    keyspace = KeyspaceMetadata('test', True, 'SimpleStrategy',
+                                {'replication_factor': '1'})
+    keyspace.user_types['address'] = UserType('test', 'address', ['street'],
+                                              ['text'])
+    users = keyspace.tables['users'] = table_metadata(
+        'test', 'users', [('id', 'int'), ('email', 'text'),
+                          ('home', 'frozen<address>')])
+    users.indexes['users_email'] = IndexMetadata(
+        'test', 'users', 'users_email', 'COMPOSITES', {'target': 'email'})
+    users.options = {'comment': 'Copied to test.users_v2'}
+    keyspace.tables['migrations'] = table_metadata(
+        'test', 'migrations', [('id', 'uuid')])
+
+    session = BorrowedSession()
+    session.cluster = type(str('Cluster'), (object,), {})()
+    session.cluster.metadata = type(str('Metadata'), (object,), {})()
+    session.cluster.metadata.keyspaces = {'test': keyspace}
+    backend = DriverBackend('test', 'migrations', session=session)
+
+    statements = backend.schema_statements('test_0', exclude={'migrations'})
+    assert statements[0] == 'CREATE TYPE test_0.address (\n    street text\n)'
+    assert statements[1].startswith(
+        'CREATE TABLE test_0.users (id int PRIMARY KEY, email text, '
+        'home frozen<address>)')
+    assert statements[2] == 'CREATE INDEX users_email ON test_0.users (email)'
+    assert len(statements) == 3
+
+    # Only names are qualified with the new keyspace, not the rest of the CQL
+    assert "comment = 'Copied to test.users_v2'" in statements[1]
+
+    # The cluster's metadata is left unchanged
+    assert users.keyspace_name == 'test'
+    assert keyspace.user_types['address'].keyspace == 'test'
+    assert keyspace.name == 'test'
+
+
+def test_migrator_driver_objects():
+    session = BorrowedSession()
+    config = MigrationConfig({'keyspace': 'test', 'migrations_path': '.'},
+                             '')
+    migrator = Migrator(config, session=session)
+
+    assert migrator.cluster is session.cluster
+    assert migrator.session is session
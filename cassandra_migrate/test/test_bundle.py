@@ -0,0 +1,112 @@
+from __future__ import unicode_literals
+
+import os
+
+import pytest
+
+from cassandra_migrate import (Migrator, MigrationConfig, MemoryBackend,
+                               Migration)
+from cassandra_migrate.bundle import (BundledMigration, write_bundle,
+                                      load_bundle)
+from cassandra_migrate.test.test_migrator import (Opts, write_migration,
+                                                  states)
+
+
+@pytest.fixture
+def migrations_path(tmpdir):
+    path = tmpdir.mkdir('migrations')
+    write_migration(path, 'v001_create.cql',
+                    'CREATE TABLE users (id int PRIMARY KEY);\n'
+                    '-- Seed users\n'
+                    'INSERT INTO users (id) VALUES (1);')
+    write_migration(path, 'v002_script.py', 'def execute(session):\n'
+                                            '    session.execute("SELECT 1")\n')
+    write_migration(path, 'v003_users.csv', '# table: users\nid\n2\n')
+    write_migration(path, 'v003_users.down.cql', 'TRUNCATE users;')
+    return path
+
+
+def make_config(migrations_path, bundle=None):
+    data = {'keyspace': 'test', 'migrations_path': str(migrations_path)}
+    if bundle is not None:
+        data['migrations_bundle'] = bundle
+    return MigrationConfig(data, '')
+
+
+def test_bundle(migrations_path, tmpdir):
+    bundle = str(tmpdir.join('migrations.bundle'))
+    migrations = make_config(migrations_path).migrations
+    write_bundle(bundle, migrations)
+
+    bundled = load_bundle(bundle, str(migrations_path))
+    assert all(isinstance(m, BundledMigration) for m in bundled)
+    assert bundled == migrations
+
+    assert bundled[0].statements == [
+        'CREATE TABLE users (id int PRIMARY KEY)',
+        'INSERT INTO users (id) VALUES (1)']
+    assert bundled[0].statement_kinds == ['ddl', 'dml']
+    assert bundled[1].statements == []
+
+    # Writing again replaces the bundle
+    write_bundle(bundle, migrations[:1])
+    assert load_bundle(bundle, str(migrations_path)) == migrations[:1]
+
+
+def test_migrate_from_bundle(migrations_path, tmpdir):
+    bundle = str(tmpdir.join('migrations.bundle'))
+    write_bundle(bundle, make_config(migrations_path).migrations)
+
+    # CQL migrations only need the bundle
+    os.remove(str(migrations_path.join('v001_create.cql')))
+    config = make_config(migrations_path, bundle=bundle)
+    assert [m.name for m in config.migrations] == [
+        'v001_create.cql', 'v002_script.py', 'v003_users.csv']
+
+    backend = MemoryBackend(config.keyspace, config.migrations_table)
+    migrator = Migrator(config=config, backend=backend)
+    migrator.migrate(Opts())
+
+    assert [s for _, _, s in states(migrator)] == \
+        [Migration.State.SUCCEEDED] * 3
+    assert [s for s, _ in backend.statements][:3] == [
+        'CREATE TABLE users (id int PRIMARY KEY)',
+        'INSERT INTO users (id) VALUES (1)',
+        'SELECT 1']
+
+
+def test_invalid_bundle(migrations_path, tmpdir):
+    with pytest.raises(ValueError):
+        load_bundle(str(tmpdir.join('missing.bundle')), str(migrations_path))
+
+    path = tmpdir.join('invalid.bundle')
+    path.write('not a bundle')
+    with pytest.raises(ValueError):
+        load_bundle(str(path), str(migrations_path))
+
+
+def test_outdated_bundle(migrations_path, tmpdir):
+    bundle = str(tmpdir.join('migrations.bundle'))
+    write_bundle(bundle, make_config(migrations_path).migrations)
+    config = make_config(migrations_path, bundle=bundle)
+
+    # Only touching a file keeps the bundle valid
+    script = migrations_path.join('v002_script.py')
+    script.setmtime(script.mtime() + 10)
+    assert len(config.migrations) == 3
+
+    script.write('def execute(session):\n    pass\n')
+    with pytest.raises(ValueError):
+        make_config(migrations_path, bundle=bundle).migrations
+
+    write_bundle(bundle, make_config(migrations_path).migrations)
+    write_migration(migrations_path, 'v004_new.cql', 'SELECT 1;')
+    with pytest.raises(ValueError):
+        make_config(migrations_path, bundle=bundle).migrations
+
+
+def test_statements_split_once(migrations_path):
+    migration = make_config(migrations_path).migrations[0]
+    assert migration.statements is not migration.statements
+    assert migration._statements is not None
+    assert migration.statement_kinds == ['ddl', 'dml']
@@ -0,0 +1,33 @@
+from __future__ import unicode_literals
+
+import pytest
+
+from cassandra_migrate import MigrationConfig
+
+
+def make_config(**data):
+    data.setdefault('keyspace', 'test')
+    data.setdefault('migrations_path', 'migrations')
+    return MigrationConfig(data, '')
+
+
+def test_connection_settings():
+    config = make_config(
+        connection={'protocol_version': 4, 'local_dc': 'dc1'},
+        profiles={'prod': {
+            'replication': {'class': 'NetworkTopologyStrategy', 'dc1': 3},
+            'connection': {'local_dc': 'dc2', 'compression': 'lz4'}}})
+
+    assert config.profiles['dev']['connection'] == {
+        'protocol_version': 4, 'local_dc': 'dc1'}
+    assert config.profiles['prod']['connection'] == {
+        'protocol_version': 4, 'local_dc': 'dc2', 'compression': 'lz4'}
+
+
+@pytest.mark.parametrize('connection', [
+    {'pool_size': 2},
+    {'protocol_version': 'v4'}
+])
+def test_invalid_connection_settings(connection):
+    with pytest.raises(ValueError):
+        make_config(connection=connection)
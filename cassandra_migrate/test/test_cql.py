@@ -2,7 +2,7 @@ from __future__ import unicode_literals
 
 import pytest
 
-from cassandra_migrate.cql import CqlSplitter
+from cassandra_migrate.cql import CqlSplitter, CqlInspector
 
 
 @pytest.mark.parametrize('cql,statements', [
@@ -39,3 +39,31 @@ from cassandra_migrate.cql import CqlSplitter
 def test_cql_split(cql, statements):
     result = CqlSplitter.split(cql.strip())
     assert result == statements
+
+
+@pytest.mark.parametrize('statement,problems', [
+    ('INSERT INTO users (id) VALUES (1)', []),
+    ("INSERT INTO users (id, name) VALUES (1, 'it''s')", []),
+    ('CREATE TABLE users (id int PRIMARY KEY, tags set<text>)', []),
+    ('CREAT TABLE users (id int PRIMARY KEY)', ["unknown statement 'CREAT'"]),
+    ('CREATE TABEL users (id int PRIMARY KEY)',
+     ["unknown object type 'TABEL' for CREATE"]),
+    ("INSERT INTO users (name) VALUES ('x)", ['unterminated string']),
+    ('INSERT INTO users (id VALUES (1)', ["unclosed ')'"]),
+    ('INSERT INTO users (id)) VALUES (1)', ["unbalanced ')'"]),
+])
+def test_cql_problems(statement, problems):
+    assert CqlInspector.problems(statement) == problems
+
+
+@pytest.mark.parametrize('statement,dml_table,ddl_table', [
+    ('SELECT * FROM users WHERE id = 1', (None, 'users'), None),
+    ('DELETE name FROM Ks."Users" WHERE id = 1', ('ks', 'Users'), None),
+    ('UPDATE users SET name = 1 WHERE id = 1', (None, 'users'), None),
+    ('ALTER TABLE users ADD name text', None, (None, 'users')),
+    ('CREATE TABLE IF NOT EXISTS ks.users (id int PRIMARY KEY)',
+     None, ('ks', 'users')),
+])
+def test_cql_tables(statement, dml_table, ddl_table):
+    assert CqlInspector.dml_table(statement) == dml_table
+    assert CqlInspector.ddl_table(statement) == ddl_table
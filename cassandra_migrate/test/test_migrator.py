@@ -0,0 +1,766 @@
+from __future__ import unicode_literals
+
+import io
+import os
+import re
+import time
+import uuid
+import threading
+
+import pytest
+
+from cassandra_migrate import (Migrator, MigrationConfig, MemoryBackend,
+                               Migration, FailedMigration, InconsistentState,
+                               UnknownMigration, Lease, LeaseUnavailable,
+                               LeaseExpired, PreflightFailed,
+                               SchemaDisagreement, MissingDownMigration,
+                               ConcurrentMigration, WaitTimeout, Throttle)
+from cassandra_migrate.backend import NodeSchema, StatementTrace
+from cassandra_migrate.query_trace import TraceReport
+
+
+class Opts(object):
+    def __init__(self, **kwargs):
+        self.db_version = None
+        self.force = False
+        self.assume_yes = True
+        self.cli_mode = False
+        self.__dict__.update(kwargs)
+
+
+def write_migration(path, name, content):
+    with io.open(os.path.join(str(path), name), 'w', encoding='utf-8') as f:
+        f.write(content)
+
+
+@pytest.fixture
+def migrations_path(tmpdir):
+    path = tmpdir.mkdir('migrations')
+    write_migration(path, 'v001_create.cql',
+                    'CREATE TABLE users (id int PRIMARY KEY);')
+    write_migration(path, 'v002_insert.cql',
+                    'INSERT INTO users (id) VALUES (1);\n'
+                    'INSERT INTO users (id) VALUES (2);')
+    return path
+
+
+def make_config(migrations_path):
+    return MigrationConfig({'keyspace': 'test',
+                            'migrations_path': str(migrations_path)}, '')
+
+
+def make_migrator(migrations_path, keyspaces=None, **kwargs):
+    config = make_config(migrations_path)
+    backend = MemoryBackend(config.keyspace, config.migrations_table,
+                            keyspaces=keyspaces)
+    return Migrator(config=config, backend=backend, **kwargs)
+
+
+def states(migrator):
+    versions = sorted(migrator.backend.list_versions(),
+                      key=lambda v: v.version)
+    return [(v.version, v.name, v.state) for v in versions]
+
+
+def test_migrate(migrations_path):
+    migrator = make_migrator(migrations_path)
+    migrator.migrate(Opts())
+
+    assert states(migrator) == [
+        (1, 'v001_create.cql', Migration.State.SUCCEEDED),
+        (2, 'v002_insert.cql', Migration.State.SUCCEEDED)]
+    assert [s for s, _ in migrator.backend.statements] == [
+        'CREATE TABLE users (id int PRIMARY KEY)',
+        'INSERT INTO users (id) VALUES (1)',
+        'INSERT INTO users (id) VALUES (2)']
+    assert 'users' in migrator.backend.keyspaces['test'].tables
+
+
+def test_migrate_to_version(migrations_path):
+    migrator = make_migrator(migrations_path)
+    migrator.migrate(Opts(db_version='1'))
+    assert states(migrator) == [
+        (1, 'v001_create.cql', Migration.State.SUCCEEDED)]
+
+    migrator.migrate(Opts())
+    assert len(states(migrator)) == 2
+
+
+def test_migrate_twice_is_noop(migrations_path):
+    migrator = make_migrator(migrations_path)
+    migrator.migrate(Opts())
+    del migrator.backend.statements[:]
+
+    migrator.migrate(Opts())
+    assert migrator.backend.statements == []
+
+
+def test_baseline(migrations_path):
+    migrator = make_migrator(migrations_path)
+    migrator._ensure_keyspace()
+    migrator.baseline(Opts())
+
+    assert [s for _, _, s in states(migrator)] == \
+        [Migration.State.SKIPPED] * 2
+    assert migrator.backend.statements == []
+
+
+def test_reset(migrations_path):
+    migrator = make_migrator(migrations_path)
+    migrator.migrate(Opts())
+    migrator.reset(Opts())
+
+    assert len(states(migrator)) == 2
+    assert len(migrator.backend.statements) == 6
+
+
+def test_failed_migration(migrations_path):
+    keyspaces = {}
+    migrator = make_migrator(migrations_path, keyspaces)
+
+    def fail(statement, parameters=None):
+        raise RuntimeError('boom')
+
+    migrator.migrate(Opts(db_version='1'))
+    migrator.backend.execute = fail
+    with pytest.raises(FailedMigration):
+        migrator.migrate(Opts())
+    assert states(migrator)[-1][2] == Migration.State.FAILED
+
+    migrator = make_migrator(migrations_path, keyspaces)
+    with pytest.raises(FailedMigration):
+        migrator.migrate(Opts())
+
+    migrator.migrate(Opts(force=True))
+    assert [s for _, _, s in states(migrator)] == \
+        [Migration.State.SUCCEEDED] * 2
+
+
+def test_resume_failed_migration(migrations_path):
+    write_migration(migrations_path, 'v003_tables.cql',
+                    'CREATE TABLE a (id int PRIMARY KEY);\n'
+                    'CREATE TABLE b (id int PRIMARY KEY);\n'
+                    'CREATE TABLE c (id int PRIMARY KEY);')
+    migrator = make_migrator(migrations_path)
+    migrator.migrate(Opts(db_version='2'))
+
+    execute = migrator.backend.execute
+
+    def fail_on_b(statement, parameters=None):
+        if 'TABLE b' in statement:
+            raise RuntimeError('boom')
+        return execute(statement, parameters)
+
+    migrator.backend.execute = fail_on_b
+    with pytest.raises(FailedMigration) as e:
+        migrator.migrate(Opts())
+    assert e.value.statement_index == 1
+    failed = max(migrator.backend.list_versions(), key=lambda v: v.version)
+    assert failed.statement_index == 1
+
+    # The retry continues from the failed statement
+    migrator.backend.execute = execute
+    migrator.backend.statements = []
+    migrator.migrate(Opts(force=True))
+    assert [s for s, _ in migrator.backend.statements] == [
+        'CREATE TABLE b (id int PRIMARY KEY)',
+        'CREATE TABLE c (id int PRIMARY KEY)']
+    assert states(migrator)[-1] == \
+        (3, 'v003_tables.cql', Migration.State.SUCCEEDED)
+    # All of its statements are counted, not only those run by the retry
+    resumed = max(migrator.backend.list_versions(), key=lambda v: v.version)
+    assert resumed.statement_count == 3
+
+
+def test_resume_changed_migration(migrations_path):
+    write_migration(migrations_path, 'v003_tables.cql',
+                    'CREATE TABLE a (id int PRIMARY KEY);\n'
+                    'CREATE TABLE b (id int PRIMARY KEY);')
+    migrator = make_migrator(migrations_path)
+    migrator.migrate(Opts(db_version='2'))
+
+    execute = migrator.backend.execute
+
+    def fail_on_b(statement, parameters=None):
+        if 'TABLE b' in statement:
+            raise RuntimeError('boom')
+        return execute(statement, parameters)
+
+    migrator.backend.execute = fail_on_b
+    with pytest.raises(FailedMigration):
+        migrator.migrate(Opts())
+
+    # Statements already applied changed: the whole migration is re-run
+    write_migration(migrations_path, 'v003_tables.cql',
+                    'CREATE TABLE a2 (id int PRIMARY KEY);\n'
+                    'CREATE TABLE b (id int PRIMARY KEY);')
+    migrator = make_migrator(migrations_path, migrator.backend.keyspaces)
+    migrator.migrate(Opts(force=True))
+    assert [s for s, _ in migrator.backend.statements] == [
+        'CREATE TABLE a2 (id int PRIMARY KEY)',
+        'CREATE TABLE b (id int PRIMARY KEY)']
+
+
+def test_progress_elapsed_time(migrations_path, caplog):
+    migrator = make_migrator(migrations_path)
+    with caplog.at_level('INFO', logger='Migrator'):
+        migrator.migrate(Opts())
+
+    elapsed = [re.match(r'Applied \d+/2 migrations in (\S+),',
+                        r.getMessage()) for r in caplog.records]
+    elapsed = [m.group(1) for m in elapsed if m]
+    assert len(elapsed) == 2
+
+    # Elapsed times are measured from the start of the run
+    assert all(e.endswith('ms') for e in elapsed)
+
+
+def test_inconsistent_state(migrations_path):
+    keyspaces = {}
+    make_migrator(migrations_path, keyspaces).migrate(Opts())
+
+    write_migration(migrations_path, 'v002_insert.cql', 'SELECT 1;')
+    with pytest.raises(InconsistentState):
+        make_migrator(migrations_path, keyspaces).migrate(Opts())
+
+
+def test_unknown_migration(migrations_path):
+    keyspaces = {}
+    make_migrator(migrations_path, keyspaces).migrate(Opts())
+
+    os.remove(os.path.join(str(migrations_path), 'v002_insert.cql'))
+    with pytest.raises(UnknownMigration):
+        make_migrator(migrations_path, keyspaces).migrate(Opts())
+
+
+def test_summary_fast_path(migrations_path):
+    keyspaces = {}
+    make_migrator(migrations_path, keyspaces).migrate(Opts())
+
+    def list_versions():
+        raise AssertionError('Version history should not be read')
+
+    # Up to date: only the summary row is read
+    migrator = make_migrator(migrations_path, keyspaces)
+    migrator.backend.list_versions = list_versions
+    migrator.migrate(Opts())
+    migrator.migrate(Opts(db_version='1'))
+
+    # New migrations are found by the full verification, which then updates
+    # the summary
+    write_migration(migrations_path, 'v003_insert.cql',
+                    'INSERT INTO users (id) VALUES (3);')
+    migrator = make_migrator(migrations_path, keyspaces)
+    migrator.migrate(Opts())
+    assert migrator.backend.read_summary().version == 3
+
+    migrator.backend.list_versions = list_versions
+    migrator.migrate(Opts())
+
+    # Changed migrations do not match the summary's hash
+    write_migration(migrations_path, 'v002_insert.cql', 'SELECT 1;')
+    with pytest.raises(InconsistentState):
+        make_migrator(migrations_path, keyspaces).migrate(Opts())
+
+
+def test_summary_cleared_on_failure(migrations_path):
+    migrator = make_migrator(migrations_path)
+    migrator.migrate(Opts(db_version='1'))
+    assert migrator.backend.read_summary().version == 1
+
+    write_migration(migrations_path, 'v002_insert.cql',
+                    'INSERT INTO users (id) VALUES (1);')
+    migrator.backend.execute = lambda *args: 1 / 0
+    with pytest.raises(FailedMigration):
+        migrator.migrate(Opts())
+    assert migrator.backend.read_summary() is None
+
+
+def test_rollback(migrations_path):
+    write_migration(migrations_path, 'v001_create.down.cql',
+                    'DROP TABLE users;')
+    write_migration(migrations_path, 'v002_insert.down.cql',
+                    'DELETE FROM users WHERE id IN (1, 2);')
+    migrator = make_migrator(migrations_path)
+
+    # Down scripts are not migrations themselves
+    assert [m.name for m in migrator.config.migrations] == \
+        ['v001_create.cql', 'v002_insert.cql']
+
+    migrator.migrate(Opts())
+    migrator.backend.statements = []
+
+    migrator.rollback(Opts())
+    assert states(migrator) == [
+        (1, 'v001_create.cql', Migration.State.SUCCEEDED)]
+    assert migrator.backend.read_summary().version == 1
+
+    migrator.migrate(Opts())
+    migrator.rollback(Opts(db_version='0'))
+    assert states(migrator) == []
+    assert [s for s, _ in migrator.backend.statements] == [
+        'DELETE FROM users WHERE id IN (1, 2)',
+        'INSERT INTO users (id) VALUES (1)',
+        'INSERT INTO users (id) VALUES (2)',
+        'DELETE FROM users WHERE id IN (1, 2)',
+        'DROP TABLE users']
+
+    # Nothing left to roll back
+    migrator.rollback(Opts())
+
+
+def test_rollback_missing_down(migrations_path):
+    write_migration(migrations_path, 'v002_insert.down.cql',
+                    'DELETE FROM users WHERE id IN (1, 2);')
+    migrator = make_migrator(migrations_path)
+    migrator.migrate(Opts())
+
+    # No version is rolled back unless all down scripts exist
+    with pytest.raises(MissingDownMigration):
+        migrator.rollback(Opts(db_version='0'))
+    assert len(states(migrator)) == 2
+
+
+def test_clone(migrations_path):
+    keyspaces = {}
+    migrator = make_migrator(migrations_path, keyspaces)
+    migrator.clone(Opts(count=3))
+
+    assert sorted(keyspaces) == ['test', 'test_0', 'test_1', 'test_2']
+    for name in ('test_0', 'test_2'):
+        assert list(keyspaces[name].tables) == [
+            'users', 'database_migrations', 'database_migrations_summary']
+
+        # Copies are up-to-date without running any migration
+        copy = make_config(migrations_path)
+        copy.keyspace = name
+        clone = Migrator(config=copy, backend=MemoryBackend(
+            name, copy.migrations_table, keyspaces=keyspaces))
+        clone.backend.list_versions = None
+        clone.migrate(Opts())
+        assert clone.backend.statements == []
+
+        del clone.backend.list_versions
+        assert states(clone) == states(migrator)
+
+    # Existing copies are replaced
+    keyspaces['test_1'].tables['stale'] = {}
+    migrator.clone(Opts(count=2, prefix='test_'))
+    assert 'stale' not in keyspaces['test_1'].tables
+
+    with pytest.raises(ValueError):
+        migrator.clone(Opts(count=0))
+
+
+def start_concurrent_migration(migrations_path, keyspaces):
+    """Leave the first version in progress, as another runner would"""
+    leader = make_migrator(migrations_path, keyspaces)
+    leader._prepare_keyspace()
+
+    version_id = uuid.uuid4()
+    leader.backend.create_version(version_id, 1, leader.config.migrations[0],
+                                  Migration.State.IN_PROGRESS)
+    return leader.backend, version_id
+
+
+def make_waiting_migrator(migrations_path, keyspaces):
+    migrator = make_migrator(migrations_path, keyspaces)
+    migrator.WAIT_INITIAL_DELAY = migrator.WAIT_MAX_DELAY = 0.01
+    return migrator
+
+
+def test_migrate_wait(migrations_path):
+    keyspaces = {}
+    leader, version_id = start_concurrent_migration(migrations_path,
+                                                    keyspaces)
+
+    migrator = make_waiting_migrator(migrations_path, keyspaces)
+    with pytest.raises(ConcurrentMigration):
+        migrator.migrate(Opts())
+
+    threading.Timer(0.05, leader.finalize_version, args=(
+        version_id, Migration.State.SUCCEEDED,
+        Migration.State.IN_PROGRESS)).start()
+    migrator.migrate(Opts(wait=True))
+
+    # The follower only applied what the leader did not
+    assert [s for s, _ in migrator.backend.statements] == [
+        'INSERT INTO users (id) VALUES (1)',
+        'INSERT INTO users (id) VALUES (2)']
+    assert [s for _, _, s in states(migrator)] == \
+        [Migration.State.SUCCEEDED] * 2
+
+
+def test_migrate_wait_failed(migrations_path):
+    keyspaces = {}
+    leader, version_id = start_concurrent_migration(migrations_path,
+                                                    keyspaces)
+
+    threading.Timer(0.05, leader.finalize_version, args=(
+        version_id, Migration.State.FAILED,
+        Migration.State.IN_PROGRESS)).start()
+    migrator = make_waiting_migrator(migrations_path, keyspaces)
+    with pytest.raises(FailedMigration):
+        migrator.migrate(Opts(wait=True))
+
+
+def test_migrate_wait_timeout(migrations_path):
+    keyspaces = {}
+    start_concurrent_migration(migrations_path, keyspaces)
+
+    migrator = make_waiting_migrator(migrations_path, keyspaces)
+    with pytest.raises(WaitTimeout):
+        migrator.migrate(Opts(wait=True, wait_timeout=0.1))
+
+
+def test_rollback_forgets_applied_statements(migrations_path):
+    write_migration(migrations_path, 'v002_insert.down.cql',
+                    'DELETE FROM users WHERE id IN (1, 2);')
+    migrator = make_migrator(migrations_path)
+    migrator.migrate(Opts(db_version='1'))
+
+    execute = migrator.backend.execute
+
+    def fail(statement, parameters=None):
+        if '(2)' in statement or 'DELETE' in statement:
+            raise RuntimeError('boom')
+        return execute(statement, parameters)
+
+    migrator.backend.execute = fail
+    with pytest.raises(FailedMigration):
+        migrator.migrate(Opts())
+    with pytest.raises(FailedMigration):
+        migrator.rollback(Opts())
+
+    failed = max(migrator.backend.list_versions(), key=lambda v: v.version)
+    assert failed.state == Migration.State.FAILED
+    assert failed.statement_index is None
+
+    # The down script may have reverted anything: nothing is skipped
+    migrator.backend.execute = execute
+    migrator.backend.statements = []
+    migrator.migrate(Opts(force=True))
+    assert [s for s, _ in migrator.backend.statements] == [
+        'INSERT INTO users (id) VALUES (1)',
+        'INSERT INTO users (id) VALUES (2)']
+
+
+def test_migrate_with_lease(migrations_path):
+    migrator = make_migrator(migrations_path, lock_mode='lease')
+    migrator.migrate(Opts())
+
+    assert [s for _, _, s in states(migrator)] == \
+        [Migration.State.SUCCEEDED] * 2
+    assert migrator.backend.acquire_lease('other', 60)
+
+
+def test_migrate_with_lease_held(migrations_path):
+    migrator = make_migrator(migrations_path, lock_mode='lease')
+    migrator._ensure_keyspace()
+    migrator._ensure_table()
+    migrator._ensure_lease_table()
+    migrator.backend.acquire_lease('other', 60)
+
+    with pytest.raises(LeaseUnavailable):
+        migrator.migrate(Opts())
+    assert states(migrator) == []
+
+
+def test_lease_taken_over(migrations_path):
+    migrator = make_migrator(migrations_path)
+    migrator._ensure_keyspace()
+    migrator._ensure_table()
+    migrator._ensure_lease_table()
+
+    backend = migrator.backend
+    with Lease(backend, ttl=0.3) as lease:
+        lease.check()
+        backend._leases[backend.LEASE_NAME]['owner'] = 'other'
+        time.sleep(0.25)
+
+        with pytest.raises(LeaseExpired):
+            lease.check()
+
+    with pytest.raises(ValueError):
+        Lease(backend, ttl=0)
+    with pytest.raises(ValueError):
+        make_migrator(migrations_path, lock_mode='lease', lease_ttl=0)
+
+
+def test_bulk_baseline(migrations_path):
+    for i in range(3, 8):
+        write_migration(migrations_path, 'v{:03d}_more.cql'.format(i),
+                        'SELECT {};'.format(i))
+
+    migrator = make_migrator(migrations_path)
+    migrator._ensure_keyspace()
+    migrator.baseline(Opts(bulk=True, batch_size=3, db_version='6'))
+
+    assert [(v, s) for v, _, s in states(migrator)] == \
+        [(v, Migration.State.SKIPPED) for v in range(1, 7)]
+
+    migrator.migrate(Opts())
+    assert states(migrator)[-1][::2] == (7, Migration.State.SUCCEEDED)
+    assert migrator.backend.statements == [('SELECT 7', None)]
+
+
+def test_reset_data_only(migrations_path):
+    write_migration(migrations_path, 'v003_users.seed.cql',
+                    'INSERT INTO users (id) VALUES (3);')
+    migrator = make_migrator(migrations_path)
+    migrator.migrate(Opts())
+    del migrator.backend.statements[:]
+
+    migrator.reset(Opts(data_only=True))
+
+    assert [s for s, _ in migrator.backend.statements] == [
+        'TRUNCATE "test"."users"',
+        'INSERT INTO users (id) VALUES (3)']
+    assert len(states(migrator)) == 3
+
+
+def test_reset_data_only_falls_back(migrations_path):
+    migrator = make_migrator(migrations_path)
+    migrator.migrate(Opts(db_version='1'))
+    del migrator.backend.statements[:]
+
+    migrator.reset(Opts(data_only=True))
+
+    assert len(migrator.backend.statements) == 3
+    assert len(states(migrator)) == 2
+
+
+def test_compressed_content(migrations_path):
+    keyspaces = {}
+    migrator = make_migrator(migrations_path, keyspaces)
+    migrator.migrate(Opts(db_version='1'))
+
+    migrator = make_migrator(migrations_path, keyspaces)
+    migrator.config.compress_content = True
+    migrator.migrate(Opts())
+
+    versions = sorted(migrator.backend.list_versions(),
+                      key=lambda v: v.version)
+    assert versions[0].content.startswith('CREATE TABLE')
+    assert versions[1].content_encoding == 'zlib'
+    assert versions[1].content is None
+
+    write_migration(migrations_path, 'v002_insert.cql', 'SELECT 1;')
+    with pytest.raises(InconsistentState):
+        make_migrator(migrations_path, keyspaces).migrate(Opts())
+
+
+def test_throttled_migration(migrations_path):
+    now = [0.0]
+
+    def sleep(seconds):
+        now[0] += seconds
+
+    throttle = Throttle(ops_per_second=1, clock=lambda: now[0], sleep=sleep)
+    migrator = make_migrator(migrations_path, throttle=throttle)
+    migrator.migrate(Opts())
+
+    # The first statement uses up the burst, the others wait a second each
+    assert len(migrator.backend.statements) == 3
+    assert now[0] == 2.0
+
+
+def test_preflight(migrations_path):
+    write_migration(migrations_path, 'v003_alter.cql',
+                    'ALTER TABLE users ADD name text;\n'
+                    "UPDATE users SET name = 'x' WHERE id = 1;")
+    migrator = make_migrator(migrations_path)
+    migrator.migrate(Opts(db_version='1'))
+    migrator.migrate(Opts(preflight=True))
+
+    # Statements on tables altered by pending migrations are not prepared
+    assert migrator.backend.prepared == [
+        'INSERT INTO users (id) VALUES (1)',
+        'INSERT INTO users (id) VALUES (2)']
+    assert len(states(migrator)) == 3
+    assert migrator._prepared == {}
+
+
+def test_preflight_keeps_repeated_statements(migrations_path):
+    write_migration(migrations_path, 'v003_insert.cql',
+                    'INSERT INTO users (id) VALUES (1);')
+    migrator = make_migrator(migrations_path)
+    migrator.migrate(Opts(db_version='1'))
+
+    _, _, pending_migrations = migrator._verify_migrations(
+        migrator.config.migrations)
+    migrator._preflight(pending_migrations)
+
+    # All statements are checked, only the repeated one is kept for the run
+    assert len(migrator.backend.prepared) == 2
+    assert list(migrator._prepared) == ['INSERT INTO users (id) VALUES (1)']
+
+
+def test_preflight_failed(migrations_path):
+    write_migration(migrations_path, 'v003_broken.cql',
+                    "INSERT INTO users (id) VALUES ('3);")
+    migrator = make_migrator(migrations_path)
+    migrator.migrate(Opts(db_version='1'))
+    del migrator.backend.statements[:]
+
+    with pytest.raises(PreflightFailed) as exc_info:
+        migrator.migrate(Opts(preflight=True))
+
+    assert [p[:2] for p in exc_info.value.problems] == [
+        (3, 'v003_broken.cql')]
+    assert migrator.backend.statements == []
+    assert len(states(migrator)) == 1
+
+
+def test_schema_disagreement(migrations_path):
+    migrator = make_migrator(migrations_path, schema_check='fail')
+    migrator.backend.nodes = [
+        NodeSchema('10.0.0.1', 'dc1', 'a'),
+        NodeSchema('10.0.0.2', 'dc2', 'b')]
+
+    with pytest.raises(SchemaDisagreement):
+        migrator.migrate(Opts())
+    assert migrator.backend.statements == []
+
+
+def test_schema_agreement_wait(migrations_path):
+    migrator = make_migrator(migrations_path, schema_check='wait')
+    migrator.SCHEMA_INITIAL_DELAY = 0.01
+    agreed = [NodeSchema('10.0.0.1', 'dc1', 'a'),
+              NodeSchema('10.0.0.2', 'dc1', 'a')]
+    responses = [[NodeSchema('10.0.0.1', 'dc1', 'a'),
+                  NodeSchema('10.0.0.2', 'dc1', 'b')]]
+    migrator.backend.schema_versions = \
+        lambda: responses.pop() if responses else agreed
+
+    migrator.migrate(Opts())
+    assert [s for _, _, s in states(migrator)] == \
+        [Migration.State.SUCCEEDED] * 2
+
+
+def test_status_schema_versions(migrations_path, capsys):
+    migrator = make_migrator(migrations_path)
+    migrator.migrate(Opts())
+    migrator.backend.nodes = [
+        NodeSchema('10.0.0.1', 'dc1', 'a'),
+        NodeSchema('10.0.0.2', 'dc1', 'b'),
+        NodeSchema('10.0.1.1', 'dc2', 'a')]
+
+    migrator.status(Opts())
+    out = capsys.readouterr().out
+    assert 'dc1                 2  a (1), b (1)' in out
+    assert 'dc2                 1  a (1)' in out
+
+
+def test_migration_timing(migrations_path, capsys):
+    keyspaces = {}
+    migrator = make_migrator(migrations_path, keyspaces)
+    migrator.migrate(Opts(db_version='1'))
+
+    version, = migrator.backend.list_versions()
+    assert version.statement_count == 1
+    assert version.byte_count == len('CREATE TABLE users (id int PRIMARY KEY);')
+    assert version.started_at <= version.finished_at
+
+    migrator.status(Opts())
+    out = capsys.readouterr().out
+    assert 'Duration' in out
+    assert 'Estimated time: ' in out
+    assert '?' not in out
+
+
+def test_data_migrations(migrations_path):
+    write_migration(migrations_path, 'v003_users.csv',
+                    '# table: users\n'
+                    'id,name\n'
+                    '3,"Doe, John"\n'
+                    '4,\n')
+    write_migration(migrations_path, 'v004_users.jsonl',
+                    '# table: test.users\n'
+                    '# columns: id\n'
+                    '{"id": 5, "ignored": true}\n')
+    keyspaces = {}
+    migrator = make_migrator(migrations_path, keyspaces)
+    migrator.migrate(Opts())
+
+    insert = 'INSERT INTO "test"."users" JSON ? DEFAULT UNSET'
+    assert migrator.backend.statements[3:] == [
+        (insert, ('{"id": "3", "name": "Doe, John"}',)),
+        (insert, ('{"id": "4"}',)),
+        (insert, ('{"id": 5}',))]
+
+    version = states(migrator)[2]
+    assert version == (3, 'v003_users.csv', Migration.State.SUCCEEDED)
+    assert migrator.config.migrations[2].content == '# table: users\n'
+    assert migrator.config.migrations[2].is_data
+
+    # Changes to the rows, and not only the header, are detected
+    write_migration(migrations_path, 'v004_users.jsonl',
+                    '# table: test.users\n'
+                    '# columns: id\n'
+                    '{"id": 6}\n')
+    with pytest.raises(InconsistentState):
+        make_migrator(migrations_path, keyspaces).migrate(Opts())
+
+
+def test_throttled_data_migration(migrations_path):
+    write_migration(migrations_path, 'v003_users.csv',
+                    '# table: users\n'
+                    'id\n'
+                    '3\n'
+                    '4\n')
+    throttle = Throttle(ops_per_second=100, adaptive=True, window=100)
+    migrator = make_migrator(migrations_path, throttle=throttle)
+    migrator.migrate(Opts())
+
+    # Every statement and row insert is accounted for
+    assert len(throttle._latencies) == 5
+    assert len(migrator.backend.statements) == 5
+
+
+def test_invalid_data_migration(migrations_path):
+    write_migration(migrations_path, 'v003_users.csv',
+                    '# table: users\n'
+                    '# columns: id, name\n'
+                    '3\n')
+    migrator = make_migrator(migrations_path)
+
+    with pytest.raises(FailedMigration):
+        migrator.migrate(Opts())
+    assert states(migrator)[-1][2] == Migration.State.FAILED
+
+
+def test_trace_statements(migrations_path):
+    report = TraceReport()
+    migrator = make_migrator(migrations_path, trace_report=report)
+    migrator.migrate(Opts())
+
+    assert [(s.version, s.statement) for s in report.statements] == [
+        (1, 'CREATE TABLE users (id int PRIMARY KEY)'),
+        (2, 'INSERT INTO users (id) VALUES (1)'),
+        (2, 'INSERT INTO users (id) VALUES (2)')]
+    assert report.statements[0].trace.coordinator == '127.0.0.1'
+
+
+def test_trace_statements_wall_time(migrations_path):
+    now = [0.0]
+
+    def sleep(seconds):
+        now[0] += seconds
+
+    report = TraceReport()
+    throttle = Throttle(ops_per_second=1, clock=lambda: now[0], sleep=sleep)
+    migrator = make_migrator(migrations_path, trace_report=report,
+                             throttle=throttle)
+
+    def execute_traced(statement):
+        # Retrieving the trace takes a while after the execution
+        now[0] += 0.5
+        return 0.25, StatementTrace('127.0.0.1', 0.2, [])
+
+    migrator.backend.execute_traced = execute_traced
+    migrator.migrate(Opts())
+
+    # Neither throttling nor retrieving traces count as execution time
+    assert now[0] > 2.0
+    assert [s.wall for s in report.statements] == [0.25] * 3
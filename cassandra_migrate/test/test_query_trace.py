@@ -0,0 +1,43 @@
+from __future__ import unicode_literals
+
+from cassandra_migrate.backend import StatementTrace, TraceEvent
+from cassandra_migrate.query_trace import TraceReport, replica_timings
+
+
+TRACE = StatementTrace('10.0.0.1', 0.5, [
+    TraceEvent('10.0.0.1', 0.001, 'Parsing statement'),
+    TraceEvent('10.0.0.2', 0.010, 'Acquiring sstable references'),
+    TraceEvent('10.0.0.1', 0.300, 'Sending mutation to 10.0.0.2'),
+    TraceEvent('10.0.0.2', 0.400, 'Appending to commitlog'),
+    TraceEvent('10.0.0.1', 0.450, 'Waiting for replicas')])
+
+
+def test_replica_timings():
+    timings = replica_timings(TRACE)
+
+    assert [(t.source, t.events, t.elapsed) for t in timings] == [
+        ('10.0.0.1', 3, 0.450), ('10.0.0.2', 2, 0.400)]
+    assert timings[0].slowest_step == 'Sending mutation to 10.0.0.2'
+    assert abs(timings[0].step_time - 0.299) < 1e-9
+    assert timings[1].slowest_step == 'Appending to commitlog'
+
+
+def test_report():
+    report = TraceReport()
+    report.add(1, 'v001_create.cql', 'CREATE TABLE a (id int PRIMARY KEY)',
+               0.1, StatementTrace('10.0.0.1', 0.05, []))
+    report.add(2, 'v002_insert.cql', 'INSERT INTO a (id)\n  VALUES (1)',
+               2.0, TRACE)
+    report.add(2, 'v002_insert.cql', 'INSERT INTO a (id) VALUES (2)',
+               0.2, None)
+
+    assert [s.wall for s in report.slowest(2)] == [2.0, 0.2]
+
+    text = report.format()
+    assert 'Traced 3 statements in 2.3s' in text
+    assert '### 1. v002_insert.cql (version 2)' in text
+    assert '    INSERT INTO a (id) VALUES (1)' in text
+    # Client-side time is the wall time not accounted for by the trace
+    assert '1.5s' in text
+    assert 'Appending to commitlog' in text
+    assert 'Trace unavailable' in text
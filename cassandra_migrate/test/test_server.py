@@ -0,0 +1,78 @@
+from __future__ import unicode_literals
+
+import io
+import os
+import stat
+import threading
+
+import pytest
+
+from cassandra_migrate import MemoryBackend
+from cassandra_migrate.server import MigrationServer, forward
+
+
+@pytest.fixture
+def server(tmpdir):
+    migrations_path = tmpdir.mkdir('migrations')
+    with io.open(str(migrations_path.join('v001_create.cql')), 'w') as f:
+        f.write('CREATE TABLE users (id int PRIMARY KEY);')
+
+    config_path = str(tmpdir.join('cassandra-migrate.yml'))
+    with io.open(config_path, 'w') as f:
+        f.write('keyspace: test\nmigrations_path: ./migrations\n')
+
+    backend = MemoryBackend('test', 'database_migrations')
+    server = MigrationServer(str(tmpdir.join('migrate.sock')), config_path,
+                             backend=backend)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        thread.join()
+        server.server_close()
+
+
+def test_serve_commands(server, tmpdir):
+    backend = server.backend
+
+    response = forward(server.socket_path, {'action': 'migrate'})
+    assert response == {'ok': True, 'output': ''}
+    assert [s for s, _ in backend.statements] == [
+        'CREATE TABLE users (id int PRIMARY KEY)']
+
+    # Configuration is reloaded for every command, reusing the backend
+    with io.open(str(tmpdir.join('migrations', 'v002_insert.cql')), 'w') as f:
+        f.write('INSERT INTO users (id) VALUES (1);')
+
+    response = forward(server.socket_path,
+                       {'action': 'migrate', 'db_version': '2'})
+    assert response['ok']
+    assert server.backend is backend
+    assert len(backend.list_versions()) == 2
+
+    response = forward(server.socket_path, {'action': 'status'})
+    assert response['ok']
+    assert 'v002_insert.cql' in response['output']
+
+
+def test_serve_errors(server):
+    response = forward(server.socket_path, {'action': 'generate'})
+    assert response == {'ok': False,
+                        'error': 'Unsupported action: generate'}
+
+    response = forward(server.socket_path,
+                       {'action': 'migrate', 'db_version': '0'})
+    assert not response['ok']
+
+
+def test_server_close_removes_socket(tmpdir):
+    socket_path = str(tmpdir.join('migrate.sock'))
+    server = MigrationServer(socket_path, str(tmpdir.join('config.yml')),
+                             backend=MemoryBackend('test', 'migrations'))
+
+    assert stat.S_IMODE(os.stat(socket_path).st_mode) == 0o600
+    server.server_close()
+    assert not os.path.exists(socket_path)
+    assert server.backend is None
@@ -0,0 +1,62 @@
+from __future__ import unicode_literals
+
+import pytest
+
+from cassandra_migrate.steps import Return, Sleep, call, blocking, run
+
+
+class Backend(object):
+    def __init__(self):
+        self.calls = []
+
+    def double(self, value):
+        self.calls.append(value)
+        return value * 2
+
+    def fail(self):
+        raise ValueError('failed')
+
+
+def test_nested_steps():
+    def inner(value):
+        doubled = yield call('double', value)
+        yield Return(doubled + 1)
+
+    def outer():
+        first = yield inner(1)
+        second = yield inner(first)
+        yield Sleep(0)
+        yield Return((yield blocking(max, first, second)))
+
+    backend = Backend()
+    assert run(outer(), backend) == 7
+    assert backend.calls == [1, 3]
+
+
+def test_step_without_return():
+    def step():
+        yield call('double', 1)
+
+    assert run(step(), Backend()) is None
+
+
+def test_step_errors():
+    cleaned_up = []
+
+    def inner():
+        try:
+            yield call('fail')
+        finally:
+            cleaned_up.append((yield call('double', 2)))
+
+    def outer():
+        try:
+            yield inner()
+        except ValueError as e:
+            yield Return(str(e))
+
+    assert run(outer(), Backend()) == 'failed'
+    assert cleaned_up == [4]
+
+    with pytest.raises(ValueError):
+        run(inner(), Backend())
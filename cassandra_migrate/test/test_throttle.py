@@ -0,0 +1,84 @@
+from __future__ import unicode_literals
+
+import pytest
+from cassandra import OperationTimedOut
+
+from cassandra_migrate.throttle import Throttle, ThrottledSession
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TimingOutSession(object):
+    def __init__(self, clock):
+        self.clock = clock
+        self.keyspace = 'test'
+
+    def execute(self, query, parameters=None):
+        self.clock.now += 1
+        raise OperationTimedOut()
+
+
+def test_bytes_rate():
+    clock = FakeClock()
+    throttle = Throttle(bytes_per_second=100, clock=clock, sleep=clock.sleep)
+
+    for _ in range(3):
+        throttle.wait(100)
+    assert clock.now == 2.0
+
+    # Statements larger than the burst still get through
+    throttle.wait(300)
+    assert clock.now == 5.0
+
+
+def test_adaptive_backoff_and_recovery():
+    clock = FakeClock()
+    throttle = Throttle(ops_per_second=100, adaptive=True,
+                        latency_threshold=0.5, window=2, clock=clock,
+                        sleep=clock.sleep)
+
+    throttle.record(1.0)
+    throttle.record(1.0)
+    assert throttle.factor == 0.5
+    assert throttle._ops.rate == 50
+
+    throttle.record(0.01)
+    throttle.record(0.01)
+    assert throttle.factor == 0.6
+
+
+def test_adaptive_backoff_burst():
+    clock = FakeClock()
+    throttle = Throttle(ops_per_second=100, adaptive=True,
+                        latency_threshold=0.5, window=1, clock=clock,
+                        sleep=clock.sleep)
+
+    throttle.record(1.0)
+    assert throttle._ops.burst == 50
+
+    # After an idle moment, only the reduced burst goes through at once
+    clock.now += 10
+    for _ in range(51):
+        throttle.wait()
+    assert clock.now == pytest.approx(10.02)
+
+
+def test_throttled_session_timeouts():
+    clock = FakeClock()
+    throttle = Throttle(ops_per_second=100, adaptive=True, window=1,
+                        clock=clock, sleep=clock.sleep)
+    session = ThrottledSession(TimingOutSession(clock), throttle)
+
+    assert session.keyspace == 'test'
+    with pytest.raises(OperationTimedOut):
+        session.execute('SELECT 1')
+    assert throttle.factor == 0.5
@@ -0,0 +1,30 @@
+from __future__ import unicode_literals
+
+import pytest
+
+from cassandra_migrate.timing import (Timing, estimate_durations,
+                                      total_duration, format_duration)
+
+
+def test_estimate_durations():
+    timings = [Timing(2.0, 4), Timing(4.0, 4), Timing(10.0, None), None]
+    assert estimate_durations(timings, [2, None, 0]) == [1.5, 10.0, 0.0]
+
+
+def test_estimate_durations_fallback():
+    assert estimate_durations([Timing(3.0, 1), Timing(5.0, 1)], [None]) == \
+        [4.0]
+    assert estimate_durations([], [1, None]) == [None, None]
+    assert total_duration([1.0, None]) is None
+    assert total_duration([1.0, 2.5]) == 3.5
+
+
+@pytest.mark.parametrize('seconds,text', [
+    (None, '?'),
+    (0.25, '250ms'),
+    (12.34, '12.3s'),
+    (245, '4m05s'),
+    (3720, '1h02m'),
+])
+def test_format_duration(seconds, text):
+    assert format_duration(seconds) == text
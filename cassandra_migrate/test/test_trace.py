@@ -0,0 +1,76 @@
+from __future__ import unicode_literals
+
+import io
+import json
+
+import pytest
+
+from cassandra_migrate import trace
+
+
+@pytest.fixture
+def tracer():
+    tracer = trace.Tracer()
+    trace.set_tracer(tracer)
+    yield tracer
+    trace.set_tracer(None)
+
+
+def test_write_trace(tracer, tmpdir):
+    @trace.traced('outer')
+    def outer():
+        # Args can use any name, even those of the span's parameters
+        with trace.span('inner', 'cluster', args={'name': 'users',
+                                                  'category': 'table'}):
+            pass
+
+    outer()
+    with pytest.raises(ValueError):
+        with trace.span('failing'):
+            raise ValueError('failed')
+
+    path = str(tmpdir.join('trace.json'))
+    tracer.write(path)
+    with io.open(path, encoding='utf-8') as f:
+        data = json.load(f)
+
+    assert data['displayTimeUnit'] == 'ms'
+    inner, outer, failing = data['traceEvents']
+
+    assert inner['name'] == 'inner'
+    assert inner['cat'] == 'cluster'
+    assert inner['args'] == {'name': 'users', 'category': 'table'}
+    assert outer['name'] == 'outer'
+    assert outer['cat'] == 'migrate'
+    assert list(failing['args']) == ['error']
+    assert 'failed' in failing['args']['error']
+
+    for event in data['traceEvents']:
+        assert event['ph'] == 'X'
+        assert event['dur'] >= 0
+        assert isinstance(event['pid'], int)
+        assert isinstance(event['tid'], int)
+
+    # Spans nest within their parent
+    assert outer['ts'] <= inner['ts']
+    assert inner['ts'] + inner['dur'] <= outer['ts'] + outer['dur']
+
+
+def test_args_not_modified(tracer):
+    args = {'version': 1}
+    with pytest.raises(ValueError):
+        with trace.span('migration', args=args):
+            raise ValueError()
+
+    assert args == {'version': 1}
+    assert 'error' in tracer.events[0]['args']
+
+
+def test_disabled_tracer(tmpdir):
+    assert not trace.get_tracer().enabled
+    with trace.span('ignored', args={'name': 'users'}):
+        pass
+
+    path = tmpdir.join('trace.json')
+    trace.get_tracer().write(str(path))
+    assert not path.exists()
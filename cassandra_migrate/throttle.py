@@ -0,0 +1,217 @@
+# encoding: utf-8
+
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+
+import time
+import logging
+import threading
+from timeit import default_timer
+from contextlib import contextmanager
+
+
+def is_timeout(exc):
+    """Whether an exception means a request timed out"""
+    from cassandra import OperationTimedOut, Timeout
+    return isinstance(exc, (OperationTimedOut, Timeout))
+
+
+class TokenBucket(object):
+    """
+    Token bucket, allowing `rate` tokens per second on average, with bursts
+    of up to `burst` tokens (one second's worth by default)
+    """
+
+    def __init__(self, rate, burst=None, clock=default_timer,
+                 sleep=time.sleep):
+        if rate <= 0:
+            raise ValueError('Rate must be positive')
+
+        self.rate = rate
+        self.burst = burst if burst is not None else rate
+        self.clock = clock
+        self.sleep = sleep
+
+        self._tokens = self.burst
+        self._updated_at = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self.clock()
+        self._tokens = min(self.burst,
+                           self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def set_rate(self, rate, burst=None):
+        """
+        Change the rate and burst size (one second's worth by default), from
+        now on
+        """
+        with self._lock:
+            self._refill()
+            self.rate = rate
+            self.burst = burst if burst is not None else rate
+            self._tokens = min(self._tokens, self.burst)
+
+    def acquire(self, amount=1):
+        """
+        Take `amount` tokens, blocking until they are available
+
+        Requests larger than the burst size are allowed, and are paid back
+        by waiting before the next ones, so large statements are not
+        blocked forever.
+        """
+        with self._lock:
+            self._refill()
+            self._tokens -= amount
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+
+        if wait > 0:
+            self.sleep(wait)
+
+
+class Throttle(object):
+    """
+    Rate limiter for migration requests, by operations and bytes per second
+
+    In adaptive mode, the observed latency and timeout rate of each window of
+    `window` requests are compared against the thresholds: the allowed rates
+    are halved when either is crossed, and raised back in steps of a tenth
+    of the configured rates once requests are healthy again.
+    """
+
+    logger = logging.getLogger("Migrator")
+
+    MIN_FACTOR = 0.05
+    RECOVERY_STEP = 0.1
+
+    def __init__(self, ops_per_second=None, bytes_per_second=None,
+                 adaptive=False, latency_threshold=0.1,
+                 timeout_threshold=0.01, window=20, clock=default_timer,
+                 sleep=time.sleep):
+        if adaptive and not (ops_per_second or bytes_per_second):
+            raise ValueError('Adaptive throttling requires a maximum rate')
+
+        self.ops_per_second = ops_per_second
+        self.bytes_per_second = bytes_per_second
+        self.adaptive = adaptive
+        self.latency_threshold = latency_threshold
+        self.timeout_threshold = timeout_threshold
+        self.window = window
+        self.clock = clock
+
+        self.factor = 1.0
+        self._ops = ops_per_second and \
+            TokenBucket(ops_per_second, clock=clock, sleep=sleep)
+        self._bytes = bytes_per_second and \
+            TokenBucket(bytes_per_second, clock=clock, sleep=sleep)
+        self._latencies = []
+        self._timeouts = 0
+        self._lock = threading.Lock()
+
+    def wait(self, size=0):
+        """Block until a request of `size` bytes is allowed"""
+        if self._ops:
+            self._ops.acquire(1)
+        if self._bytes and size:
+            self._bytes.acquire(size)
+
+    def record(self, latency, timed_out=False):
+        """Account for a finished request, adapting the rates if enabled"""
+        if not self.adaptive:
+            return
+
+        with self._lock:
+            self._latencies.append(latency)
+            self._timeouts += bool(timed_out)
+            if len(self._latencies) < self.window:
+                return
+
+            latency = sum(self._latencies) / len(self._latencies)
+            timeout_rate = self._timeouts / len(self._latencies)
+            self._latencies = []
+            self._timeouts = 0
+
+            if latency > self.latency_threshold or \
+                    timeout_rate > self.timeout_threshold:
+                factor = max(self.MIN_FACTOR, self.factor / 2)
+            else:
+                factor = min(1.0, self.factor + self.RECOVERY_STEP)
+
+            if factor != self.factor:
+                self.logger.info(
+                    'Throttling to {:.0%} of the maximum rate (mean latency '
+                    '{:.3f}s, {:.1%} timeouts)'.format(factor, latency,
+                                                       timeout_rate))
+                self._set_factor(factor)
+
+    def _set_factor(self, factor):
+        self.factor = factor
+        # The burst shrinks with the rate, so an idle moment does not let a
+        # full-rate burst through while backing off
+        if self._ops:
+            self._ops.set_rate(self.ops_per_second * factor)
+        if self._bytes:
+            self._bytes.set_rate(self.bytes_per_second * factor)
+
+    @contextmanager
+    def request(self, size=0):
+        """Wait for a request to be allowed, then measure it"""
+        self.wait(size)
+        start = self.clock()
+        try:
+            yield
+        except Exception as e:
+            self.record(self.clock() - start, is_timeout(e))
+            raise
+        else:
+            self.record(self.clock() - start)
+
+
+def _size(value):
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    return len('{}'.format(value).encode('utf-8'))
+
+
+def statement_size(query, parameters=None):
+    """Rough size of a request in bytes, for bandwidth throttling"""
+    size = _size(getattr(query, 'query_string', query))
+    if isinstance(parameters, dict):
+        parameters = parameters.values()
+    return size + sum(_size(param) for param in parameters or ())
+
+
+class ThrottledSession(object):
+    """
+    Session wrapper handed to Python migrations, rate limiting every request
+    through a `Throttle`
+
+    Other attributes are forwarded to the wrapped session.
+    """
+
+    def __init__(self, session, throttle):
+        self._session = session
+        self._throttle = throttle
+
+    def execute(self, query, parameters=None, *args, **kwargs):
+        with self._throttle.request(statement_size(query, parameters)):
+            return self._session.execute(query, parameters, *args, **kwargs)
+
+    def execute_async(self, query, parameters=None, *args, **kwargs):
+        throttle = self._throttle
+        throttle.wait(statement_size(query, parameters))
+        start = throttle.clock()
+        future = self._session.execute_async(query, parameters, *args,
+                                             **kwargs)
+
+        add_callbacks = getattr(future, 'add_callbacks', None)
+        if add_callbacks is not None:
+            add_callbacks(
+                lambda _: throttle.record(throttle.clock() - start),
+                lambda e: throttle.record(throttle.clock() - start,
+                                          is_timeout(e)))
+        return future
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
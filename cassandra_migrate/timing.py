@@ -0,0 +1,83 @@
+# encoding: utf-8
+
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+
+from collections import namedtuple
+
+
+# Execution time of an applied migration, in seconds. `statement_count` is
+# None for Python migrations, whose statements are not known.
+Timing = namedtuple('Timing', 'duration statement_count')
+
+
+def version_timing(version):
+    """Return the Timing of a stored version, or None if it was not timed"""
+    started_at = getattr(version, 'started_at', None)
+    finished_at = getattr(version, 'finished_at', None)
+    if started_at is None or finished_at is None:
+        return None
+
+    return Timing((finished_at - started_at).total_seconds(),
+                  getattr(version, 'statement_count', None))
+
+
+def estimate_durations(timings, statement_counts):
+    """
+    Estimate how long migrations will take, in seconds, from past timings
+
+    `statement_counts` holds the number of statements of each migration, or
+    None for Python migrations. CQL migrations are estimated from the mean
+    time per statement of past CQL migrations, and Python ones from the mean
+    duration of past Python migrations. Either falls back to the mean
+    duration of any past migration. Estimates are None when there is no
+    history at all.
+    """
+
+    timings = [t for t in timings if t is not None]
+    cql = [t for t in timings if t.statement_count]
+    python = [t for t in timings if t.statement_count is None]
+
+    def mean(values):
+        return sum(values) / len(values) if values else None
+
+    per_statement = None
+    if cql:
+        per_statement = sum(t.duration for t in cql) / \
+            sum(t.statement_count for t in cql)
+    per_python = mean([t.duration for t in python])
+    per_migration = mean([t.duration for t in timings])
+
+    estimates = []
+    for count in statement_counts:
+        if count is not None and per_statement is not None:
+            estimates.append(count * per_statement)
+        elif count is None and per_python is not None:
+            estimates.append(per_python)
+        else:
+            estimates.append(per_migration)
+    return estimates
+
+
+def total_duration(estimates):
+    """Sum estimates, or return None if any of them is unknown"""
+    if not estimates or None in estimates:
+        return None
+    return sum(estimates)
+
+
+def format_duration(seconds):
+    """Format a duration for humans, or '?' if it is unknown"""
+    if seconds is None:
+        return '?'
+    elif seconds < 1:
+        return '{:.0f}ms'.format(seconds * 1000)
+    elif seconds < 60:
+        return '{:.1f}s'.format(seconds)
+
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    if minutes < 60:
+        return '{}m{:02d}s'.format(minutes, seconds)
+
+    hours, minutes = divmod(minutes, 60)
+    return '{}h{:02d}m'.format(hours, minutes)
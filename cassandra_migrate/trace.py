@@ -0,0 +1,136 @@
+# encoding: utf-8
+
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+
+import io
+import os
+import threading
+from contextlib import contextmanager
+from functools import wraps
+from timeit import default_timer
+
+
+class Tracer(object):
+    """
+    Collect timed spans and write them as a Chrome trace-event file
+
+    The resulting JSON can be loaded in chrome://tracing or in Perfetto.
+    Spans are recorded as complete ("X") events, with timestamps in
+    microseconds relative to the creation of the tracer. Spans may be opened
+    from any thread, and are shown on separate tracks per thread.
+    """
+
+    enabled = True
+
+    def __init__(self):
+        self.events = []
+        self._pid = os.getpid()
+        self._start = default_timer()
+        self._lock = threading.Lock()
+
+    def _now(self):
+        return (default_timer() - self._start) * 1e6
+
+    @contextmanager
+    def span(self, name, category='migrate', args=None):
+        """
+        Record the duration of the enclosed block as a span, with the
+        values of the `args` dict shown in its details
+        """
+        args = dict(args or {})
+        start = self._now()
+        try:
+            yield
+        except Exception as e:
+            args['error'] = repr(e)
+            raise
+        finally:
+            event = {
+                'name': name,
+                'cat': category,
+                'ph': 'X',
+                'ts': start,
+                'dur': self._now() - start,
+                'pid': self._pid,
+                'tid': threading.current_thread().ident,
+                'args': args
+            }
+            with self._lock:
+                self.events.append(event)
+
+    def write(self, path):
+        """Write all recorded spans to a trace-event JSON file"""
+        import json
+
+        with self._lock:
+            data = {'traceEvents': list(self.events),
+                    'displayTimeUnit': 'ms'}
+
+        with io.open(path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(data, default=str))
+
+
+class NullTracer(object):
+    """Tracer that records nothing, used when tracing is disabled"""
+
+    enabled = False
+
+    @contextmanager
+    def span(self, name, category='migrate', args=None):
+        yield
+
+    def write(self, path):
+        pass
+
+
+_tracer = NullTracer()
+
+
+def get_tracer():
+    """Return the currently active tracer"""
+    return _tracer
+
+
+def set_tracer(tracer):
+    """Install a tracer globally, or disable tracing if `tracer` is None"""
+    global _tracer
+    _tracer = tracer if tracer is not None else NullTracer()
+
+
+def span(name, category='migrate', args=None):
+    """Open a span in the currently active tracer"""
+    return _tracer.span(name, category, args)
+
+
+def traced(name, category='migrate'):
+    """Decorator recording every call of a function as a span"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with _tracer.span(name, category):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def instrument_schema_agreement(cluster):
+    """
+    Record every schema agreement wait performed by a connected cluster
+
+    The driver waits for agreement internally after DDL statements and
+    metadata refreshes, so the wait is otherwise indistinguishable from the
+    statement that triggered it.
+    """
+    control_connection = getattr(cluster, 'control_connection', None)
+    if not _tracer.enabled or control_connection is None:
+        return
+
+    wait = control_connection.wait_for_schema_agreement
+
+    @wraps(wait)
+    def traced_wait(*args, **kwargs):
+        with span('schema_agreement', 'cluster'):
+            return wait(*args, **kwargs)
+
+    control_connection.wait_for_schema_agreement = traced_wait
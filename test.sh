@@ -2,7 +2,16 @@
 
 set -e
 
-flake8 cassandra_migrate
+# asyncio support (cassandra_migrate/aio.py) and its tests need Python 3.7+:
+# older interpreters cannot even parse them
+FLAKE8_EXCLUDE=.git,__pycache__,venv,build,dist
+COVERAGE_OMIT='cassandra_migrate/test/**'
+if ! python -c 'import sys; sys.exit(sys.version_info < (3, 7))'; then
+    FLAKE8_EXCLUDE=$FLAKE8_EXCLUDE,aio.py,test_aio.py
+    COVERAGE_OMIT=$COVERAGE_OMIT,cassandra_migrate/aio.py
+fi
+
+flake8 --exclude "$FLAKE8_EXCLUDE" cassandra_migrate
 coverage erase
 coverage run --source cassandra_migrate -m py.test
-coverage report --include='cassandra_migrate/**' --omit='cassandra_migrate/test/**'
+coverage report --include='cassandra_migrate/**' --omit="$COVERAGE_OMIT"